@@ -0,0 +1,285 @@
+from src.data_processing.SmartphonesDataset import SmartphonesDataset
+from src.data_processing.DatasetRegistry import DatasetRegistry
+from src.data_processing.ColumnarCache import ColumnarCache
+from src.data_processing.ExchangeRateProvider import ExchangeRateProvider
+from src.data_processing.RunDataProcessing import RunDataProcessing
+from src.data_processing.SyntheticCatalogGenerator import SyntheticCatalogGenerator
+from src.machine_learning.ModelTraining import ModelTraining
+from src.machine_learning.EncodingCache import EncodingCache
+from src.machine_learning.models.RandomForrestModel import RandomForestModel
+from src.machine_learning.models.GradientBoostingModel import GradientBoostingModel
+from src.price_prediction.ModelRegistry import ModelRegistry
+from src.price_prediction.FlatPredictor import FlatPredictor
+from src.price_prediction.predict import predict_batch
+import contextlib
+import datetime
+import functools
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import sklearn
+
+
+class BenchmarkSuite:
+    """
+        Times every stage of the project at several dataset sizes, for measuring performance changes.
+
+        For each size a synthetic catalog of that many rows is generated from the distributions of the raw
+        csv (SyntheticCatalogGenerator) and written to a temporary folder, then every stage runs `repeats`
+        times: loading the csv into a SmartphonesDataset (cold, i.e. parsing the csv, and warm, from the
+        columnar cache), each step of the RunDataProcessing pipeline, the one-hot and frequency encodings,
+        both model trainings, and prediction of single rows and of the whole batch (with sklearn through
+        predict_batch and with the flat tree exports). The output of the stages is suppressed and nothing
+        is written outside the temporary folder. Every size works on its own dataset, registered in the
+        DatasetRegistry for the run, and its own models directory, which are passed to the stages
+        explicitly: the SmartphonesDataset singleton and the real models are never touched.
+
+        Results are summarized per (stage, size) with the min, median, mean, standard deviation and max
+        of the repeats, and can be saved as json. compare() flags the stages whose median got slower than
+        in a stored baseline.
+
+        Attributes:
+        ----------
+        sizes : list
+            Numbers of rows the stages are timed at.
+        repeats : int
+            Number of timed runs of every stage.
+        stages : tuple
+            Groups of stages to run ('load', 'process', 'encode', 'train', 'predict').
+        raw_path : str
+            Path of the raw csv the catalogs are drawn from.
+        single_rows : int
+            Number of phones predicted one at a time for the single-row prediction stages.
+        seed : int
+            Seed of the synthetic catalogs.
+        results : list
+            One dict of statistics per (stage, size), after run().
+
+        Methods:
+        -------
+        run():
+            Runs the benchmark and returns the results.
+        to_dict():
+            Returns the results and the environment they were measured in.
+        save(path):
+            Writes the results to a json file.
+        compare(current, baseline, threshold, min_delta):
+            Compares two benchmark results and flags the regressions.
+        print_comparison(comparison):
+            Prints a comparison.
+    """
+
+    stage_groups = ('load', 'process', 'encode', 'train', 'predict')
+
+    def __init__(self, sizes=(1000, 10000, 100000), repeats=3, stages=stage_groups,
+                 raw_path='../../datasets/smartphones.csv', single_rows=100, seed=42):
+        self.sizes = list(sizes)
+        self.repeats = repeats
+        self.stages = tuple(stages)
+        self.raw_path = raw_path
+        self.single_rows = single_rows
+        self.seed = seed
+        self.results = []
+
+    def _time(self, func, *args, **kwargs):
+        """ Runs func with its output suppressed and returns (seconds, result). """
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            return time.perf_counter() - start, result
+
+    def _record(self, stage, n_rows, seconds, rows=None):
+        """ Adds the summary statistics of the repeated timings of a stage to the results. """
+        median = statistics.median(seconds)
+        rows = n_rows if rows is None else rows
+        self.results.append({
+            "stage": stage, "size": n_rows, "repeats": len(seconds),
+            "min": min(seconds), "median": median, "mean": statistics.fmean(seconds),
+            "stdev": statistics.stdev(seconds) if len(seconds) > 1 else 0.0, "max": max(seconds),
+            "rows_per_second": rows / median if median > 0 else None,
+            "seconds": seconds,
+        })
+        print(f"  {stage:<45} {median * 1000:10.2f} ms (median of {len(seconds)})")
+
+    def _bench_load(self, csv_path, n_rows):
+        """ Times loading the csv into a SmartphonesDataset, parsing it (cold) and from its columnar cache (warm). """
+        cache_path = ColumnarCache(csv_path).cache_path
+        cold, warm = [], []
+        for _ in range(self.repeats):
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            cold.append(self._time(SmartphonesDataset.create, csv_path)[0])
+            warm.append(self._time(SmartphonesDataset.create, csv_path)[0])
+        self._record('load_csv_cold', n_rows, cold)
+        self._record('load_csv_warm', n_rows, warm)
+
+    def _bench_process(self, dataset, n_rows, models_dir, record=True):
+        """
+        Times each stage of the data processing pipeline on dataset, which is left holding the cleaned
+        dataframe. Without record, the pipeline runs once, only to clean the catalog for the later stages.
+        """
+        raw_df = dataset.get_df()
+        data_processing = self._time(RunDataProcessing,
+                                     ExchangeRateProvider.from_static_rates(ExchangeRateProvider.fallback_rates),
+                                     dataset=dataset, imputer_path=os.path.join(models_dir, 'imputer.pkl'))[1]
+
+        timings = {}
+        for _ in range(self.repeats if record else 1):
+            dataset.set_df(raw_df.copy())
+            pipeline = self._time(data_processing.build_pipeline)[1]
+            for stage in pipeline.stages:
+                timings.setdefault(stage.name, []).append(self._time(stage.run)[0])
+        for stage_name, seconds in timings.items():
+            if record:
+                self._record(f"process.{stage_name}", n_rows, seconds)
+
+    def _bench_encode(self, dataset, n_rows):
+        """ Times the one-hot and frequency encodings of the cleaned dataset. """
+        model_training = ModelTraining(dataset=dataset)
+        for encoding, encode in (('one_hot', model_training._one_hot_encoding),
+                                 ('frequency', model_training._frequency_encoding)):
+            self._record(f"encode.{encoding}", n_rows, [self._time(encode)[0] for _ in range(self.repeats)])
+
+    def _bench_train(self, dataset, n_rows, models_dir):
+        """ Times the training (fit, scoring and saving) of both models, with the encoded features already cached. """
+        for stage, model_class, train in (('train.random_forest', RandomForestModel, 'train_random_forest'),
+                                          ('train.gradient_boosting', GradientBoostingModel,
+                                           'train_gradient_boosting')):
+            model = model_class(dataset=dataset, models_dir=models_dir)
+            self._time(model._get_encoded_data, 'one-hot')
+            self._record(stage, n_rows, [self._time(getattr(model, train))[0] for _ in range(self.repeats)])
+
+    def _bench_predict(self, cleaned_df, n_rows, models_dir):
+        """ Times the prediction of single rows and of the whole batch, with sklearn and with the flat exports. """
+        phones = cleaned_df.drop(columns=['model', 'price']).astype(
+            {col: object for col, dtype in cleaned_df.dtypes.items()
+             if isinstance(dtype, pd.CategoricalDtype)})
+        records = phones.head(self.single_rows).to_dict('records')
+        sklearn_predictor = functools.partial(predict_batch, models_dir=models_dir)
+        flat_predictor = FlatPredictor(models_dir)
+        self._time(flat_predictor.predict_records, records[:1])  # Load the flat exports once
+
+        def predict_one_at_a_time(predict):
+            for record in records:
+                predict([record])
+
+        for stage, func, args, rows in (
+                ('predict.sklearn_single_row', predict_one_at_a_time, (sklearn_predictor,), len(records)),
+                ('predict.sklearn_batch', sklearn_predictor, (phones,), n_rows),
+                ('predict.flat_single_row', predict_one_at_a_time, (flat_predictor.predict_records,), len(records)),
+                ('predict.flat_batch', flat_predictor.predict_records, (phones.to_dict('records'),), n_rows)):
+            seconds = [self._time(func, *args)[0] for _ in range(self.repeats)]
+            if stage.endswith('single_row'):
+                seconds = [total / rows for total in seconds]  # Latency of one phone
+                self._record(stage, n_rows, seconds, rows=1)
+            else:
+                self._record(stage, n_rows, seconds, rows=rows)
+
+    def run(self):
+        """ Runs the selected stages at every size and returns the results. """
+        generator = self._time(SyntheticCatalogGenerator().fit, pd.read_csv(self.raw_path))[1]
+        datasets = DatasetRegistry()
+        work_dir = tempfile.mkdtemp(prefix='smartphones_benchmark_')
+        self.results = []
+        try:
+            for n_rows in self.sizes:
+                print(f"BENCHMARK: {n_rows} rows, {self.repeats} repeats")
+                csv_path = os.path.join(work_dir, f"smartphones_{n_rows}.csv")
+                # The trained models and the imputer go to the temporary folder, not to the real models
+                models_dir = os.path.join(work_dir, f"saved_models_{n_rows}")
+                os.makedirs(models_dir)
+                self._time(generator.generate, n_rows, csv_path, self.seed)
+
+                if 'load' in self.stages:
+                    self._bench_load(csv_path, n_rows)
+                if not {'process', 'encode', 'train', 'predict'}.intersection(self.stages):
+                    continue
+
+                dataset_name = f"benchmark_{n_rows}"
+                datasets.register(dataset_name, csv_path)
+                try:
+                    dataset = self._time(datasets.get, dataset_name)[1]
+                    self._bench_process(dataset, n_rows, models_dir, record='process' in self.stages)
+                    if 'encode' in self.stages:
+                        self._bench_encode(dataset, n_rows)
+                    if 'train' in self.stages:
+                        self._bench_train(dataset, n_rows, models_dir)
+                    elif 'predict' in self.stages:  # The prediction stages need trained models
+                        self._time(RandomForestModel(dataset=dataset, models_dir=models_dir).train_random_forest)
+                        self._time(GradientBoostingModel(dataset=dataset,
+                                                         models_dir=models_dir).train_gradient_boosting)
+                    if 'predict' in self.stages:
+                        self._bench_predict(dataset.get_df(), n_rows, models_dir)
+                finally:
+                    datasets.remove(dataset_name)
+                    ModelRegistry(models_dir).clear()  # The registry of the temporary models only
+                    EncodingCache.clear()
+                print()
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return self.results
+
+    def to_dict(self):
+        """ Returns the results with the configuration and the environment they were measured in. """
+        return {
+            "created": datetime.datetime.now().isoformat(timespec='seconds'),
+            "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                            "cpu_count": os.cpu_count(), "numpy": np.__version__, "pandas": pd.__version__,
+                            "sklearn": sklearn.__version__},
+            "config": {"sizes": self.sizes, "repeats": self.repeats, "stages": list(self.stages),
+                       "single_rows": self.single_rows, "seed": self.seed},
+            "results": self.results,
+        }
+
+    def save(self, path):
+        """ Writes the results to a json file. """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print(f"Benchmark results written to {path}")
+
+    @staticmethod
+    def compare(current, baseline, threshold=0.2, min_delta=0.001):
+        """
+        Compares the medians of two benchmark results (dicts as written by save()). A (stage, size) is a
+        'regression' when it is more than threshold (a fraction) and more than min_delta seconds slower than
+        in the baseline, an 'improvement' when it is faster by the same margins, 'ok' otherwise, and 'new'
+        when the baseline doesn't have it. Returns one dict per (stage, size) of current.
+        """
+        baseline_medians = {(result["stage"], result["size"]): result["median"] for result in baseline["results"]}
+        comparison = []
+        for result in current["results"]:
+            before = baseline_medians.get((result["stage"], result["size"]))
+            after = result["median"]
+            if before is None:
+                status, ratio = 'new', None
+            else:
+                ratio = after / before if before > 0 else float('inf')
+                if after - before > min_delta and ratio > 1 + threshold:
+                    status = 'regression'
+                elif before - after > min_delta and ratio < 1 / (1 + threshold):
+                    status = 'improvement'
+                else:
+                    status = 'ok'
+            comparison.append({"stage": result["stage"], "size": result["size"], "baseline": before,
+                               "current": after, "ratio": ratio, "status": status})
+        return comparison
+
+    @staticmethod
+    def print_comparison(comparison):
+        """ Prints a comparison and returns the number of regressions. """
+        print("BENCHMARK COMPARISON WITH THE BASELINE:")
+        for entry in comparison:
+            baseline = f"{entry['baseline'] * 1000:10.2f}" if entry['baseline'] is not None else f"{'-':>10}"
+            ratio = f"{entry['ratio']:6.2f}x" if entry['ratio'] is not None else f"{'':>7}"
+            print(f"  {entry['stage']:<45} {entry['size']:>9} {baseline} ms -> {entry['current'] * 1000:10.2f} ms "
+                  f"{ratio}  {entry['status'].upper() if entry['status'] == 'regression' else entry['status']}")
+        regressions = sum(entry["status"] == 'regression' for entry in comparison)
+        print(f"{regressions} regression(s)\n")
+        return regressions
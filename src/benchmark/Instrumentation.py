@@ -0,0 +1,238 @@
+import contextlib
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+
+
+class Instrumentation:
+    """
+        Records the wall time, CPU time, peak memory and row counts of every step of a run.
+
+        The Run* orchestrators wrap each of their steps in step(), which appends one record to the run log:
+        the step and component names, its parent step, the wall and CPU (process) seconds, the peak memory
+        allocated by Python during the step (tracemalloc) and the resident set size after it, and the rows
+        going in and out. Nested steps are recorded too, and count in the peak memory of their parents.
+        A disabled instrumentation (the default of the orchestrators) records nothing and costs nothing.
+
+        With profile, the steps also run under cProfile: the hottest functions of each step are added to its
+        record and, with profile_dir, its full profile is saved as '<step>.prof' (e.g. for snakeviz). The
+        profiler of a step is paused while its nested steps run, so each profile only covers its own step.
+
+        The run log can be written as json or in the Prometheus text format, e.g. for the textfile
+        collector of a node exporter.
+
+        Attributes:
+        ----------
+        enabled : bool
+            Whether steps are recorded.
+        trace_memory : bool
+            Whether the peak memory of the steps is traced with tracemalloc (which slows Python code down).
+        profile : bool or set
+            Whether the steps are profiled with cProfile, or the names of the steps profiled.
+        profile_dir : str
+            Folder the .prof files are saved to (None keeps only the hottest functions in the records).
+        profile_top : int
+            Number of hottest functions (by cumulative time) kept in the record of a profiled step.
+        run_name : str
+            Name of the run, a label of every exported metric.
+        records : list
+            One dict per finished step, in the order they finished.
+
+        Methods:
+        -------
+        step(name, component, rows):
+            Context manager recording one step.
+        to_dict():
+            Returns the run log.
+        to_json(path):
+            Writes the run log as json.
+        to_prometheus():
+            Returns the run log in the Prometheus text format.
+        write_prometheus(path):
+            Writes the Prometheus text to a file.
+        print_summary():
+            Prints a table of the recorded steps.
+    """
+
+    metric_prefix = 'smartphones_step'
+
+    def __init__(self, enabled=True, trace_memory=True, profile=False, profile_dir=None, profile_top=15,
+                 run_name=None):
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.profile = profile if isinstance(profile, bool) else set(profile)
+        self.profile_dir = profile_dir
+        self.profile_top = profile_top
+        self.run_name = run_name or datetime.datetime.now().strftime('run_%Y%m%d_%H%M%S')
+        self.records = []
+        self._started = time.perf_counter()
+        self._created = datetime.datetime.now().isoformat(timespec='seconds')
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Stacks of the open steps and profilers of each thread
+        self._started_tracing = False
+
+    @staticmethod
+    def _rss_bytes():
+        """ Returns the peak resident set size of the process, in bytes. """
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if sys.platform == 'darwin' else max_rss * 1024  # Kilobytes on Linux
+
+    @staticmethod
+    def _count_rows(rows):
+        """ Returns the row count given by rows (a callable), None if there is none. """
+        if rows is None:
+            return None
+        try:
+            return int(rows())
+        except Exception:
+            return None
+
+    def _profile_stats(self, profiler, name):
+        """ Returns the hottest functions of a profile, saving it to profile_dir as '<name>.prof' when set. """
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{name}.prof"))
+        stats = pstats.Stats(profiler, stream=io.StringIO()).sort_stats('cumulative')
+        hottest = []
+        for (file_name, line, function), (_, n_calls, total, cumulative, _) in list(stats.stats.items()):
+            hottest.append({"function": f"{os.path.basename(file_name)}:{line}({function})", "calls": n_calls,
+                            "total_seconds": total, "cumulative_seconds": cumulative})
+        hottest.sort(key=lambda entry: entry["cumulative_seconds"], reverse=True)
+        return hottest[:self.profile_top]
+
+    @contextlib.contextmanager
+    def step(self, name, component=None, rows=None):
+        """
+        Records the step run in the with block. rows is a callable returning the number of rows the step
+        works on (e.g. lambda: len(dataset.get_df())): it is called before and after the step.
+        Yields the record, so the step can add its own fields to it.
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        stack = self._local.__dict__.setdefault('stack', [])
+        profilers = self._local.__dict__.setdefault('profilers', [])
+        record = {"run": self.run_name, "step": name, "component": component,
+                  "parent": stack[-1]["step"] if stack else None, "depth": len(stack),
+                  "rows_in": self._count_rows(rows), "status": 'ok'}
+
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)  # The parent's peak until now
+            tracemalloc.reset_peak()
+            record["_start_memory"], record["_peak"] = current, current
+
+        profiler = None
+        if self.profile is True or (self.profile and name in self.profile):
+            profiler = cProfile.Profile()
+            if profilers:
+                profilers[-1].disable()  # Only one profiler can run at a time
+            profilers.append(profiler)
+
+        stack.append(record)
+        start_offset = time.perf_counter() - self._started
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        except BaseException as e:
+            record["status"], record["error"] = 'error', f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if profiler:
+                profiler.disable()
+                profilers.pop()
+            record["wall_seconds"] = time.perf_counter() - wall_start
+            record["cpu_seconds"] = time.process_time() - cpu_start
+            record["start_seconds"] = start_offset
+            stack.pop()
+
+            if self.trace_memory:
+                peak = max(record.pop("_peak"), tracemalloc.get_traced_memory()[1])
+                record["peak_memory_bytes"] = max(0, peak - record.pop("_start_memory"))
+                if stack:
+                    stack[-1]["_peak"] = max(stack[-1]["_peak"], peak)
+                    tracemalloc.reset_peak()
+                elif self._started_tracing:
+                    tracemalloc.stop()  # Python code runs at full speed again between the runs
+                    self._started_tracing = False
+            record["max_rss_bytes"] = self._rss_bytes()
+            record.setdefault("rows_out", self._count_rows(rows))  # Unless the step set it itself
+            if profiler:
+                record["profile"] = self._profile_stats(profiler, f"{component}.{name}" if component else name)
+
+            with self._lock:
+                self.records.append(record)
+            if profiler and profilers:
+                profilers[-1].enable()  # Resumes the profiler of the parent step
+
+    def to_dict(self):
+        """ Returns the run log: the run name, its start time and the records of the steps. """
+        return {"run": self.run_name, "created": self._created,
+                "wall_seconds": time.perf_counter() - self._started, "steps": self.records}
+
+    def to_json(self, path):
+        """ Writes the run log to a json file. """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print(f"Run log of {len(self.records)} steps written to {path}")
+
+    @staticmethod
+    def _label(value):
+        """ Returns value escaped for a Prometheus label. """
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def to_prometheus(self):
+        """ Returns the run log in the Prometheus text exposition format, one gauge per measurement. """
+        metrics = (('wall_seconds', "Wall-clock time of the step in seconds."),
+                   ('cpu_seconds', "CPU time of the process during the step in seconds."),
+                   ('peak_memory_bytes', "Peak memory allocated by Python during the step in bytes."),
+                   ('max_rss_bytes', "Peak resident set size of the process after the step in bytes."),
+                   ('rows_out', "Number of rows after the step."))
+        lines = []
+        for field, description in metrics:
+            samples = [record for record in self.records if record.get(field) is not None]
+            if not samples:
+                continue
+            metric = f"{self.metric_prefix}_{field}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} gauge")
+            for record in samples:
+                labels = ','.join(f'{key}="{self._label(record[key] or "")}"'
+                                  for key in ('run', 'component', 'step', 'parent', 'status'))
+                lines.append(f"{metric}{{{labels}}} {record[field]}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """ Writes the Prometheus text to path. """
+        with open(path, 'w') as f:
+            f.write(self.to_prometheus())
+        print(f"Prometheus metrics of {len(self.records)} steps written to {path}")
+
+    def print_summary(self):
+        """ Prints the recorded steps in the order they started, indented under their parents. """
+        print(f"RUN LOG ({self.run_name}):")
+        print(f"  {'step':<50} {'wall s':>9} {'cpu s':>9} {'peak MB':>9} {'rows':>10}")
+        for record in sorted(self.records, key=lambda entry: entry["start_seconds"]):
+            name = '  ' * record["depth"] + (f"{record['component']}." if record["component"] else '') + \
+                record["step"]
+            peak = record.get("peak_memory_bytes")
+            print(f"  {name:<50} {record['wall_seconds']:9.3f} {record['cpu_seconds']:9.3f} "
+                  f"{peak / 2 ** 20 if peak is not None else float('nan'):9.1f} "
+                  f"{record['rows_out'] if record['rows_out'] is not None else '':>10}"
+                  f"{'  ' + record['status'].upper() if record['status'] != 'ok' else ''}")
+        print()
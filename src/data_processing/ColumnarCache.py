@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+
+class ColumnarCache:
+    """
+        A columnar binary (.npz) cache kept next to a csv file.
+
+        Numerical columns are stored as their raw NumPy arrays and string columns as integer codes plus
+        the array of unique values, so loading the cache is a few memory copies instead of csv parsing.
+        The cache records the sha256 hash of the csv it was built from and is only used while the csv
+        still has that hash. A DataFrame with an object or category column holding anything but strings
+        (e.g. numbers or booleans mixed in) isn't cached, since it wouldn't come back with the same values:
+        write() raises a TypeError and load() keeps parsing the csv.
+
+        Attributes:
+        ----------
+        csv_path : str
+            Path of the source csv file.
+        cache_path : str
+            Path of the .npz cache ('<csv name>.npz' in the same folder).
+
+        Methods:
+        -------
+        load():
+            Returns the csv as a DataFrame, from the cache when it is up to date.
+        file_hash(path):
+            Returns the sha256 hash of a file.
+        write(df, path, source_hash):
+            Writes a DataFrame in the columnar format.
+        read(path):
+            Reads a DataFrame written by write() and its source hash.
+    """
+
+    def __init__(self, csv_path):
+        self.csv_path = csv_path
+        self.cache_path = os.path.splitext(csv_path)[0] + '.npz'
+
+    @staticmethod
+    def file_hash(path):
+        """ Returns the sha256 hash of the file contents. """
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        return sha.hexdigest()
+
+    @staticmethod
+    def write(df, path, source_hash=None):
+        """
+        Writes df to path in the columnar format, recording the hash of the csv it comes from.
+        Raises a TypeError, without writing anything, when a non-numerical column holds non-string values.
+        """
+        arrays, columns = {}, []
+        for index, (col, series) in enumerate(df.items()):
+            if pd.api.types.is_numeric_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+                arrays[f"values_{index}"] = series.to_numpy()
+                columns.append({"name": col, "kind": "numeric"})
+            else:
+                # Strings (object or category dtype) are stored as codes into their unique values, -1 for nulls
+                codes, uniques = pd.factorize(series.astype(object))
+                if len(uniques) and pd.api.types.infer_dtype(uniques, skipna=True) != 'string':
+                    raise TypeError(f"Column '{col}' holds non-string values and can't be stored as strings")
+                arrays[f"codes_{index}"] = codes.astype(np.int32)
+                arrays[f"uniques_{index}"] = np.asarray(uniques, dtype=str)
+                kind = "category" if isinstance(series.dtype, pd.CategoricalDtype) else "string"
+                columns.append({"name": col, "kind": kind})
+
+        header = {"source_hash": source_hash, "n_rows": len(df), "columns": columns}
+        np.savez(path, header=np.array(json.dumps(header)), **arrays)
+
+    @staticmethod
+    def read(path):
+        """ Reads a DataFrame written by write(). Returns the DataFrame and the hash of its source csv. """
+        with np.load(path, allow_pickle=False) as data:
+            header = json.loads(str(data['header']))
+            columns = {}
+            for index, column in enumerate(header["columns"]):
+                if column["kind"] == "numeric":
+                    columns[column["name"]] = data[f"values_{index}"]
+                else:
+                    codes = data[f"codes_{index}"]
+                    uniques = np.append(data[f"uniques_{index}"].astype(object), np.nan)
+                    values = uniques[codes]  # Code -1 picks the trailing NaN
+                    columns[column["name"]] = (pd.Categorical(values) if column["kind"] == "category" else values)
+
+        return pd.DataFrame(columns, index=pd.RangeIndex(header["n_rows"])), header["source_hash"]
+
+    def load(self):
+        """
+        Returns the csv as a DataFrame. The cache is used when its source hash matches the csv,
+        otherwise the csv is parsed and the cache is (re)built for the next load.
+        """
+        csv_hash = self.file_hash(self.csv_path)
+
+        if os.path.exists(self.cache_path):
+            try:
+                df, source_hash = self.read(self.cache_path)
+                if source_hash == csv_hash:
+                    return df
+            except Exception as e:
+                print(f"Ignoring unreadable cache {self.cache_path}: {e}")
+
+        df = pd.read_csv(self.csv_path)
+        try:
+            self.write(df, self.cache_path, csv_hash)
+        except (OSError, TypeError) as e:
+            print(f"Could not write cache {self.cache_path}: {e}")
+        return df
@@ -0,0 +1,203 @@
+import json
+import time
+import numpy as np
+import pandas as pd
+
+
+class DataQualityError(ValueError):
+    """ Raised by a fail-fast data quality gate. The report that failed is kept in its report attribute. """
+
+    def __init__(self, report, issues):
+        super().__init__("Data quality check failed:\n  " + "\n  ".join(issues))
+        self.report = report
+        self.issues = issues
+
+
+class DataQualityReport:
+    """
+        The result of a DataQualityScanner scan: one dict of checks and statistics per column.
+
+        Numerical columns report nulls, negatives, non-numeric values, the value range, the quartiles and
+        the number of IQR and MAD outliers. Categorical columns report nulls, non-string values, the number
+        of unique values and the most frequent ones.
+
+        Attributes:
+        ----------
+        n_rows : int
+            Number of rows scanned.
+        columns : dict
+            Column name -> dict of checks and statistics.
+        scan_seconds : float
+            Duration of the scan.
+
+        Methods:
+        -------
+        issues(fail_on, max_null_fraction, max_outlier_fraction):
+            Returns the failed checks as messages.
+        raise_for_issues(fail_on, max_null_fraction, max_outlier_fraction):
+            Raises a DataQualityError when a check failed.
+        to_dict():
+            Returns the report as a dict.
+        to_json(path):
+            Returns the report as json, and writes it to path when given.
+        to_frame(kind):
+            Returns the numerical or categorical columns as a dataframe.
+    """
+
+    def __init__(self, n_rows, columns, scan_seconds):
+        self.n_rows = n_rows
+        self.columns = columns
+        self.scan_seconds = scan_seconds
+
+    def issues(self, fail_on=('negatives', 'non_numeric', 'non_string'), max_null_fraction=None,
+               max_outlier_fraction=None):
+        """
+        Returns a message for every failed check: a column with values counted by one of the fail_on checks,
+        a column with more than max_null_fraction nulls, or with more than max_outlier_fraction IQR outliers.
+        """
+        labels = {"negatives": "negative", "non_numeric": "non-numeric", "non_string": "non-string",
+                  "iqr_outliers": "IQR outlier", "mad_outliers": "MAD outlier"}
+        issues = []
+        for col, stats in self.columns.items():
+            for check in fail_on:
+                if stats.get(check):
+                    issues.append(f"'{col}': {stats[check]} {labels.get(check, check)} values")
+            if max_null_fraction is not None and self.n_rows and stats["nulls"] / self.n_rows > max_null_fraction:
+                issues.append(f"'{col}': {stats['nulls'] / self.n_rows:.1%} null values "
+                              f"(at most {max_null_fraction:.1%} allowed)")
+            if (max_outlier_fraction is not None and self.n_rows
+                    and stats.get("iqr_outliers", 0) / self.n_rows > max_outlier_fraction):
+                issues.append(f"'{col}': {stats['iqr_outliers'] / self.n_rows:.1%} IQR outliers "
+                              f"(at most {max_outlier_fraction:.1%} allowed)")
+        return issues
+
+    def raise_for_issues(self, fail_on=('negatives', 'non_numeric', 'non_string'), max_null_fraction=None,
+                         max_outlier_fraction=None):
+        """ Raises a DataQualityError listing the failed checks, if any. Returns the report otherwise. """
+        issues = self.issues(fail_on, max_null_fraction, max_outlier_fraction)
+        if issues:
+            raise DataQualityError(self, issues)
+        return self
+
+    def to_dict(self):
+        """ Returns the report as a dict. """
+        return {"n_rows": self.n_rows, "scan_seconds": round(self.scan_seconds, 4), "columns": self.columns}
+
+    def to_json(self, path=None):
+        """ Returns the report as json, and writes it to path when given. """
+        text = json.dumps(self.to_dict(), indent=2)
+        if path:
+            with open(path, 'w') as f:
+                f.write(text)
+        return text
+
+    def to_frame(self, kind='numerical'):
+        """ Returns the statistics of the numerical (or categorical) columns as a dataframe, one row per column. """
+        rows = {col: {key: value for key, value in stats.items() if key != "kind"}
+                for col, stats in self.columns.items() if stats["kind"] == kind}
+        return pd.DataFrame.from_dict(rows, orient='index')
+
+
+class DataQualityScanner:
+    """
+        Scans every column of a dataframe for data quality problems with vectorized NumPy operations.
+
+        Each numerical column is converted once to a float64 array, from which the nulls, negatives,
+        non-numeric values, value range, quartiles and the IQR (Tukey fences) and MAD (modified z-score)
+        outliers are all computed. Each categorical column is factorized once, so the type check of its
+        values runs on the unique values only instead of on every row. The result is a DataQualityReport,
+        and gate() turns the scan into a fail-fast pipeline check.
+
+        Attributes:
+        ----------
+        numerical_features : list
+            Columns checked as numerical (other numeric-dtype columns are added automatically).
+        categorical_features : list
+            Columns checked as categorical (other non-numeric columns are added automatically).
+        iqr_factor : float
+            Values below Q1 - iqr_factor * IQR or above Q3 + iqr_factor * IQR are IQR outliers.
+        mad_threshold : float
+            Values with a modified z-score 0.6745 * |x - median| / MAD above it are MAD outliers.
+        top_values : int
+            Number of most frequent values reported for categorical columns.
+
+        Methods:
+        -------
+        scan(df):
+            Returns the DataQualityReport of df.
+        gate(df, fail_on, max_null_fraction, max_outlier_fraction):
+            Scans df and raises a DataQualityError when a check fails.
+    """
+
+    def __init__(self, numerical_features=(), categorical_features=(), iqr_factor=1.5, mad_threshold=3.5,
+                 top_values=5):
+        self.numerical_features = list(numerical_features)
+        self.categorical_features = list(categorical_features)
+        self.iqr_factor = iqr_factor
+        self.mad_threshold = mad_threshold
+        self.top_values = top_values
+
+    def _column_kinds(self, df):
+        """ Returns (numerical columns, categorical columns) of df, declared ones first. """
+        numerical = [col for col in self.numerical_features if col in df.columns]
+        categorical = [col for col in self.categorical_features if col in df.columns]
+        for col, dtype in df.dtypes.items():
+            if col in numerical or col in categorical:
+                continue
+            is_numeric = pd.api.types.is_numeric_dtype(dtype) and not isinstance(dtype, pd.CategoricalDtype)
+            (numerical if is_numeric else categorical).append(col)
+        return numerical, categorical
+
+    def _scan_numerical(self, values):
+        """ Returns the checks and statistics of a numerical column. """
+        coerced = 0  # Non-null values that aren't numbers, they become NaN in the float array
+        if not pd.api.types.is_numeric_dtype(values.dtype) or isinstance(values.dtype, pd.CategoricalDtype):
+            numeric = pd.to_numeric(values.astype(object), errors='coerce')
+            coerced = int((values.notna() & numeric.isna()).sum())
+            values = numeric
+        array = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        finite = array[np.isfinite(array)]
+
+        stats = {"kind": "numerical", "nulls": int(np.isnan(array).sum()) - coerced,
+                 "negatives": int((finite < 0).sum()),
+                 "non_numeric": coerced + int(np.isinf(array).sum())}  # inf is not a usable number either
+        if finite.size == 0:
+            return {**stats, "min": None, "max": None, "mean": None, "q1": None, "median": None, "q3": None,
+                    "iqr_outliers": 0, "mad_outliers": 0}
+
+        q1, median, q3 = np.quantile(finite, [0.25, 0.5, 0.75])
+        iqr = q3 - q1
+        iqr_outliers = (finite < q1 - self.iqr_factor * iqr) | (finite > q3 + self.iqr_factor * iqr)
+        deviations = np.abs(finite - median)
+        mad = np.median(deviations)
+        mad_outliers = int((0.6745 * deviations > self.mad_threshold * mad).sum()) if mad > 0 else 0
+
+        return {**stats, "min": float(finite.min()), "max": float(finite.max()), "mean": float(finite.mean()),
+                "q1": float(q1), "median": float(median), "q3": float(q3),
+                "iqr_outliers": int(iqr_outliers.sum()), "mad_outliers": mad_outliers}
+
+    def _scan_categorical(self, values):
+        """ Returns the checks and statistics of a categorical column. """
+        codes, uniques = pd.factorize(values)  # Hashes every row once, nulls get the code -1
+        uniques = np.asarray(uniques, dtype=object)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        is_string = np.fromiter((isinstance(value, str) for value in uniques), dtype=bool, count=len(uniques))
+        top = np.argsort(-counts, kind='stable')[:self.top_values]
+
+        return {"kind": "categorical", "nulls": int((codes < 0).sum()), "non_string": int(counts[~is_string].sum()),
+                "unique": int(len(uniques)),
+                "top_values": {str(uniques[index]): int(counts[index]) for index in top}}
+
+    def scan(self, df):
+        """ Returns the DataQualityReport of every column of df. """
+        start = time.perf_counter()
+        numerical, categorical = self._column_kinds(df)
+        columns = {col: self._scan_numerical(df[col]) for col in numerical}
+        columns.update({col: self._scan_categorical(df[col]) for col in categorical})
+        columns = {col: columns[col] for col in df.columns if col in columns}  # In the dataframe's column order
+        return DataQualityReport(len(df), columns, time.perf_counter() - start)
+
+    def gate(self, df, fail_on=('negatives', 'non_numeric', 'non_string'), max_null_fraction=None,
+             max_outlier_fraction=None):
+        """ Scans df and raises a DataQualityError when a check fails. Returns the report otherwise. """
+        return self.scan(df).raise_for_issues(fail_on, max_null_fraction, max_outlier_fraction)
@@ -0,0 +1,106 @@
+from src.data_processing.SmartphonesDataset import SmartphonesDataset
+import threading
+
+
+class DatasetRegistry:
+    """
+       A singleton registry of named datasets (e.g. 'raw' and 'cleaned'), shared by concurrent consumers.
+
+       Every dataset is loaded on first use, under a lock of its own, so threads asking for the same
+       dataset at the same time load it once and threads asking for different datasets don't wait for
+       each other. Consumers get copy-on-write views: the data is shared instead of copied, and a consumer
+       writing to its view (e.g. adding a derived column) copies only what it writes, so EDA and model
+       training can run at the same time on one dataset without copying or corrupting it. A new version
+       of a dataset is published by swapping its dataframe; views taken before keep the previous version.
+
+       Attributes:
+       ----------
+       default_paths : dict
+           Class-level csv paths of the datasets registered by default.
+
+       Methods:
+       -------
+       register(name, dataset_path, compact):
+           Registers a dataset, loaded from dataset_path on first use.
+       get(name):
+           Returns the SmartphonesDataset of a name, loading it on first use.
+       get_view(name):
+           Returns a copy-on-write view of the dataframe of a name.
+       publish(name, df):
+           Makes df the dataframe of a name, replacing the previous version.
+       names():
+           Returns the registered names.
+       remove(name):
+           Forgets a dataset.
+    """
+
+    default_paths = {
+        'raw': '../../datasets/smartphones.csv',
+        'cleaned': '../../datasets/cleaned_smartphones.csv',
+    }
+
+    _instance = None  # Class-level attribute to hold the single instance
+    _instance_lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        """ Ensures only one registry is created, even when threads create it at the same time. """
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(DatasetRegistry, cls).__new__(cls)
+                cls._instance._lock = threading.Lock()
+                cls._instance._entries = {}
+                for name, dataset_path in cls.default_paths.items():
+                    cls._instance._entries[name] = cls._new_entry(dataset_path, True)
+        return cls._instance
+
+    @staticmethod
+    def _new_entry(dataset_path, compact):
+        """ Returns the registry entry of a dataset that is loaded on first use. """
+        return {"path": dataset_path, "compact": compact, "dataset": None, "lock": threading.Lock()}
+
+    def _entry(self, name):
+        """ Returns the entry of a name, raising a KeyError listing the registered names if it's unknown. """
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is None:
+            raise KeyError(f"Unknown dataset '{name}', registered datasets: {', '.join(self.names())}")
+        return entry
+
+    def register(self, name, dataset_path, compact=True):
+        """ Registers a dataset loaded from dataset_path on first use, replacing any dataset of that name. """
+        with self._lock:
+            self._entries[name] = self._new_entry(dataset_path, compact)
+
+    def get(self, name):
+        """ Returns the SmartphonesDataset of a name, loading it on first use (once, even under concurrency). """
+        entry = self._entry(name)
+        if entry["dataset"] is None:
+            with entry["lock"]:
+                if entry["dataset"] is None:  # Another thread may have loaded it while this one waited
+                    entry["dataset"] = SmartphonesDataset.create(entry["path"], entry["compact"])
+        return entry["dataset"]
+
+    def get_view(self, name):
+        """ Returns a copy-on-write view of the dataframe of a name, loading it on first use. """
+        return self.get(name).get_view()
+
+    def publish(self, name, df):
+        """
+        Makes df the dataframe of a name (registering it if needed). The registry keeps a copy-on-write view,
+        so later writes to df by its producer don't reach the published version.
+        """
+        with self._lock:
+            entry = self._entries.setdefault(name, self._new_entry(None, False))
+        with entry["lock"]:
+            entry["dataset"] = SmartphonesDataset.from_dataframe(df, entry["path"])
+            entry["dataset"].set_df(entry["dataset"].get_view())
+
+    def names(self):
+        """ Returns the registered names. """
+        with self._lock:
+            return list(self._entries)
+
+    def remove(self, name):
+        """ Forgets a dataset; views already handed out stay valid. """
+        with self._lock:
+            self._entries.pop(name, None)
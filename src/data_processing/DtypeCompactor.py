@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+
+class DtypeCompactor:
+    """
+        A class for shrinking the memory footprint of a DataFrame without changing its values.
+
+        - Integer columns are downcast to the smallest signed integer type that holds their range.
+        - Float columns are stored as float32 when every value survives the float64 -> float32 -> float64
+          round trip exactly (e.g. 6.0, 3110.0), otherwise they stay float64 so no precision is lost.
+        - String columns whose share of distinct values is at most max_category_ratio become 'category'.
+          High-cardinality columns such as 'model' stay object.
+
+        Attributes:
+        ----------
+        max_category_ratio : float
+            Maximum distinct/total values ratio of a string column converted to 'category'.
+
+        Methods:
+        -------
+        compact(df)
+        memory_report(before_df, after_df)
+    """
+
+    def __init__(self, max_category_ratio=0.5):
+        self.max_category_ratio = max_category_ratio
+
+    def _compact_column(self, series):
+        """ Returns the series converted to the smallest dtype that keeps all of its values. """
+        if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+            return series
+
+        if pd.api.types.is_integer_dtype(series):
+            return pd.to_numeric(series, downcast='integer')
+
+        if pd.api.types.is_float_dtype(series):
+            values = series.to_numpy()
+            as_float32 = values.astype(np.float32)
+            if np.array_equal(as_float32.astype(np.float64), values, equal_nan=True):
+                return series.astype(np.float32)
+            return series
+
+        if series.dtype == object and len(series):
+            n_unique = series.nunique(dropna=True)
+            if n_unique / len(series) <= self.max_category_ratio:
+                return series.astype('category')
+        return series
+
+    def compact(self, df):
+        """ Returns a compacted copy of df, column by column. """
+        return pd.DataFrame({col: self._compact_column(series) for col, series in df.items()}, index=df.index)
+
+    @staticmethod
+    def memory_report(before_df, after_df):
+        """ Returns the per-column dtype and memory (in KB, strings included) before and after compaction. """
+        before = before_df.memory_usage(deep=True, index=False)
+        after = after_df.memory_usage(deep=True, index=False)
+        report = pd.DataFrame({
+            "dtype_before": before_df.dtypes.astype(str),
+            "dtype_after": after_df.dtypes.astype(str),
+            "kb_before": (before / 1024).round(1),
+            "kb_after": (after / 1024).round(1),
+        })
+        report.loc["TOTAL"] = ["", "", round(before.sum() / 1024, 1), round(after.sum() / 1024, 1)]
+        return report
@@ -0,0 +1,123 @@
+import json
+import os
+import time
+import requests
+
+
+class ExchangeRateProvider:
+    """
+        Provides INR exchange rates from a rate table cached on disk.
+
+        The rate table (every currency the source knows, per 1 INR) is fetched at most once per ttl_seconds
+        and shared by every conversion, so a pipeline run normally reads a small json file instead of
+        calling the API. Requests to the source time out after timeout seconds. In offline mode, or when
+        the source fails, the last cached table is used even if it is older than the TTL, and the
+        fallback rates are used when there is no cached table at all.
+
+        Attributes:
+        ----------
+        cache_path : str
+            Path of the json file holding the cached rate table and the time it was fetched.
+        ttl_seconds : float
+            Age after which the cached table is fetched again.
+        timeout : float
+            Timeout in seconds of a request to the source.
+        offline : bool
+            Never calls the source. Defaults to True when the SMARTPHONES_OFFLINE environment variable is '1'.
+        source : callable
+            source(base_currency, timeout) returns a {currency: rate} dict. Defaults to the exchangerate-api.com API.
+        last_source : str
+            Where the last rate table came from ('memory', 'cache', 'source', 'stale cache' or 'fallback').
+
+        Methods:
+        -------
+        from_static_rates(rates, **kwargs)
+        fetch_from_api(base_currency, timeout)
+        get_rates()
+        get_rate(currency)
+    """
+
+    base_currency = 'INR'
+    api_url = "https://api.exchangerate-api.com/v4/latest/{base}"
+    fallback_rates = {'USD': 0.012, 'EUR': 0.011, 'GBP': 0.0095}  # Example fallback rates (per 1 INR)
+
+    def __init__(self, cache_path='../../datasets/.exchange_rates.json', ttl_seconds=24 * 3600, timeout=3.0,
+                 offline=None, source=None):
+        self.cache_path = cache_path
+        self.ttl_seconds = ttl_seconds
+        self.timeout = timeout
+        self.offline = os.environ.get('SMARTPHONES_OFFLINE') == '1' if offline is None else offline
+        self.source = source or self.fetch_from_api
+        self.last_source = None
+        self._rates = None
+
+    @classmethod
+    def from_static_rates(cls, rates, **kwargs):
+        """ Returns a provider whose source is a fixed rate table, e.g. for tests. Nothing is cached on disk. """
+        kwargs.setdefault('cache_path', None)
+        return cls(source=lambda base_currency, timeout: dict(rates), **kwargs)
+
+    @classmethod
+    def fetch_from_api(cls, base_currency, timeout):
+        """ Fetches the latest rate table of base_currency from the API. """
+        response = requests.get(cls.api_url.format(base=base_currency), timeout=timeout)
+        response.raise_for_status()  # Raise an exception for HTTP errors
+        return response.json()['rates']
+
+    def _read_cache(self):
+        """ Returns the cached (rates, fetched_at), or None if there is no usable cache. """
+        if self.cache_path is None or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+            if cached["base"] != self.base_currency:
+                return None
+            return cached["rates"], cached["fetched_at"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable exchange rate cache {self.cache_path}: {e}")
+            return None
+
+    def _write_cache(self, rates):
+        """ Writes the rate table and the current time to the cache file. """
+        if self.cache_path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+            with open(self.cache_path, 'w') as f:
+                json.dump({"base": self.base_currency, "fetched_at": time.time(), "rates": rates}, f)
+        except OSError as e:
+            print(f"Could not write exchange rate cache {self.cache_path}: {e}")
+
+    def get_rates(self):
+        """ Returns the {currency: rate per 1 INR} table, from memory, the cache, the source or the fallback. """
+        if self._rates is not None:
+            self.last_source = 'memory'
+            return self._rates
+
+        cached = self._read_cache()
+        if cached is not None and time.time() - cached[1] < self.ttl_seconds:
+            self._rates, self.last_source = cached[0], 'cache'
+            return self._rates
+
+        if not self.offline:
+            try:
+                self._rates, self.last_source = self.source(self.base_currency, self.timeout), 'source'
+                self._write_cache(self._rates)
+                return self._rates
+            except Exception as e:
+                print(f"Error fetching exchange rates: {e}")
+
+        if cached is not None:
+            self._rates, self.last_source = cached[0], 'stale cache'
+        else:
+            self._rates, self.last_source = dict(self.fallback_rates), 'fallback'
+        return self._rates
+
+    def get_rate(self, currency):
+        """ Returns the rate of 1 INR in currency. """
+        rates = self.get_rates()
+        currency = currency.upper()
+        if currency not in rates:
+            raise KeyError(f"No exchange rate for '{currency}' ({self.last_source} rates)")
+        return rates[currency]
@@ -0,0 +1,190 @@
+import json
+import os
+import joblib
+import numpy as np
+import pandas as pd
+
+
+class Imputer:
+    """
+        A fitted imputer of the missing values of the smartphones dataset.
+
+        fit() learns every fill value at once: one mean, one median and one mode computation cover all the
+        columns of that strategy, instead of one scan per column. With group_by set (e.g. 'brand_name'),
+        the mean, median and mode of every group are learned too, with one groupby per strategy, and a
+        missing value is filled with the value of its group, or with the overall value when its group has
+        none (e.g. a brand that wasn't in the training data). The learned values are saved next to the
+        models, so missing fields of the phones given to predict_batch are filled like the training data.
+
+        Attributes:
+        ----------
+        default_strategies : dict
+            Class-level column -> (strategy, argument): ('mean', decimals), ('median', None), ('mode', None)
+            or ('constant', fill value). These are the imputations of HandleMissingValues.
+        strategies : dict
+            Column -> (strategy, argument) used by this imputer.
+        group_by : str
+            Column whose groups get their own fill values (None fills every row with the overall value).
+        fill_values : dict
+            Column -> overall fill value, after fit().
+        group_values : dict
+            Column -> {group -> fill value}, after fit() with group_by.
+
+        Methods:
+        -------
+        fit(df):
+            Learns the fill values of df.
+        transform(df, add_missing):
+            Returns df with its missing values filled.
+        fit_transform(df):
+            Fits on df and returns it filled.
+        from_fill_values(fill_values, strategies, group_by, group_values):
+            Returns an imputer with already known fill values.
+        json_path(path):
+            Returns the path of the json copy of an imputer saved at path.
+        save(path):
+            Saves the fitted imputer, with a json copy.
+        load(path):
+            Returns a saved imputer.
+    """
+
+    default_strategies = {
+        'avg_rating': ('mean', 1),
+        'processor_brand': ('constant', 'Unknown'),
+        'num_cores': ('mode', None),
+        'processor_speed': ('median', None),
+        'battery_capacity': ('median', None),
+        'fast_charging': ('constant', 0),
+        'os': ('constant', 'other'),
+        'primary_camera_front': ('mode', None),
+    }
+
+    def __init__(self, strategies=None, group_by=None):
+        self.strategies = dict(self.default_strategies if strategies is None else strategies)
+        self.group_by = group_by
+        self.fill_values = {}
+        self.group_values = {}
+
+    def _columns(self, df, strategy):
+        """ Returns the columns of df imputed with strategy. """
+        return [col for col, (col_strategy, _) in self.strategies.items()
+                if col_strategy == strategy and col in df.columns]
+
+    @staticmethod
+    def _python_value(value):
+        """ Returns a NumPy scalar as a plain Python value, so the saved fill values don't depend on NumPy types. """
+        return value.item() if isinstance(value, np.generic) else value
+
+    @staticmethod
+    def _group_modes(df, group_by, col):
+        """ Returns {group -> most frequent value of col} (the smallest one on ties, like Series.mode()). """
+        counts = df.groupby([group_by, col], observed=True).size().rename('count').reset_index()
+        counts = counts.sort_values([group_by, 'count', col], ascending=[True, False, True], kind='stable')
+        return counts.drop_duplicates(group_by).set_index(group_by)[col]
+
+    def fit(self, df):
+        """ Learns the overall (and per group) fill value of every column of the strategies present in df. """
+        mean_cols, median_cols, mode_cols = (self._columns(df, strategy) for strategy in ('mean', 'median', 'mode'))
+        fill_values = {col: argument for col, (strategy, argument) in self.strategies.items()
+                       if strategy == 'constant' and col in df.columns}
+        if mean_cols:
+            fill_values.update({col: round(value, self.strategies[col][1])
+                                for col, value in df[mean_cols].mean().items()})
+        if median_cols:
+            fill_values.update(df[median_cols].median().to_dict())
+        if mode_cols:
+            fill_values.update(df[mode_cols].mode().iloc[0].to_dict())  # Modes sorted, the first is the smallest
+        self.fill_values = {col: self._python_value(fill_values[col])
+                            for col in self.strategies if col in fill_values}  # In the order of the strategies
+
+        self.group_values = {}
+        if self.group_by is not None and self.group_by in df.columns:
+            grouped = df.groupby(self.group_by, observed=True)
+            group_values = {}
+            if mean_cols:
+                means = grouped[mean_cols].mean()
+                group_values.update({col: means[col].round(self.strategies[col][1]) for col in mean_cols})
+            if median_cols:
+                medians = grouped[median_cols].median()
+                group_values.update({col: medians[col] for col in median_cols})
+            for col in mode_cols:
+                group_values[col] = self._group_modes(df, self.group_by, col)
+            self.group_values = {col: {self._python_value(group): self._python_value(value)
+                                       for group, value in values.dropna().items()}
+                                 for col, values in group_values.items()}
+        return self
+
+    def transform(self, df, add_missing=False):
+        """
+        Returns df with the missing values of every fitted column filled (df itself isn't modified).
+        With add_missing, fitted columns absent from df are added and filled too (e.g. a phone spec left out
+        of a prediction request). Category columns are filled as plain values and converted back afterwards,
+        so the fill value doesn't have to be one of the existing categories.
+        """
+        df = df.copy(deep=False)
+        groups = None
+        if self.group_values and self.group_by in df.columns:
+            groups = df[self.group_by].astype(object)
+
+        for col, fill_value in self.fill_values.items():
+            if col not in df.columns:
+                if not add_missing:
+                    continue
+                df[col] = np.nan
+            values = df[col]
+            if not values.isnull().any():
+                continue
+
+            is_category = isinstance(values.dtype, pd.CategoricalDtype)
+            if is_category:
+                values = values.astype(object)
+            if groups is not None and col in self.group_values:
+                values = values.fillna(groups.map(self.group_values[col]))
+            values = values.fillna(fill_value)
+            df[col] = values.astype('category') if is_category else values
+        return df
+
+    def fit_transform(self, df):
+        """ Fits on df and returns it filled. """
+        return self.fit(df).transform(df)
+
+    @classmethod
+    def from_fill_values(cls, fill_values, strategies=None, group_by=None, group_values=None):
+        """
+        Returns an imputer with already known fill values (e.g. from streaming statistics). Every column keeps
+        its strategy from strategies, a column without one is recorded as a constant. group_values are the
+        already known {col: {group: fill value}} of the groups of group_by.
+        """
+        strategies = strategies or {}
+        imputer = cls({col: strategies.get(col, ('constant', value)) for col, value in fill_values.items()},
+                      group_by)
+        imputer.fill_values = {col: cls._python_value(value) for col, value in fill_values.items()}
+        imputer.group_values = {col: {cls._python_value(group): cls._python_value(value)
+                                      for group, value in values.items()}
+                                for col, values in (group_values or {}).items()}
+        return imputer
+
+    @staticmethod
+    def json_path(path):
+        """ Returns the path of the json copy of an imputer saved at path ('imputer.pkl' -> 'imputer.json'). """
+        return os.path.splitext(path)[0] + '.json'
+
+    def save(self, path):
+        """
+        Saves the fitted imputer to path, next to the model artifacts. The values are plain Python values, so
+        they are also written as json (json_path(path)), which the NumPy-only FlatPredictor reads.
+        """
+        saved = {"strategies": self.strategies, "group_by": self.group_by, "fill_values": self.fill_values,
+                 "group_values": self.group_values}
+        joblib.dump(saved, path)
+        with open(self.json_path(path), 'w') as f:
+            json.dump(saved, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """ Returns the imputer saved at path. """
+        saved = joblib.load(path)
+        imputer = cls(saved["strategies"], saved["group_by"])
+        imputer.fill_values = saved["fill_values"]
+        imputer.group_values = saved["group_values"]
+        return imputer
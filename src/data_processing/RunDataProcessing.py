@@ -1,6 +1,15 @@
 from src.data_processing.data_cleaning.HandleOutliers import HandleOutliers
 from src.data_processing.data_cleaning.HandleMissingValues import HandleMissingValues
 from src.data_processing.data_cleaning.DataProcessing import DataProcessing
+from src.data_processing.data_cleaning.StreamingDataProcessing import StreamingDataProcessing
+from src.data_processing.StagePipeline import StagePipeline
+from src.data_processing.DatasetRegistry import DatasetRegistry
+from src.data_processing.ExchangeRateProvider import ExchangeRateProvider
+from src.data_processing.Imputer import Imputer
+from src.data_processing.SmartphonesDataset import SmartphonesDataset
+from src.data_processing.ColumnarCache import ColumnarCache
+from src.data_processing.DtypeCompactor import DtypeCompactor
+from src.benchmark.Instrumentation import Instrumentation
 
 
 class RunDataProcessing:
@@ -10,45 +19,102 @@ class RunDataProcessing:
         Attributes:
         ----------
         data_processing : instance of DataProcessing class
-        handle_outliers : instance of HandleOutliers class
+        handle_outliers : instance of HandleOutliers class, the data quality scan (and fail-fast gate) of the pipeline
         handle_missing_values : instance of HandleMissingValues class
+        rate_provider : instance of ExchangeRateProvider class, the source of the exchange rates
+        instrumentation : instance of Instrumentation class, records the time, memory and rows of every step
+        dataset : the SmartphonesDataset the steps work on (the singleton when None is given)
 
         Methods:
         -------
-        run_process()
+        build_pipeline(to_currency, extra_currencies)
+        run_process(use_cache, extra_currencies, impute_group_by)
+        run_streaming_process(chunk_size, impute_group_by)
     """
 
-    def __init__(self):
-        self.data_processing = DataProcessing()
-        self.handle_outliers = HandleOutliers()
-        self.handle_missing_values = HandleMissingValues()
+    def __init__(self, rate_provider=None, quality_gate=False, quality_report_path=None, instrumentation=None,
+                 dataset=None, imputer_path='saved_models/imputer.pkl'):
+        self.rate_provider = rate_provider or ExchangeRateProvider()
+        self.data_processing = DataProcessing(self.rate_provider, dataset)
+        self.dataset = self.data_processing.dataset
+        self.handle_outliers = HandleOutliers(fail_fast=quality_gate, report_path=quality_report_path,
+                                              dataset=self.dataset)
+        self.handle_missing_values = HandleMissingValues(imputer_path, self.dataset)
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
 
-    def run_process(self):
-        """ Runs the data processing pipeline. This method is called by the main script."""
+    def build_pipeline(self, to_currency='USD', extra_currencies=(), impute_group_by=None):
+        """
+        Declares the data processing steps as the stages of a StagePipeline. The exchange rates are only
+        fetched when the conversion stage runs, so a pipeline loaded from the stage cache doesn't wait on
+        the rate source (use_cache=False converts with the current rates again).
+        extra_currencies are added as 'price_<currency>' columns next to the converted price.
+        impute_group_by (e.g. 'brand_name') fills the nulls with per-group values.
+        Every stage declares the helpers it calls as dependencies, so changing one re-runs the stage, and
+        the fitted imputer is cached with the output of impute_nulls.
+        """
+        dp, ho, hmv = self.data_processing, self.handle_outliers, self.handle_missing_values
+        pipeline = StagePipeline(dp.dataset, dp.dataset.get_dataset_path(), instrumentation=self.instrumentation,
+                                 input_dependencies=(SmartphonesDataset, ColumnarCache, DtypeCompactor))
 
         # General description of the dataset
-        self.data_processing.get_shape()
-        self.data_processing.get_info()
-        self.data_processing.get_description()
-        self.data_processing.get_null_columns()
-
-        self.data_processing.drop_fast_charging_available_col()  # dropping fast_charging_available column
-        self.data_processing.convert_inr_to_usd()  # converting price
-        self.data_processing.deduplication()  # remove the duplicates
-
-        # Handling outliers
-        self.handle_outliers.check_num_features_for_outliers()
-        self.handle_outliers.check_categorical_features_for_outliers()
-
-        # Handling null values
-        self.handle_missing_values.fill_avg_rating_nulls()
-        self.handle_missing_values.fill_processor_brand_nulls()
-        self.handle_missing_values.fill_num_cores_nulls()
-        self.handle_missing_values.fill_processor_speed_nulls()
-        self.handle_missing_values.fill_battery_capacity_nulls()
-        self.handle_missing_values.fill_fast_charging_nulls()
-        self.handle_missing_values.fill_os_nulls()
-        self.handle_missing_values.fill_primary_camera_front_nulls()
-
-        self.data_processing.save_cleaned_data()  # Saving the cleaned data in its own csv file
-        print()
\ No newline at end of file
+        pipeline.add_stage('get_shape', dp.get_shape, report=True)
+        pipeline.add_stage('get_info', dp.get_info, report=True)
+        pipeline.add_stage('get_description', dp.get_description, report=True)
+        pipeline.add_stage('get_null_columns', dp.get_null_columns, report=True)
+
+        pipeline.add_stage('drop_fast_charging_available_col', dp.drop_fast_charging_available_col)
+        pipeline.add_stage('convert_inr_to_usd', dp.convert_inr_to_usd,
+                           {'to_currency': to_currency, 'extra_currencies': tuple(extra_currencies)},
+                           dependencies=(dp.fetch_exchange_rates, dp.fetch_exchange_rate, ExchangeRateProvider))
+        pipeline.add_stage('deduplication', dp.deduplication)
+
+        # Handling outliers (a fail-fast gate when quality_gate is set: invalid values stop the pipeline here)
+        pipeline.add_stage('scan_data_quality', ho.scan_data_quality, report=True)
+
+        # Handling null values (every column at once, with a fitted Imputer saved next to the models)
+        imputer_artifacts = (hmv.imputer_path, Imputer.json_path(hmv.imputer_path)) if hmv.imputer_path else ()
+        pipeline.add_stage('impute_nulls', hmv.impute_nulls, {'group_by': impute_group_by}, dependencies=(Imputer,),
+                           artifacts=imputer_artifacts)
+        return pipeline
+
+    def run_process(self, use_cache=True, extra_currencies=(), impute_group_by=None):
+        """
+        Runs the data processing pipeline. This method is called by the main script.
+        extra_currencies are added as 'price_<currency>' columns (they are not used as model features).
+        Stages whose input, parameters and code haven't changed since the last run are loaded from the
+        stage cache instead of being run again (use_cache=False runs every stage).
+        The cleaned dataframe is also published as the 'cleaned' dataset of the DatasetRegistry.
+        """
+        step = self.instrumentation.step
+        rows = lambda: len(self.data_processing.dataset.get_df())
+        with step('run_process', 'process', rows):
+            pipeline = self.build_pipeline(extra_currencies=extra_currencies, impute_group_by=impute_group_by)
+            ran = pipeline.run(use_cache)
+            if self.handle_outliers.fail_fast and 'scan_data_quality' not in ran:
+                # Resumed after the scan from cached outputs: gate the cleaned data instead of letting it through
+                with step('scan_data_quality', 'process', rows):
+                    self.handle_outliers.scan_data_quality()
+
+            with step('save_cleaned_data', 'process', rows):
+                self.data_processing.save_cleaned_data()  # Saving the cleaned data in its own csv file
+            DatasetRegistry().publish('cleaned', self.data_processing.dataset.get_df())
+        print()
+
+    @staticmethod
+    def run_streaming_process(chunk_size=100_000, input_path='../../datasets/smartphones.csv',
+                              output_path='../../datasets/cleaned_smartphones.csv', extra_currencies=(),
+                              rate_provider=None, instrumentation=None, impute_group_by=None):
+        """
+        Runs the cleaning steps of the pipeline out of core, reading the raw csv in chunks of chunk_size rows.
+        It is a static method because creating RunDataProcessing loads the whole dataset into memory.
+        impute_group_by (e.g. 'brand_name') fills the nulls with per-group values, like run_process.
+        """
+        instrumentation = instrumentation or Instrumentation(enabled=False)
+        with instrumentation.step('run_streaming_process', 'process') as record:
+            rows_written = StreamingDataProcessing(input_path, output_path, chunk_size,
+                                                   extra_currencies=extra_currencies,
+                                                   rate_provider=rate_provider,
+                                                   group_by=impute_group_by).run_process()
+            if record is not None:
+                record["rows_out"] = rows_written
+        return rows_written
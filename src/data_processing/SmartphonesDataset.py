@@ -1,5 +1,9 @@
+from src.data_processing.ColumnarCache import ColumnarCache
+from src.data_processing.DtypeCompactor import DtypeCompactor
+import threading
 import pandas as pd
 
+
 class SmartphonesDataset:
     """
        A singleton class to manage the dataset for smartphone analysis.
@@ -7,6 +11,11 @@ class SmartphonesDataset:
        This class ensures that only one instance of the dataset is created and provides access to
        its attributes and data via getter methods. It handles loading the dataset, defining
        numerical and categorical attributes, and providing the target variable.
+       Creation and initialization are locked, so threads starting at the same time load it only once.
+       Independent (non-singleton) datasets can be created with create() or from_dataframe(), e.g. for
+       the entries of a DatasetRegistry.
+       The csv is loaded through a columnar binary cache kept next to it, so it is only parsed
+       again when its contents change.
 
        Attributes:
        ----------
@@ -23,65 +32,130 @@ class SmartphonesDataset:
 
        Methods:
        -------
+       create(dataset_path, compact):
+           Returns a new dataset loaded from dataset_path, independent of the singleton.
+       from_dataframe(df, dataset_path):
+           Returns a new dataset holding df, independent of the singleton.
        get_dataframe():
            Returns the loaded dataframe.
+       get_view():
+           Returns a copy-on-write view of the dataframe, for read-only consumers.
+       set_df(df):
+           Replaces the dataframe (e.g. with a cached pipeline output).
+       get_dataset_path():
+           Returns the path of the csv the dataset was loaded from.
        get_target_variable():
            Returns the target variable.
        get_numerical_attributes():
            Returns the list of numerical attributes.
        get_categorical_attributes():
            Returns the list of categorical attributes.
+       compact_dtypes():
+           Downcasts the dataframe to compact dtypes and returns the per-column memory report.
     """
 
     _instance = None  # Class-level attribute to hold the single instance
+    _instance_lock = threading.Lock()
+    _init_lock = threading.RLock()
 
     def __new__(cls, *args, **kwargs):
         """
         Overrides the default behavior of instance creation to ensure only one instance is created.
         """
-        if cls._instance is None:
-            cls._instance = super(SmartphonesDataset, cls).__new__(cls)
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = super(SmartphonesDataset, cls).__new__(cls)
         return cls._instance
 
-    def __init__(self, dataset_path='../../datasets/smartphones.csv'):
+    def __init__(self, dataset_path='../../datasets/smartphones.csv', compact=True):
         """
         Initializes the SmartphonesDataset class by loading the dataset and defining key attributes.
-        Ensures initialization happens only once.
+        If compact is True, the dataframe is converted to compact dtypes right after loading.
+        Ensures initialization happens only once. When loading fails the error is raised and the
+        dataset isn't marked as initialized, so the next construction tries again.
         """
-        if not hasattr(self, "initialized"):  # Avoid reinitialization
-            if dataset_path is not None:
-                try:
-                    # Load the dataset
-                    self._df = pd.read_csv(dataset_path)
-
-                    # Define the target variable
-                    self._target_variable = 'price'
-
-                    # Define the numerical attributes
-                    self._numerical_attributes = [
-                        'price', 'avg_rating', '5G_or_not', 'num_cores', 'processor_speed', 'battery_capacity',
-                        'fast_charging', 'ram_capacity', 'internal_memory', 'screen_size', 'refresh_rate',
-                        'num_rear_cameras', 'primary_camera_rear', 'primary_camera_front',
-                        'extended_memory_available', 'resolution_height', 'resolution_width'
-                    ]
-
-                    # Define the categorical attributes
-                    self._categorical_attributes = ['brand_name', 'processor_brand', 'os']
-
-                    print("SmartphonesDataset initialized successfully.")
-                except FileNotFoundError:
-                    print(f"Error: File not found at path: {dataset_path}")
-                except Exception as e:
-                    print(f"An error occurred during initialization: {e}")
-            else:
-                raise ValueError("Dataset path must be provided for the first initialization.")
-
-            self.initialized = True  # Mark as initialized
+        with self._init_lock:
+            if not hasattr(self, "initialized"):  # Avoid reinitialization
+                if dataset_path is not None:
+                    self._load(dataset_path, compact)
+                else:
+                    raise ValueError("Dataset path must be provided for the first initialization.")
+
+                self.initialized = True  # Mark as initialized
+
+    @classmethod
+    def create(cls, dataset_path, compact=True):
+        """ Returns a new dataset loaded from dataset_path, independent of the singleton. """
+        dataset = object.__new__(cls)
+        dataset._load(dataset_path, compact)
+        dataset.initialized = True
+        return dataset
+
+    @classmethod
+    def from_dataframe(cls, df, dataset_path=None):
+        """ Returns a new dataset holding df (e.g. a cleaned dataframe), independent of the singleton. """
+        dataset = object.__new__(cls)
+        dataset._df = df
+        dataset._dataset_path = dataset_path
+        dataset._define_attributes()
+        dataset.initialized = True
+        return dataset
+
+    def _define_attributes(self):
+        """ Defines the target variable and the numerical and categorical attributes. """
+        # Define the target variable
+        self._target_variable = 'price'
+
+        # Define the numerical attributes
+        self._numerical_attributes = [
+            'price', 'avg_rating', '5G_or_not', 'num_cores', 'processor_speed', 'battery_capacity',
+            'fast_charging', 'ram_capacity', 'internal_memory', 'screen_size', 'refresh_rate',
+            'num_rear_cameras', 'primary_camera_rear', 'primary_camera_front',
+            'extended_memory_available', 'resolution_height', 'resolution_width'
+        ]
+
+        # Define the categorical attributes
+        self._categorical_attributes = ['brand_name', 'processor_brand', 'os']
+
+    def _load(self, dataset_path, compact):
+        """ Loads the dataset (from the columnar cache when the csv hasn't changed) and defines its attributes. """
+        try:
+            self._df = ColumnarCache(dataset_path).load()
+            self._dataset_path = dataset_path
+            self._define_attributes()
+
+            if compact:
+                print("MEMORY USAGE BEFORE AND AFTER DTYPE COMPACTION:")
+                print(self.compact_dtypes(), '\n')
+
+            print("SmartphonesDataset initialized successfully.")
+        except FileNotFoundError:
+            print(f"Error: File not found at path: {dataset_path}")
+            raise
+        except Exception as e:
+            print(f"An error occurred during initialization: {e}")
+            raise
 
     def get_df(self):
         """Returns the loaded dataframe."""
         return self._df
 
+    def get_view(self):
+        """
+        Returns a copy-on-write view of the dataframe: it shares the data without copying it, and writes to
+        either the view or the dataset's dataframe copy only the written columns, so they never see each other.
+        Copy-on-write is enabled by Main.py (PANDAS_COPY_ON_WRITE=1); without it the view is a full copy.
+        """
+        return self._df.copy(deep=not pd.options.mode.copy_on_write)
+
+    def set_df(self, df):
+        """Replaces the dataframe, e.g. with the cached output of a pipeline stage."""
+        self._df = df
+
+    def get_dataset_path(self):
+        """Returns the path of the csv the dataset was loaded from."""
+        return self._dataset_path
+
     def get_target_var(self):
         """Returns the target variable."""
         return self._target_variable
@@ -93,3 +167,14 @@ class SmartphonesDataset:
     def get_categorical_attributes(self):
         """Returns the list of categorical attributes."""
         return self._categorical_attributes
+
+    def compact_dtypes(self):
+        """
+        Downcasts numerical columns to the smallest safe width and converts low-cardinality string
+        columns to 'category'. Returns the per-column dtype and memory report (before and after).
+        """
+        compactor = DtypeCompactor()
+        compact_df = compactor.compact(self._df)
+        report = compactor.memory_report(self._df, compact_df)
+        self._df = compact_df
+        return report
@@ -0,0 +1,209 @@
+from src.data_processing.ColumnarCache import ColumnarCache
+from src.benchmark.Instrumentation import Instrumentation
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+
+
+class PipelineStage:
+    """
+        A declared step of a StagePipeline.
+
+        Attributes:
+        ----------
+        name : str
+            Unique name of the stage, used for its cache file.
+        func : callable
+            The step. It is called with params as keyword arguments and works on the shared dataset.
+        params : dict
+            Keyword arguments of func, part of the stage's cache key.
+        dependencies : tuple
+            Other functions or classes whose source code is part of the stage's cache key (e.g. the helpers
+            the step calls), so changing them re-runs the stage.
+        report : bool
+            True for steps that only print information. They are not cached and don't change the key
+            of the stages after them.
+        artifacts : tuple
+            Paths of the files the step writes besides the dataset (e.g. a fitted imputer). They are cached
+            with the stage's output and restored when the output is loaded from the cache.
+
+        Methods:
+        -------
+        code_hash()
+        run()
+    """
+
+    def __init__(self, name, func, params=None, dependencies=(), report=False, artifacts=()):
+        self.name = name
+        self.func = func
+        self.params = params or {}
+        self.dependencies = tuple(dependencies)
+        self.report = report
+        self.artifacts = tuple(artifacts)
+
+    def code_hash(self):
+        """ Returns the sha256 hash of the source code of the step and its dependencies. """
+        sha = hashlib.sha256()
+        for func in (self.func, *self.dependencies):
+            sha.update(inspect.getsource(func).encode())
+        return sha.hexdigest()
+
+    def run(self):
+        """ Runs the step. """
+        return self.func(**self.params)
+
+
+class StagePipeline:
+    """
+        Runs a sequence of declared stages on the SmartphonesDataset, caching the output of every stage on disk.
+
+        The cache key of a stage is the hash of its input (the key of the previous stage, the hash of the csv
+        and of the source code of input_dependencies for the first one), its name, its parameters and the
+        source code of the step and of its dependencies. On a run, the pipeline resumes from the last stage
+        whose output is already cached, so an unchanged pipeline loads a single columnar file (and restores
+        the files the stages wrote) and a changed stage re-runs only itself and the stages after it.
+
+        Attributes:
+        ----------
+        dataset : SmartphonesDataset
+            The dataset the stages work on.
+        input_path : str
+            The csv the dataset was loaded from.
+        cache_dir : str
+            Directory of the cached stage outputs ('<stage name>_<key>.npz').
+        stages : list
+            The declared PipelineStage objects, in order.
+        instrumentation : Instrumentation
+            Records the time, memory and rows of every stage run (disabled by default).
+        input_dependencies : tuple
+            Functions or classes the dataset is loaded with (e.g. the dtype compaction), part of the key
+            of every stage.
+
+        Methods:
+        -------
+        add_stage(name, func, params, dependencies, report, artifacts)
+        stage_keys()
+        run(use_cache)
+    """
+
+    def __init__(self, dataset, input_path, cache_dir='../../datasets/.pipeline_cache', instrumentation=None,
+                 input_dependencies=()):
+        self.dataset = dataset
+        self.input_path = input_path
+        self.cache_dir = cache_dir
+        self.stages = []
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+        self.input_dependencies = tuple(input_dependencies)
+
+    def add_stage(self, name, func, params=None, dependencies=(), report=False, artifacts=()):
+        """ Declares the next stage of the pipeline. """
+        if any(stage.name == name for stage in self.stages):
+            raise ValueError(f"Stage '{name}' is already declared.")
+        self.stages.append(PipelineStage(name, func, params, dependencies, report, artifacts))
+
+    def _input_key(self):
+        """ Returns the hash of the csv and of the source code of the input dependencies. """
+        sha = hashlib.sha256(ColumnarCache.file_hash(self.input_path).encode())
+        for dependency in self.input_dependencies:
+            sha.update(inspect.getsource(dependency).encode())
+        return sha.hexdigest()
+
+    def stage_keys(self):
+        """ Returns the cache key of every stage (None for report stages). """
+        keys, previous_key = [], self._input_key()
+        for stage in self.stages:
+            if stage.report:
+                keys.append(None)
+                continue
+            sha = hashlib.sha256()
+            sha.update(previous_key.encode())
+            sha.update(stage.name.encode())
+            sha.update(json.dumps(stage.params, sort_keys=True, default=str).encode())
+            sha.update(stage.code_hash().encode())
+            previous_key = sha.hexdigest()
+            keys.append(previous_key)
+        return keys
+
+    def _cache_path(self, stage, key):
+        """ Returns the cache file of a stage output. """
+        return os.path.join(self.cache_dir, f"{stage.name}_{key[:16]}.npz")
+
+    def _artifact_cache_path(self, stage, key, artifact):
+        """ Returns the cached copy of a file written by a stage. """
+        return os.path.join(self.cache_dir, f"{stage.name}_{key[:16]}.{os.path.basename(artifact)}")
+
+    def _save_output(self, stage, key):
+        """ Writes the dataset and the artifacts as the output of a stage, removing the stage's outdated outputs. """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(stage, key)
+        for file_name in os.listdir(self.cache_dir):
+            if file_name.startswith(f"{stage.name}_"):
+                os.remove(os.path.join(self.cache_dir, file_name))
+        try:
+            ColumnarCache.write(self.dataset.get_df(), path, key)
+        except TypeError as e:
+            print(f"Not caching the output of stage '{stage.name}': {e}")
+            return
+        for artifact in stage.artifacts:
+            if os.path.exists(artifact):
+                shutil.copyfile(artifact, self._artifact_cache_path(stage, key, artifact))
+
+    def _is_cached(self, keys, index):
+        """ Returns whether the output of a stage and the artifacts of the stages up to it are in the cache. """
+        if keys[index] is None or not os.path.exists(self._cache_path(self.stages[index], keys[index])):
+            return False
+        return all(os.path.exists(self._artifact_cache_path(stage, key, artifact))
+                   for stage, key in zip(self.stages[:index + 1], keys) if key is not None
+                   for artifact in stage.artifacts)
+
+    def _restore_artifacts(self, stage, key):
+        """ Copies the cached artifacts of a stage back to their paths. """
+        for artifact in stage.artifacts:
+            os.makedirs(os.path.dirname(artifact) or '.', exist_ok=True)
+            shutil.copyfile(self._artifact_cache_path(stage, key, artifact), artifact)
+            print(f"Restored {artifact} from the cached output of stage '{stage.name}'")
+
+    def run(self, use_cache=True):
+        """
+        Runs the pipeline, starting after the last stage with a cached output when use_cache is True.
+        Returns the names of the stages that were run.
+        """
+        keys = self.stage_keys()
+        start_index = 0
+        rows = lambda: len(self.dataset.get_df())
+
+        if use_cache:
+            for index in range(len(self.stages) - 1, -1, -1):
+                key = keys[index]
+                if not self._is_cached(keys, index):
+                    continue
+                try:
+                    with self.instrumentation.step(f"load_cached_{self.stages[index].name}", 'process'):
+                        df, cached_key = ColumnarCache.read(self._cache_path(self.stages[index], key))
+                except Exception as e:
+                    print(f"Ignoring unreadable cached output of stage '{self.stages[index].name}': {e}")
+                    continue
+                if cached_key == key:
+                    self.dataset.set_df(df)
+                    for stage, stage_key in zip(self.stages[:index + 1], keys):
+                        if stage_key is not None:
+                            self._restore_artifacts(stage, stage_key)
+                    start_index = index + 1
+                    print(f"Loaded cached output of stage '{self.stages[index].name}' "
+                          f"({start_index}/{len(self.stages)} stages up to date)\n")
+                    break
+
+        ran = []
+        for stage, key in zip(self.stages[start_index:], keys[start_index:]):
+            stage_start = time.perf_counter()
+            with self.instrumentation.step(stage.name, 'process', rows):
+                stage.run()
+            if not stage.report:
+                with self.instrumentation.step(f"cache_{stage.name}", 'process'):
+                    self._save_output(stage, key)
+            ran.append(stage.name)
+            print(f"Stage '{stage.name}' done in {time.perf_counter() - stage_start:.3f} s")
+        return ran
@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+
+
+class RunningMean:
+    """
+        A mergeable mean: keeps the running sum and count of the non-null values it has seen.
+
+        Methods:
+        -------
+        update(values)
+        merge(other)
+        value()
+    """
+
+    def __init__(self):
+        self.total = 0.0
+        self.count = 0
+
+    def update(self, values):
+        """ Adds the non-null values of a series to the running sum and count. """
+        values = pd.Series(values).dropna()
+        self.total += float(values.sum())
+        self.count += len(values)
+
+    def merge(self, other):
+        """ Adds the sum and count of another RunningMean. """
+        self.total += other.total
+        self.count += other.count
+
+    def value(self):
+        """ Returns the mean of every value seen, NaN if there were none. """
+        return self.total / self.count if self.count else np.nan
+
+
+class ModeCounter:
+    """
+        A mergeable mode: keeps the count of every distinct non-null value it has seen.
+        Meant for low-cardinality columns (number of cores, camera megapixels, ...).
+
+        Methods:
+        -------
+        update(values)
+        merge(other)
+        value()
+    """
+
+    def __init__(self):
+        self.counts = {}
+
+    def update(self, values):
+        """ Adds the value counts of a series. """
+        for value, count in pd.Series(values).value_counts(dropna=True).items():
+            self.counts[value] = self.counts.get(value, 0) + int(count)
+
+    def merge(self, other):
+        """ Adds the counts of another ModeCounter. """
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+
+    def value(self):
+        """ Returns the most frequent value. Ties go to the smallest value, like pandas' mode()[0]. """
+        if not self.counts:
+            return np.nan
+        max_count = max(self.counts.values())
+        return min(value for value, count in self.counts.items() if count == max_count)
+
+
+class QuantileSketch:
+    """
+        A mergeable approximate-quantile sketch in the style of KLL.
+
+        Values are kept in levels, an item of level h standing for 2**h original values. When a level
+        holds more than k items it is sorted and every other item (starting at a random offset) is
+        promoted to the next level, so memory stays at about k items per level, log2(n / k) levels.
+        As long as no level was compacted the sketch holds every value and the quantiles are exact.
+
+        Attributes:
+        ----------
+        k : int
+            Maximum number of items of a level.
+        count : int
+            Number of non-null values seen.
+
+        Methods:
+        -------
+        update(values)
+        merge(other)
+        quantile(q)
+        median()
+    """
+
+    def __init__(self, k=4096, seed=42):
+        self.k = k
+        self.count = 0
+        self._levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def is_exact(self):
+        """ Returns True while every value is still held at level 0. """
+        return len(self._levels) == 1
+
+    def update(self, values):
+        """ Adds the non-null values of a series or array. """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self.count += len(values)
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self._compact()
+
+    def merge(self, other):
+        """ Adds the items of another sketch, level by level. """
+        for level, items in enumerate(other._levels):
+            if level == len(self._levels):
+                self._levels.append(np.empty(0))
+            self._levels[level] = np.concatenate([self._levels[level], items])
+        self.count += other.count
+        self._compact()
+
+    def _compact(self):
+        """ Halves every level holding more than k items into the next level. """
+        level = 0
+        while level < len(self._levels):
+            items = self._levels[level]
+            if len(items) > self.k:
+                items = np.sort(items)
+                # An odd item out stays on its level so the total weight is preserved exactly
+                kept, items = (items[-1:], items[:-1]) if len(items) % 2 else (np.empty(0), items)
+                promoted = items[self._rng.integers(2)::2]
+                if level + 1 == len(self._levels):
+                    self._levels.append(np.empty(0))
+                self._levels[level] = kept
+                self._levels[level + 1] = np.concatenate([self._levels[level + 1], promoted])
+            level += 1
+
+    def quantile(self, q):
+        """ Returns the q-quantile (0 <= q <= 1) of the values seen, NaN if there were none. """
+        if self.count == 0:
+            return np.nan
+        if self.is_exact():
+            return float(np.quantile(self._levels[0], q))
+
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(level_items), 2 ** level, dtype=np.int64)
+                                  for level, level_items in enumerate(self._levels)])
+        order = np.argsort(items, kind='stable')
+        cumulative = np.cumsum(weights[order])
+        index = min(int(np.searchsorted(cumulative, q * cumulative[-1])), len(items) - 1)
+        return float(items[order][index])
+
+    def median(self):
+        """ Returns the (approximate) median of the values seen. """
+        return self.quantile(0.5)
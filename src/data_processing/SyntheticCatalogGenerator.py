@@ -0,0 +1,297 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr, ndtri
+from scipy.stats import rankdata
+
+
+class SyntheticCatalogGenerator:
+    """
+        Generates synthetic smartphone catalogs of any size in the schema of the raw dataset, for scale testing.
+
+        fit() learns a Gaussian copula per brand from the real catalog: the empirical distribution of every
+        column (price, RAM, storage, cameras, processor brand, OS, ...) and the rank correlations between
+        them, so e.g. an expensive synthetic Apple phone also gets a large storage and a bionic processor.
+        Brands with fewer than min_brand_rows phones share one model fitted on all of them. String columns
+        take part in the copula as codes ordered by their mean price, and the null rate of every column is
+        learned per brand (fast_charging is null exactly when fast_charging_available is 0, like in the
+        real data).
+
+        generate() writes the catalog block by block, so memory stays bounded by block_size rows whatever
+        the number of rows. The random draws don't follow the blocks: every range of stream_rows rows draws
+        from its own random generator seeded with (seed, range number), so the output only depends on the
+        seed (not on block_size), and a smaller catalog is the first rows of a larger one with the same seed.
+        Model names are unique ('<Brand> Synthetic <n>').
+
+        Attributes:
+        ----------
+        block_size : int
+            Class-level number of rows generated (and held in memory) at a time.
+        stream_rows : int
+            Class-level number of rows drawn from one random generator. Changing it changes the catalogs.
+        continuous_columns : dict
+            Class-level column -> decimals of the columns interpolated between the real values. The other
+            numerical columns only take values seen in the real data (e.g. 8 or 12 GB of RAM, not 10).
+        conditional_nulls : dict
+            Class-level column -> (column, value): the column is null wherever the other column has the value.
+        min_brand_rows : int
+            Brands with fewer phones are generated from one shared model.
+        columns : list
+            Column names in the order of the raw csv, after fit().
+        brands : numpy.ndarray
+            Brand names and their probabilities (brand_probabilities), after fit().
+
+        Methods:
+        -------
+        fit(df):
+            Learns the per-brand distributions of a real catalog.
+        generate_block(start, n_rows, seed):
+            Returns the phones start + 1 to start + n_rows of a catalog as a DataFrame.
+        generate(n_rows, output_path, seed, output_format):
+            Writes a synthetic catalog of n_rows phones to a csv file or a columnar folder.
+        read_columnar(path, mmap_mode):
+            Reads a catalog written in the columnar format.
+    """
+
+    block_size = 100_000
+    stream_rows = 10_000
+    continuous_columns = {'price': 0, 'avg_rating': 1, 'processor_speed': 2, 'battery_capacity': 0,
+                          'screen_size': 2}
+    conditional_nulls = {'fast_charging': ('fast_charging_available', 0)}
+
+    def __init__(self, min_brand_rows=20):
+        self.min_brand_rows = min_brand_rows
+        self.columns = []
+        self._copula_columns = []
+        self.dtypes = {}
+        self.categories = {}
+        self.brands = None
+        self.brand_probabilities = None
+        self.brand_groups = None
+        self.groups = []
+
+    def _encode(self, df):
+        """ Returns the copula columns of df as a float matrix (string columns as their codes, nulls as NaN). """
+        encoded = np.empty((len(df), len(self._copula_columns)), dtype=np.float64)
+        for index, col in enumerate(self._copula_columns):
+            if col in self.categories:
+                codes = pd.Categorical(df[col], categories=self.categories[col]).codes
+                encoded[:, index] = np.where(codes >= 0, codes, np.nan)
+            else:
+                encoded[:, index] = df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+        return encoded
+
+    @staticmethod
+    def _correlation(values):
+        """ Returns the Cholesky factor of the rank (normal score) correlation matrix of the columns of values. """
+        n_rows, n_cols = values.shape
+        filled = pd.DataFrame(values)
+        filled = filled.fillna(filled.median()).fillna(0).to_numpy()  # Nulls as the median, for the ranks
+        scores = ndtri((rankdata(filled, axis=0) - 0.5) / max(n_rows, 1))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlation = np.corrcoef(scores, rowvar=False) if n_rows > 2 else np.eye(n_cols)
+        correlation = np.nan_to_num(np.atleast_2d(correlation))  # Constant columns are uncorrelated
+        np.fill_diagonal(correlation, 1.0)
+
+        # Clips the eigenvalues so the matrix is positive definite, then scales it back to a unit diagonal
+        eigenvalues, eigenvectors = np.linalg.eigh(correlation)
+        correlation = (eigenvectors * np.clip(eigenvalues, 1e-6, None)) @ eigenvectors.T
+        scale = np.sqrt(np.diag(correlation))
+        return np.linalg.cholesky(correlation / np.outer(scale, scale))
+
+    def _fit_group(self, df, overall_values):
+        """ Returns the copula of one group of phones: its correlation, sorted values and null rates per column. """
+        values = self._encode(df)
+        sorted_values, null_rates = [], []
+        for index, col in enumerate(self._copula_columns):
+            present = values[:, index][~np.isnan(values[:, index])]
+            sorted_values.append(np.sort(present) if len(present) else overall_values[index])
+
+            candidates = np.ones(len(df), dtype=bool)
+            if col in self.conditional_nulls:
+                condition_col, condition_value = self.conditional_nulls[col]
+                candidates = (df[condition_col] != condition_value).to_numpy()
+            null_rates.append(np.isnan(values[candidates, index]).mean() if candidates.any() else 0.0)
+
+        return {"cholesky": self._correlation(values), "sorted_values": sorted_values,
+                "null_rates": np.asarray(null_rates)}
+
+    def fit(self, df):
+        """ Learns the per-brand distributions of df, a catalog in the schema of the raw csv. """
+        self.columns = df.columns.tolist()
+        self.dtypes = {col: df[col].dtype for col in self.columns}
+        string_cols = [col for col in self.columns
+                       if col not in ('brand_name', 'model') and not pd.api.types.is_numeric_dtype(df[col])]
+        # Codes ordered by mean price, so the copula can correlate e.g. the processor brand with the price
+        self.categories = {col: df.groupby(col)['price'].mean().sort_values(kind='stable').index.tolist()
+                           for col in string_cols}
+        self._copula_columns = [col for col in self.columns if col not in ('brand_name', 'model')]
+
+        counts = df['brand_name'].value_counts(sort=False).sort_index()
+        self.brands = counts.index.to_numpy(dtype=object)
+        self.brand_probabilities = (counts / counts.sum()).to_numpy()
+        small_brands = counts.index[counts < self.min_brand_rows]
+
+        values = self._encode(df)
+        overall_values = [np.sort(column[~np.isnan(column)]) for column in values.T]
+        group_names = [brand for brand in self.brands if brand not in small_brands]
+        self.groups = [self._fit_group(df[df['brand_name'] == brand], overall_values) for brand in group_names]
+        if len(small_brands):
+            self.groups.append(self._fit_group(df[df['brand_name'].isin(small_brands)], overall_values))
+        self.brand_groups = np.array([group_names.index(brand) if brand in group_names else len(group_names)
+                                      for brand in self.brands])
+        print(f"Synthetic catalog generator fitted on {len(df)} phones: {len(group_names)} brand models, "
+              f"{len(small_brands)} small brands sharing one model")
+        return self
+
+    def _sample_group(self, group, n_rows, rng):
+        """ Returns n_rows phones drawn from the copula of a group, as a float matrix of the copula columns. """
+        n_cols = len(self._copula_columns)
+        uniforms = ndtr(rng.standard_normal((n_rows, n_cols)) @ group["cholesky"].T)
+        is_null = rng.random((n_rows, n_cols)) < group["null_rates"]
+
+        sample = np.empty((n_rows, n_cols), dtype=np.float64)
+        for index, col in enumerate(self._copula_columns):
+            sorted_values = group["sorted_values"][index]
+            if col in self.continuous_columns:
+                positions = uniforms[:, index] * (len(sorted_values) - 1)
+                sample[:, index] = np.interp(positions, np.arange(len(sorted_values)), sorted_values).round(
+                    self.continuous_columns[col])
+            else:
+                positions = np.minimum((uniforms[:, index] * len(sorted_values)).astype(np.int64),
+                                       len(sorted_values) - 1)
+                sample[:, index] = sorted_values[positions]
+        sample[is_null] = np.nan
+
+        for col, (condition_col, condition_value) in self.conditional_nulls.items():
+            condition = sample[:, self._copula_columns.index(condition_col)] == condition_value
+            sample[condition, self._copula_columns.index(col)] = np.nan
+        return sample
+
+    def _draw_range(self, range_index, seed):
+        """ Returns the brand indices and copula sample of the stream_rows phones of range number range_index. """
+        rng = np.random.default_rng([seed, range_index])
+        brand_indices = rng.choice(len(self.brands), size=self.stream_rows, p=self.brand_probabilities)
+        row_groups = self.brand_groups[brand_indices]
+
+        sample = np.empty((self.stream_rows, len(self._copula_columns)), dtype=np.float64)
+        for group_index, group in enumerate(self.groups):
+            rows = np.flatnonzero(row_groups == group_index)
+            if len(rows):
+                sample[rows] = self._sample_group(group, len(rows), rng)
+        return brand_indices, sample
+
+    def generate_block(self, start, n_rows, seed=0):
+        """
+        Returns the phones start + 1 to start + n_rows of a catalog as a DataFrame. They are cut from the
+        ranges of stream_rows phones they overlap, so the same phone comes out whatever the blocks are.
+        """
+        brand_parts, sample_parts = [], []
+        for range_index in range(start // self.stream_rows, (start + n_rows - 1) // self.stream_rows + 1):
+            range_start = range_index * self.stream_rows
+            selected = slice(max(start - range_start, 0), min(start + n_rows - range_start, self.stream_rows))
+            brand_indices, sample = self._draw_range(range_index, seed)
+            brand_parts.append(brand_indices[selected])
+            sample_parts.append(sample[selected])
+        brand_indices, sample = np.concatenate(brand_parts), np.concatenate(sample_parts)
+
+        brands = self.brands[brand_indices]
+        columns = {'brand_name': brands,
+                   'model': pd.Series(brands).str.title() + ' Synthetic ' +
+                   pd.Series(np.arange(start + 1, start + n_rows + 1)).astype(str)}
+        for index, col in enumerate(self._copula_columns):
+            values = sample[:, index]
+            if col in self.categories:
+                categories = np.append(np.asarray(self.categories[col], dtype=object), np.nan)
+                columns[col] = categories[np.where(np.isnan(values), -1, values).astype(np.int64)]
+            elif pd.api.types.is_integer_dtype(self.dtypes[col]) and not np.isnan(values).any():
+                columns[col] = values.astype(self.dtypes[col])
+            else:
+                columns[col] = values
+        return pd.DataFrame({col: np.asarray(columns[col]) for col in self.columns},
+                            index=pd.RangeIndex(start, start + n_rows))
+
+    def _blocks(self, n_rows, seed):
+        """ Yields the blocks of a catalog of n_rows phones. """
+        for start in range(0, n_rows, self.block_size):
+            yield self.generate_block(start, min(self.block_size, n_rows - start), seed)
+
+    def generate(self, n_rows, output_path, seed=0, output_format='csv'):
+        """
+        Writes a synthetic catalog of n_rows phones to output_path, block by block.
+        - output_format 'csv' writes a csv file in the schema of the raw dataset.
+        - output_format 'npy' writes a folder with one .npy file per column (string columns as codes)
+          and a header.json, which read_columnar() can memory-map.
+        """
+        if output_format == 'csv':
+            for block in self._blocks(n_rows, seed):
+                block.to_csv(output_path, mode='w' if block.index[0] == 0 else 'a', header=block.index[0] == 0,
+                             index=False)
+        elif output_format == 'npy':
+            self._write_columnar(n_rows, output_path, seed)
+        else:
+            raise ValueError(f"Unknown output format: {output_format} (expected 'csv' or 'npy')")
+        print(f"Synthetic catalog of {n_rows} phones written to {output_path}")
+        return output_path
+
+    def _write_columnar(self, n_rows, output_path, seed):
+        """
+        Writes the catalog as one .npy file per column. The .npy headers are written first, for the final
+        number of rows, and every block is appended to the files, so nothing but one block is held in memory.
+        """
+        os.makedirs(output_path, exist_ok=True)
+        categories = {'brand_name': [str(brand) for brand in self.brands], **self.categories}
+        model_width = max(len(str(brand)) for brand in self.brands) + len(' Synthetic ') + len(str(n_rows))
+        header = {"n_rows": n_rows, "columns": []}
+        files, dtypes = {}, {}
+        for col in self.columns:
+            if col == 'model':
+                dtype, kind = np.dtype(f"S{model_width}"), 'bytes'
+            elif col in categories:
+                dtype, kind = np.dtype(np.int32), 'codes'
+            elif pd.api.types.is_integer_dtype(self.dtypes[col]):
+                dtype, kind = np.dtype(np.int64), 'numeric'
+            else:
+                dtype, kind = np.dtype(np.float64), 'numeric'
+            header["columns"].append({"name": col, "kind": kind, "categories": categories.get(col)})
+            dtypes[col] = dtype
+            files[col] = open(os.path.join(output_path, f"{col}.npy"), 'wb')
+            np.lib.format.write_array_header_1_0(files[col], {'descr': np.lib.format.dtype_to_descr(dtype),
+                                                              'fortran_order': False, 'shape': (n_rows,)})
+        try:
+            for block in self._blocks(n_rows, seed):
+                for col in self.columns:
+                    if col == 'model':
+                        values = block[col].str.encode('utf-8').to_numpy()
+                    elif col in categories:
+                        values = pd.Categorical(block[col], categories=categories[col]).codes
+                    else:
+                        values = block[col].to_numpy()
+                    files[col].write(np.ascontiguousarray(values, dtype=dtypes[col]).tobytes())
+        finally:
+            for f in files.values():
+                f.close()
+        with open(os.path.join(output_path, 'header.json'), 'w') as f:
+            json.dump(header, f, indent=2)
+
+    @staticmethod
+    def read_columnar(path, mmap_mode='r', rows=None):
+        """
+        Reads a catalog written with output_format 'npy' as a DataFrame in the schema of the raw csv.
+        The columns are memory-mapped, so only the rows selected by rows (a slice, all by default) are read.
+        """
+        with open(os.path.join(path, 'header.json')) as f:
+            header = json.load(f)
+        rows = slice(None) if rows is None else rows
+        columns = {}
+        for column in header["columns"]:
+            values = np.load(os.path.join(path, f"{column['name']}.npy"), mmap_mode=mmap_mode)[rows]
+            if column["kind"] == 'codes':
+                categories = np.append(np.asarray(column["categories"], dtype=object), np.nan)
+                columns[column["name"]] = categories[values]  # Code -1 picks the trailing NaN
+            elif column["kind"] == 'bytes':
+                columns[column["name"]] = np.char.decode(values, 'utf-8').astype(object)
+            else:
+                columns[column["name"]] = np.array(values)
+        return pd.DataFrame(columns)
@@ -1,5 +1,6 @@
 from src.data_processing.SmartphonesDataset import SmartphonesDataset
-import requests
+from src.data_processing.ColumnarCache import ColumnarCache
+from src.data_processing.ExchangeRateProvider import ExchangeRateProvider
 
 
 class DataProcessing:
@@ -9,6 +10,8 @@ class DataProcessing:
         Attributes:
         ----------
         df : The dataset to be processed.
+        rate_provider : The ExchangeRateProvider the prices are converted with (a default one when None).
+        dataset : The SmartphonesDataset processed (the singleton when None, or e.g. one of a DatasetRegistry).
 
         Methods:
         -------
@@ -17,13 +20,16 @@ class DataProcessing:
         get_description()
         get_null_columns()
         drop_fast_charging_available_col()
+        fetch_exchange_rate(to_currency)
+        fetch_exchange_rates(to_currency, extra_currencies)
         convert_inr_to_usd()
         save_cleaned_data()
         run_process()
     """
 
-    def __init__(self):
-        self.dataset = SmartphonesDataset()
+    def __init__(self, rate_provider=None, dataset=None):
+        self.dataset = SmartphonesDataset() if dataset is None else dataset
+        self.rate_provider = rate_provider
 
     def get_shape(self):
         """
@@ -73,41 +79,70 @@ class DataProcessing:
         except Exception as e:
             print(f"Error occurred while dropping the column: {e}")
 
-    def convert_inr_to_usd(self, to_currency='USD'):
+    @staticmethod
+    def fetch_exchange_rate(to_currency='USD', provider=None):
         """
-        Converts prices in INR to the specified currency using the real-time exchange rate.
-        If the API request fails, a constant exchange rate is used as a fallback.
-
-        Parameters:
-        - to_currency (str): The currency to convert prices to. Defaults to 'USD'.
-
-        This method fetches the latest INR to USD conversion rate and applies it to the price column.
-        If the API fails, a fallback conversion rate is used.
+        Returns the INR to to_currency exchange rate from an ExchangeRateProvider (a default one when None),
+        which reads it from its on-disk cache, the API (with a timeout) or its fallback rates.
+        Only USD has a constant fallback rate: for another currency without a rate, the error is raised.
         """
-        price_col = 'price'
+        provider = provider or ExchangeRateProvider()
         try:
-            # Attempt to fetch the latest exchange rate from the API
-            response = requests.get("https://api.exchangerate-api.com/v4/latest/INR")
-            response.raise_for_status()  # Raise an exception for HTTP errors
-            exchange_data = response.json()
-            inr_to_new_currency_rate = exchange_data['rates'][to_currency.upper()]
-            print(f"Fetched INR to {to_currency} conversion rate from API: {inr_to_new_currency_rate}")
-        except requests.exceptions.RequestException as e:
-            print(f"Error fetching exchange rate from API: {e}")
-            # Fallback to a constant exchange rate if the API call fails
-            inr_to_new_currency_rate = 0.012  # Example fallback rate (INR to USD)
-            print(f"Using fallback conversion rate: INR to {to_currency} = {inr_to_new_currency_rate}")
+            inr_to_new_currency_rate = provider.get_rate(to_currency)
+            print(f"Using INR to {to_currency} conversion rate from {provider.last_source}: {inr_to_new_currency_rate}")
         except Exception as e:
-            print(f"Error occurred while converting INR to {to_currency}: {e}")
+            if to_currency.upper() != 'USD':
+                raise
+            print(f"Error occurred while getting the INR to {to_currency} rate: {e}")
             # Fallback rate in case of any other errors
             inr_to_new_currency_rate = 0.012
             print(f"Using fallback conversion rate: INR to {to_currency} = {inr_to_new_currency_rate}")
+        return inr_to_new_currency_rate
+
+    @classmethod
+    def fetch_exchange_rates(cls, to_currency='USD', extra_currencies=(), provider=None):
+        """
+        Returns the {currency: rate per 1 INR} of to_currency and of the extra currencies, from one provider.
+        An extra currency without a rate is left out (so its price column is skipped), while a to_currency
+        without a rate raises KeyError, since the prices can't be converted without it.
+        """
+        provider = provider or ExchangeRateProvider()
+        rates = {to_currency: cls.fetch_exchange_rate(to_currency, provider)}
+        for currency in extra_currencies:
+            try:
+                rates[currency] = cls.fetch_exchange_rate(currency, provider)
+            except KeyError as e:
+                print(f"Skipping the 'price_{currency.lower()}' column: {e}")
+        return rates
+
+    def convert_inr_to_usd(self, to_currency='USD', extra_currencies=(), rates=None):
+        """
+        Converts prices in INR to the specified currency using the cached or real-time exchange rate.
+        If no USD rate can be fetched, a constant exchange rate is used as a fallback.
+
+        Parameters:
+        - to_currency (str): The currency to convert prices to. Defaults to 'USD'.
+        - extra_currencies (tuple): Currencies added as extra 'price_<currency>' columns (skipped when
+          there is no rate for them).
+        - rates (dict): Already fetched {currency: rate per 1 INR}. Fetched from the rate provider when None,
+          i.e. only when the conversion actually runs.
+
+        All the conversions use the same rate table and are vectorized over the price column.
+        """
+        price_col = 'price'
+        if rates is None:
+            rates = self.fetch_exchange_rates(to_currency, extra_currencies, self.rate_provider)
+        extra_currencies = [currency for currency in extra_currencies if currency in rates]
 
         # Ensure the price column exists in the dataset
-        if price_col in self.dataset.get_df().columns:
-            self.dataset.get_df()[price_col] = (
-                round(self.dataset.get_df()[price_col] * inr_to_new_currency_rate, 2))
+        df = self.dataset.get_df()
+        if price_col in df.columns:
+            for currency in extra_currencies:
+                df[f"{price_col}_{currency.lower()}"] = round(df[price_col] * rates[currency], 2)
+            df[price_col] = round(df[price_col] * rates[to_currency], 2)
             print(f"Converted price to '{to_currency}' from INR.")
+            if extra_currencies:
+                print(f"Added price columns in: {', '.join(extra_currencies)}")
         else:
             print("Column 'price' does not exist in the dataset.")
         print()
@@ -130,7 +165,16 @@ class DataProcessing:
             print(f"Error occurred while removing duplicates: {e}")
 
     def save_cleaned_data(self):
-        """ Saves the dataset in separate csv file after processing is done."""
+        """
+        Saves the dataset in separate csv file after processing is done, together with its
+        columnar binary cache so the next load of the cleaned data doesn't parse the csv.
+        """
 
         path = '../../datasets/cleaned_smartphones.csv'
         self.dataset.get_df().to_csv(path, index=False)
+
+        cache = ColumnarCache(path)
+        try:
+            cache.write(self.dataset.get_df(), cache.cache_path, ColumnarCache.file_hash(path))
+        except TypeError as e:
+            print(f"Could not write cache {cache.cache_path}: {e}")
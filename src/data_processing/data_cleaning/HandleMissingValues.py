@@ -1,17 +1,29 @@
 from src.data_processing.SmartphonesDataset import SmartphonesDataset
+from src.data_processing.Imputer import Imputer
+import os
+import pandas as pd
 
 
 class HandleMissingValues:
     """
         A class for handling missing values in a dataset.
 
+        The pipeline fills every column at once with a fitted Imputer (impute_nulls), which is saved next
+        to the models so prediction inputs are filled with the same values. The fill_*_nulls methods fill
+        a single column with the same strategy.
+
         Attributes:
         ----------
-        df : pandas.DataFrame
-            The dataset to be processed.
+        dataset : SmartphonesDataset
+            The dataset to be processed (the singleton when None is given).
+        imputer_path : str
+            Path the fitted imputer is saved to (None doesn't save it).
+        imputer : Imputer
+            The imputer fitted by the last impute_nulls().
 
         Methods:
         -------
+        impute_nulls(group_by)
         fill_nulls()
         fill_avg_rating_nulls()
         fill_processor_brand_nulls()
@@ -23,8 +35,37 @@ class HandleMissingValues:
         fill_primary_camera_front_nulls()
     """
 
-    def __init__(self):
-        self.dataset = SmartphonesDataset()
+    def __init__(self, imputer_path='saved_models/imputer.pkl', dataset=None):
+        self.dataset = SmartphonesDataset() if dataset is None else dataset
+        self.imputer_path = imputer_path
+        self.imputer = None
+
+    def impute_nulls(self, group_by=None):
+        """
+        Fills the missing values of every column with a fitted Imputer and saves it to imputer_path.
+        All the fill values are learned at once, before any column is filled. With group_by (e.g. 'brand_name'),
+        each group is filled with its own mean, median or mode, falling back to the overall value.
+        """
+        try:
+            df = self.dataset.get_df()
+            self.imputer = Imputer(group_by=group_by).fit(df)
+            df = self.imputer.transform(df)
+            self.dataset.set_df(df)
+            for column_name in self.imputer.fill_values:
+                print(f"Null values in '{column_name}' column have been filled. "
+                      f"Null values left: {df[column_name].isnull().sum()}")
+
+            if self.imputer_path:
+                os.makedirs(os.path.dirname(self.imputer_path) or '.', exist_ok=True)
+                self.imputer.save(self.imputer_path)
+                print(f"Imputer saved to {self.imputer_path}")
+        except Exception as e:
+            print(f"Error occurred while imputing null values: {e}")
+
+    def _fill_with_default_strategy(self, column_name):
+        """ Fills the missing values of a column with its Imputer.default_strategies fill value. """
+        strategy = {column_name: Imputer.default_strategies[column_name]}
+        self.fill_nulls(column_name, lambda df: Imputer(strategy).fit_transform(df[[column_name]])[column_name])
 
     def fill_nulls(self, column_name, fill_value_func):
         """
@@ -34,11 +75,19 @@ class HandleMissingValues:
         ----------
         column_name : The name of the column to fill missing values for.
         fill_value_func : A function that specifies how to fill the missing values for the column.
+
+        Category columns are filled as plain strings and converted back afterwards,
+        so the fill value doesn't have to be one of the existing categories.
         """
         try:
             if column_name in self.dataset.get_df().columns:
                 df = self.dataset.get_df()
+                is_category = isinstance(df[column_name].dtype, pd.CategoricalDtype)
+                if is_category:
+                    df[column_name] = df[column_name].astype(object)
                 df[column_name] = fill_value_func(df)
+                if is_category:
+                    df[column_name] = df[column_name].astype('category')
                 print(f"Null values in '{column_name}' column have been filled. "
                       f"Null values left: {df[column_name].isnull().sum()}")
             else:
@@ -50,8 +99,7 @@ class HandleMissingValues:
         """
         Fills the missing values in the 'avg_rating' column with the mean of the non-null values.
         """
-        self.fill_nulls('avg_rating',
-                        lambda df: df['avg_rating'].fillna(round(df['avg_rating'].mean(), 1)))
+        self._fill_with_default_strategy('avg_rating')
 
     def fill_processor_brand_nulls(self):
         """
@@ -59,8 +107,7 @@ class HandleMissingValues:
         This is used to handle missing processor brand information in a way that marks
         those entries as unspecified, without losing the integrity of the data.
         """
-        self.fill_nulls('processor_brand',
-                        lambda df: df['processor_brand'].fillna('Unknown'))
+        self._fill_with_default_strategy('processor_brand')
 
     def fill_num_cores_nulls(self):
         """
@@ -68,8 +115,7 @@ class HandleMissingValues:
         (mode) of the non-null entries. This helps maintain consistency in the data, as
         the number of cores should correspond to a common and discrete set of values.
         """
-        self.fill_nulls('num_cores',
-                        lambda df: df['num_cores'].fillna(df['num_cores'].mode()[0]))
+        self._fill_with_default_strategy('num_cores')
 
     def fill_processor_speed_nulls(self):
         """
@@ -77,8 +123,7 @@ class HandleMissingValues:
         The median is used to avoid skewness caused by outliers, ensuring the central tendency
         of the data is maintained for this numerical column.
         """
-        self.fill_nulls('processor_speed',
-                        lambda df: df['processor_speed'].fillna(df['processor_speed'].median()))
+        self._fill_with_default_strategy('processor_speed')
 
     def fill_battery_capacity_nulls(self):
         """
@@ -86,16 +131,14 @@ class HandleMissingValues:
         The median is selected as it provides a robust measure of central tendency, less affected by extreme values
         in this numerical column representing battery capacity.
         """
-        self.fill_nulls('battery_capacity',
-                        lambda df: df['battery_capacity'].fillna(df['battery_capacity'].median()))
+        self._fill_with_default_strategy('battery_capacity')
 
     def fill_fast_charging_nulls(self):
         """
         Fills missing (NaN) values in the 'fast_charging' column with 0.
         Since 'fast_charging' is given in watts, filling it with 0 represents no fast charging.
         """
-        self.fill_nulls('fast_charging',
-                        lambda df: df['fast_charging'].fillna(0))
+        self._fill_with_default_strategy('fast_charging')
 
     def fill_os_nulls(self):
         """
@@ -103,8 +146,7 @@ class HandleMissingValues:
         Since 'os' is a categorical column, missing values are assumed to represent unspecified or other
         operating systems, and they are replaced with the string 'other'.
         """
-        self.fill_nulls('os',
-                        lambda df: df['os'].fillna('other'))
+        self._fill_with_default_strategy('os')
 
     def fill_primary_camera_front_nulls(self):
         """
@@ -112,5 +154,4 @@ class HandleMissingValues:
         The mode is used because it is the most commonly occurring value, making it a logical choice
         for imputing missing values in this numerical column related to the front camera's resolution.
         """
-        self.fill_nulls('primary_camera_front',
-                        lambda df: df['primary_camera_front'].fillna(df['primary_camera_front'].mode()[0]))
+        self._fill_with_default_strategy('primary_camera_front')
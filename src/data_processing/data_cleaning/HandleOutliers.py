@@ -1,4 +1,5 @@
 from src.data_processing.SmartphonesDataset import SmartphonesDataset
+from src.data_processing.DataQualityScanner import DataQualityScanner
 import pandas as pd
 
 
@@ -6,70 +7,85 @@ class HandleOutliers:
     """
         A class for handling outliers in a dataset.
 
+        The checks run in a DataQualityScanner, which scans every column in a single vectorized pass and
+        returns a structured report: null, negative, non-numeric and non-string counts, value ranges and
+        IQR and MAD outlier counts.
+
         Attributes:
         ----------
-        smartphones_instance : SmartphonesDataset instance
+        dataset : SmartphonesDataset instance (the singleton when None is given)
         df : pandas.DataFrame
         numerical_features : List of numerical column names in the dataset.
         categorical_features : List of categorical column names in the dataset.
+        scanner : DataQualityScanner of the numerical and categorical features.
+        fail_fast : If True, scan_data_quality() raises a DataQualityError when a check fails.
+        report_path : Path of the json the report is written to (None doesn't write it).
+        report : DataQualityReport of the last scan.
 
         Methods:
         -------
+        scan_data_quality()
         check_num_features_for_outliers()
         check_categorical_features_for_outliers()
     """
 
-    def __init__(self):
-        self.dataset = SmartphonesDataset()
+    def __init__(self, fail_fast=False, report_path=None, dataset=None):
+        self.dataset = SmartphonesDataset() if dataset is None else dataset
         self.numerical_features = self.dataset.get_numerical_attributes()
         self.categorical_features = self.dataset.get_categorical_attributes()
+        self.scanner = DataQualityScanner(self.numerical_features, self.categorical_features)
+        self.fail_fast = fail_fast
+        self.report_path = report_path
+        self.report = None
+
+    def scan_data_quality(self):
+        """
+           Scans every column of the dataset and prints the report of the numerical and categorical columns.
+           - Writes the report as json to report_path, when set.
+           - Raises a DataQualityError when fail_fast is set and a column has negative, non-numeric or
+             non-string values, stopping the pipeline before the bad data reaches the next steps.
+        """
+        self.report = self.scanner.scan(self.dataset.get_df())
+        with pd.option_context('display.width', 200, 'display.max_columns', None):
+            print(f"DATA QUALITY REPORT ({self.report.n_rows} rows, scanned in {self.report.scan_seconds:.3f} s):")
+            print(self.report.to_frame('numerical'), '\n')
+            print(self.report.to_frame('categorical'), '\n')
+
+        if self.report_path:
+            self.report.to_json(self.report_path)
+            print(f"Data quality report written to {self.report_path}")
+
+        issues = self.report.issues()
+        if issues:
+            print("Data quality issues found:\n  " + "\n  ".join(issues), '\n')
+            if self.fail_fast:
+                self.report.raise_for_issues()
+        else:
+            outliers = {check: sum(stats.get(check, 0) for stats in self.report.columns.values())
+                        for check in ('iqr_outliers', 'mad_outliers')}
+            print(f"No negative, non-numeric or non-string values found ({outliers['iqr_outliers']} IQR and "
+                  f"{outliers['mad_outliers']} MAD outliers reported above, none removed).", '\n')
+        return self.report
 
     def check_num_features_for_outliers(self):
         """
            Checks numerical features for outliers or invalid values.
            - Verifies if any numerical column contains negative values (which are unexpected in this dataset).
            - Identifies non-numeric values in numerical columns.
-           - Prints basic statistics (average, minimum, maximum) for each numerical column to inspect for extreme values
+           - Prints the value range, quartiles and IQR/MAD outlier counts of each numerical column.
         """
         df = self.dataset.get_df()
-        for col in self.numerical_features:
-            # Check for negative values in the column
-            negative_values = df[df[col] < 0]
-            non_numeric = df[~df[col].isnull() & ~pd.to_numeric(df[col], errors='coerce').notnull()]
-
-            # If there are negative values, print the column and the rows with negative values
-            if not negative_values.empty:
-                print(f"Negative values found in column '{col}': {negative_values[[col]]}")
-            else:
-                print(f"No negative values in column '{col}'.")
-
-            # If non-numeric values are found, print the column and the rows
-            if not non_numeric.empty:
-                print(f"Non-numeric values found in column '{col}': {non_numeric[[col]]}")
-            else:
-                print(f"No non-numeric values in column '{col}'.")
-
-            avg, mn, mx = (df[col].mean(), df[col].min(), df[col].max())
-            print(f"Average {col}: {avg}, Minimum {col}: {mn}, Maximum {col}: {mx}", '\n')
-        print("By looking at statistics for each numerical column, "
-              "we can conclude that there are no outliers.", '\n')
+        report = self.scanner.scan(df[[col for col in self.numerical_features if col in df.columns]])
+        print(report.to_frame('numerical'), '\n')
+        return report
 
     def check_categorical_features_for_outliers(self):
         """
             Checks categorical features for potential outliers or invalid values.
             - Verifies that all non-null values in categorical columns are strings.
-            - Prints unique values for each categorical column to inspect for anomalies or unexpected categories.
+            - Prints the number of unique values and the most frequent ones of each categorical column.
         """
         df = self.dataset.get_df()
-        for col in self.categorical_features:
-            non_string = df[~df[col].isnull() & ~df[col].apply(lambda x: isinstance(x, str))]
-
-            # If non-string values are found, print the column and the rows
-            if not non_string.empty:
-                print(f"Non-string values found in column '{col}': {non_string[[col]]}")
-            else:
-                print(f"No non-string values in column '{col}'.")
-
-            print(f"Unique values in {col}: {df[col].unique()}", '\n')
-        print("By inspecting the unique values in each categorical column, "
-              "we can conclude that there are no outliers.\n")
+        report = self.scanner.scan(df[[col for col in self.categorical_features if col in df.columns]])
+        print(report.to_frame('categorical'), '\n')
+        return report
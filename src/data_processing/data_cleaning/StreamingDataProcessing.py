@@ -0,0 +1,173 @@
+from src.data_processing.StreamingStatistics import RunningMean, ModeCounter, QuantileSketch
+from src.data_processing.data_cleaning.DataProcessing import DataProcessing
+from src.data_processing.ExchangeRateProvider import ExchangeRateProvider
+from src.data_processing.Imputer import Imputer
+import os
+import numpy as np
+import pandas as pd
+
+
+class StreamingDataProcessing:
+    """
+        An out-of-core version of the cleaning pipeline, for csv files that don't fit in memory.
+
+        The raw csv is read twice in chunks of chunk_size rows and never loaded as a whole:
+        - The first pass removes the duplicate models and collects the statistics the imputations need
+          (mean of avg_rating, modes of num_cores and primary_camera_front, medians of processor_speed and
+          battery_capacity) in mergeable counters and quantile sketches, overall and, with group_by, per group.
+        - The second pass applies the same steps as RunDataProcessing.run_process (drop
+          fast_charging_available, convert the price, remove duplicates, fill the nulls) chunk by chunk
+          and appends every cleaned chunk to the output csv.
+        Peak memory is one chunk plus the statistics and the set of 64-bit hashes of the models seen.
+        The saved Imputer keeps the strategy of every column (and the per-group values), like the one fitted
+        by the in-memory pipeline.
+
+        Attributes:
+        ----------
+        input_path : str
+            Path of the raw csv file.
+        output_path : str
+            Path of the cleaned csv file.
+        chunk_size : int
+            Number of rows read at a time.
+        to_currency : str
+            Currency the prices are converted to.
+        extra_currencies : tuple
+            Currencies added as extra 'price_<currency>' columns.
+        rate_provider : ExchangeRateProvider
+            Source of the exchange rates.
+        imputer_path : str
+            Path the Imputer of the fill values is saved to, like in the in-memory pipeline (None doesn't save it).
+        group_by : str
+            Column whose groups get their own fill values, like HandleMissingValues.impute_nulls(group_by).
+
+        Methods:
+        -------
+        collect_statistics()
+        get_fill_values(statistics)
+        get_group_values(group_statistics)
+        run_process()
+    """
+
+    # Mergeable statistic of every Imputer strategy learned from the data
+    strategy_statistics = {'mean': RunningMean, 'median': QuantileSketch, 'mode': ModeCounter}
+
+    def __init__(self, input_path='../../datasets/smartphones.csv',
+                 output_path='../../datasets/cleaned_smartphones.csv', chunk_size=100_000, to_currency='USD',
+                 extra_currencies=(), rate_provider=None, imputer_path='saved_models/imputer.pkl', group_by=None):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.chunk_size = chunk_size
+        self.to_currency = to_currency
+        self.extra_currencies = tuple(extra_currencies)
+        self.rate_provider = rate_provider or ExchangeRateProvider()
+        self.imputer_path = imputer_path
+        self.group_by = group_by
+
+    def _read_chunks(self, dtype=None):
+        """ Returns an iterator over the raw csv in chunks of chunk_size rows. """
+        return pd.read_csv(self.input_path, chunksize=self.chunk_size, dtype=dtype)
+
+    @staticmethod
+    def _deduplicate(chunk, seen_hashes):
+        """
+        Drops the rows whose 'model' was already seen in this chunk or a previous one, keeping the first
+        occurrence like drop_duplicates(subset=['model']). seen_hashes is updated with the kept models.
+        """
+        hashes = pd.util.hash_array(chunk['model'].to_numpy(dtype=object))
+        first_in_chunk = ~pd.Series(hashes).duplicated().to_numpy()
+        unseen = np.fromiter((h not in seen_hashes for h in hashes.tolist()), dtype=bool, count=len(hashes))
+        keep = first_in_chunk & unseen
+        seen_hashes.update(hashes[keep].tolist())
+        return chunk[keep]
+
+    def collect_statistics(self):
+        """
+        First pass over the csv. Returns the statistics of the deduplicated rows, their statistics per
+        group of group_by ({col: {group: statistic}}, empty without group_by) and the dtype every column
+        has to be read with so all the chunks agree (a column with nulls in only some of the chunks would
+        otherwise be parsed as int in some and as float in others).
+        """
+        statistic_classes = {col: self.strategy_statistics[strategy]
+                             for col, (strategy, _) in Imputer.default_strategies.items()
+                             if strategy in self.strategy_statistics}
+        statistics = {col: statistic_class() for col, statistic_class in statistic_classes.items()}
+        group_statistics = {col: {} for col in statistic_classes} if self.group_by else {}
+        dtype_kinds, seen_hashes = {}, set()
+        rows_read = 0
+
+        for chunk in self._read_chunks():
+            rows_read += len(chunk)
+            for col, dtype in chunk.dtypes.items():
+                dtype_kinds.setdefault(col, set()).add(dtype.kind)
+            chunk = self._deduplicate(chunk, seen_hashes)
+            for col, statistic in statistics.items():
+                if col in chunk.columns:
+                    statistic.update(chunk[col])
+            if self.group_by in chunk.columns:
+                for group, rows in chunk.groupby(self.group_by):
+                    for col, groups in group_statistics.items():
+                        if col in rows.columns:
+                            groups.setdefault(group, statistic_classes[col]()).update(rows[col])
+
+        column_dtypes = {}
+        for col, kinds in dtype_kinds.items():
+            if 'O' in kinds:
+                column_dtypes[col] = object
+            elif 'f' in kinds:
+                column_dtypes[col] = np.float64
+
+        print(f"Pass 1: read {rows_read} rows, {len(seen_hashes)} unique models")
+        return statistics, group_statistics, column_dtypes
+
+    @staticmethod
+    def _fill_value(col, statistic):
+        """ Returns the fill value of a column from its statistic, following its Imputer strategy. """
+        strategy, argument = Imputer.default_strategies[col]
+        if strategy == 'mean':
+            return round(statistic.value(), argument)
+        return statistic.median() if strategy == 'median' else statistic.value()
+
+    def get_fill_values(self, statistics):
+        """ Returns the value each column's nulls are filled with, computed from the collected statistics. """
+        return {col: self._fill_value(col, statistics[col]) if col in statistics else argument
+                for col, (strategy, argument) in Imputer.default_strategies.items()}
+
+    def get_group_values(self, group_statistics):
+        """ Returns {col: {group: fill value}} from the per-group statistics, leaving out groups without one. """
+        group_values = {}
+        for col, groups in group_statistics.items():
+            values = {group: self._fill_value(col, statistic) for group, statistic in groups.items()}
+            group_values[col] = {group: value for group, value in values.items() if not pd.isnull(value)}
+        return group_values
+
+    def run_process(self):
+        """ Runs both passes and writes the cleaned csv. Returns the number of rows written. """
+        statistics, group_statistics, column_dtypes = self.collect_statistics()
+        fill_values = self.get_fill_values(statistics)
+        for col in ('processor_speed', 'battery_capacity'):
+            exactness = "exact" if statistics[col].is_exact() else "approximate"
+            print(f"Median of '{col}' ({exactness}): {fill_values[col]}")
+        imputer = Imputer.from_fill_values(fill_values, Imputer.default_strategies, self.group_by,
+                                           self.get_group_values(group_statistics))
+        if self.imputer_path:
+            os.makedirs(os.path.dirname(self.imputer_path) or '.', exist_ok=True)
+            imputer.save(self.imputer_path)
+
+        rates = DataProcessing.fetch_exchange_rates(self.to_currency, self.extra_currencies, self.rate_provider)
+        extra_currencies = [currency for currency in self.extra_currencies if currency in rates]
+
+        seen_hashes, rows_written = set(), 0
+        for index, chunk in enumerate(self._read_chunks(column_dtypes)):
+            chunk = chunk.drop(columns=['fast_charging_available'], errors='ignore')
+            for currency in extra_currencies:
+                chunk[f"price_{currency.lower()}"] = round(chunk['price'] * rates[currency], 2)
+            chunk['price'] = round(chunk['price'] * rates[self.to_currency], 2)
+            chunk = self._deduplicate(chunk, seen_hashes)
+            chunk = imputer.transform(chunk)
+
+            chunk.to_csv(self.output_path, mode='w' if index == 0 else 'a', header=index == 0, index=False)
+            rows_written += len(chunk)
+
+        print(f"Pass 2: wrote {rows_written} cleaned rows to {self.output_path}\n")
+        return rows_written
@@ -0,0 +1,152 @@
+import threading
+import weakref
+import numpy as np
+import pandas as pd
+
+
+class AggregateCube:
+    """
+        A memoized aggregation layer shared by every EDA plot.
+
+        For each grouping dimension (brand_name, os, processor_brand, ...) a single groupby computes the
+        sum and the non-null count of every numerical attribute and the number of positive values, from
+        which the means, row counts and positive counts all come. The correlation matrix and the value
+        counts of single columns are computed once as well. Everything is computed on first use and
+        memoized, and one cube is shared by every analysis object working on the same dataframe (or on
+        copy-on-write views of it), so the cost of the EDA no longer grows with the number of plots.
+
+        Attributes:
+        ----------
+        df : pandas.DataFrame
+            The dataframe the aggregates are computed from. It must not be modified while the cube is in use.
+        numerical_attributes : list
+            The numerical columns that are aggregated.
+        dimensions : tuple
+            The grouping columns precomputed by compute_all().
+
+        Methods:
+        -------
+        for_dataframe(df, numerical_attributes, source):
+            Returns the shared cube of a dataframe.
+        clear():
+            Forgets every shared cube.
+        group_stats(by):
+            Returns the per-group sum, non-null count and positive count of every numerical attribute.
+        group_means(by):
+            Returns the per-group mean of every numerical attribute.
+        group_counts(by):
+            Returns the number of rows of every group, largest first.
+        positive_counts(by, col_name):
+            Returns the number of rows with col_name > 0 of every group, largest first.
+        value_counts(col_name):
+            Returns the value counts of a column.
+        correlation():
+            Returns the correlation matrix of the numerical attributes.
+        compute_all():
+            Computes the aggregates of every dimension and the correlation matrix.
+    """
+
+    dimensions = ('brand_name', 'os', 'processor_brand')
+
+    # Class-level attribute, id(source) -> (weak reference to source, cube shared by every analysis object).
+    # The sources are only weakly referenced, so an entry is dropped as soon as its dataframe is collected.
+    _cubes = {}
+    _lock = threading.RLock()  # Reentrant: the weak reference callback may run during a locked allocation
+
+    def __init__(self, df, numerical_attributes):
+        self.df = df
+        self.numerical_attributes = [col for col in numerical_attributes if col in df.columns]
+        self._memo = {}
+
+    @classmethod
+    def for_dataframe(cls, df, numerical_attributes, source=None):
+        """
+        Returns the cube shared by everything working on df, creating it on first use. When df is a view,
+        source is the dataframe it was taken from, so the views of one dataframe share a cube.
+        The cube works on a view when df is the source, so it doesn't keep the source alive.
+        """
+        source = df if source is None else source
+        with cls._lock:
+            entry = cls._cubes.get(id(source))
+            if entry is None or entry[0]() is not source:
+                key = id(source)
+                reference = weakref.ref(source, lambda ref: cls._forget(key, ref))
+                entry = (reference, cls(df.copy(deep=False) if df is source else df, numerical_attributes))
+                cls._cubes[key] = entry
+            return entry[1]
+
+    @classmethod
+    def _forget(cls, key, reference):
+        """ Drops the cube of a collected source, unless its id was already reused by a newer entry. """
+        with cls._lock:
+            entry = cls._cubes.get(key)
+            if entry is not None and entry[0] is reference:
+                del cls._cubes[key]
+
+    @classmethod
+    def clear(cls):
+        """ Forgets every shared cube, e.g. after the dataframe was modified in place. """
+        with cls._lock:
+            cls._cubes.clear()
+
+    def _memoized(self, key, compute):
+        """ Returns the memoized value of key, computing it with compute() on first use. """
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def group_stats(self, by):
+        """
+        Returns a dataframe with a (statistic, column) column index, statistic being 'sum', 'count'
+        (non-null values) or 'positive' (values > 0), and one row per group of 'by'.
+        """
+        def compute():
+            # Summed in float64, like groupby().mean(), so compact float32 columns don't lose precision
+            numerical = self.df[self.numerical_attributes].astype(np.float64)
+            stats = pd.concat([numerical, (numerical > 0).add_suffix('__positive')], axis=1)
+            aggregated = stats.groupby(self.df[by], observed=True).agg(['sum', 'count'])
+            positive_cols = [f"{col}__positive" for col in self.numerical_attributes]
+            return pd.concat({
+                'sum': aggregated.xs('sum', axis=1, level=1)[self.numerical_attributes],
+                'count': aggregated.xs('count', axis=1, level=1)[self.numerical_attributes],
+                'positive': aggregated.xs('sum', axis=1, level=1)[positive_cols].set_axis(
+                    self.numerical_attributes, axis=1),
+                'size': aggregated.xs('count', axis=1, level=1)[positive_cols].set_axis(
+                    self.numerical_attributes, axis=1),
+            }, axis=1)
+        return self._memoized(('stats', by), compute)
+
+    def group_means(self, by):
+        """ Returns the per-group mean of every numerical attribute (nulls skipped, like groupby().mean()). """
+        return self._memoized(('means', by),
+                              lambda: self.group_stats(by)['sum'] / self.group_stats(by)['count'])
+
+    def group_counts(self, by):
+        """ Returns the number of rows of every group, largest first (like value_counts()). """
+        def compute():
+            sizes = self.group_stats(by)['size'].iloc[:, 0]
+            return sizes.sort_values(ascending=False, kind='stable').rename('count')
+        return self._memoized(('counts', by), compute)
+
+    def positive_counts(self, by, col_name):
+        """ Returns the number of rows with col_name > 0 of every group, largest first. """
+        return self._memoized(('positive', by, col_name),
+                              lambda: self.group_stats(by)['positive'][col_name]
+                              .sort_values(ascending=False, kind='stable').rename('count'))
+
+    def value_counts(self, col_name):
+        """ Returns the value counts of a column, largest first. """
+        return self._memoized(('value_counts', col_name), lambda: self.df[col_name].value_counts())
+
+    def correlation(self):
+        """ Returns the correlation matrix of the numerical attributes. """
+        return self._memoized(('correlation',), lambda: self.df[self.numerical_attributes].corr())
+
+    def compute_all(self):
+        """ Computes the aggregates of every dimension and the correlation matrix (e.g. before forking workers). """
+        for by in self.dimensions:
+            if by in self.df.columns:
+                self.group_means(by)
+                self.group_counts(by)
+        self.correlation()
+        return self
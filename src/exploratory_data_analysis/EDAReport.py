@@ -0,0 +1,180 @@
+from src.data_processing.DatasetRegistry import DatasetRegistry
+from src.data_processing.SmartphonesDataset import SmartphonesDataset
+from src.exploratory_data_analysis.ExploratoryDataAnalysis import ExploratoryDataAnalysis
+from src.exploratory_data_analysis.AggregateCube import AggregateCube
+from src.exploratory_data_analysis.feature_analysis.PriceAnalysis import PriceAnalysis
+from src.exploratory_data_analysis.feature_analysis.RatingAnalysis import RatingAnalysis
+from src.exploratory_data_analysis.feature_analysis.BrandAnalysis import BrandAnalysis
+from src.exploratory_data_analysis.feature_analysis.ModelAnalysis import ModelAnalysis
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import hashlib
+import inspect
+import json
+import os
+import time
+import matplotlib
+import pandas as pd
+
+
+# Every figure of the EDA, in the order of RunEDA.run_visualizations: (analysis class, figure method)
+FIGURES = [
+    (ExploratoryDataAnalysis, 'correlation_heatmap'),
+    (PriceAnalysis, 'correlation_bar_plots'),
+    (PriceAnalysis, 'price_distribution_plot'),
+    (RatingAnalysis, 'avg_rating_distribution_plot'),
+    (RatingAnalysis, 'avg_rating_vs_price'),
+    (BrandAnalysis, 'brand_distribution'),
+    (BrandAnalysis, 'avg_rating_by_brand'),
+    (BrandAnalysis, 'avg_price_by_brand'),
+    (BrandAnalysis, 'pie_chart_5g_by_brand'),
+    (BrandAnalysis, 'pie_chart_fast_charging_by_brand'),
+    (BrandAnalysis, 'avg_rear_cameras_by_brand'),
+    (ModelAnalysis, 'most_expensive_and_highest_rated_models'),
+    (ModelAnalysis, 'pie_chart_5g_and_memory_distribution'),
+    (ModelAnalysis, 'price_comparison_by_5g'),
+    (ExploratoryDataAnalysis, 'processor_speed_strip_plot'),
+    (ExploratoryDataAnalysis, 'os_pie_chart'),
+]
+
+
+_worker_dataset = None  # The report's dataset in a worker process, set by _init_worker
+
+
+def _init_worker(df, dataset_path):
+    """ Switches the worker to the headless Agg backend and gives it a dataset holding the report's dataframe. """
+    global _worker_dataset
+    matplotlib.use('Agg', force=True)
+    _worker_dataset = SmartphonesDataset.from_dataframe(df, dataset_path)
+
+
+def _render_figure(analysis_class, method_name, output_path, output_formats):
+    """ Renders one figure to '<output_path>.<format>' files. Returns the rendering time in seconds. """
+    start = time.perf_counter()
+    analysis = analysis_class(_worker_dataset)
+    analysis.output_path = output_path
+    analysis.output_formats = output_formats
+    getattr(analysis, method_name)()
+    return time.perf_counter() - start
+
+
+class EDAReport:
+    """
+        Renders every EDA figure to files without a display, in parallel worker processes.
+
+        Each figure is a separate task of a process pool, so the report takes about as long as its slowest
+        figure. A manifest in the output directory records the fingerprint every figure was rendered from:
+        the dataframe's contents plus the source code of the analysis classes and of the AggregateCube they
+        plot from. Figures whose fingerprint hasn't changed and whose files still exist are skipped.
+
+        Attributes:
+        ----------
+        output_dir : str
+            Directory of the rendered figures and of manifest.json.
+        output_formats : tuple
+            File formats every figure is saved in ('png', 'svg', ...).
+        n_workers : int
+            Number of worker processes (defaults to one per figure, at most the number of cores).
+        dataset : SmartphonesDataset
+            Dataset the figures are drawn from (the 'cleaned' dataset of the DatasetRegistry when None).
+
+        Methods:
+        -------
+        data_fingerprint(df)
+        figure_fingerprint(data_fingerprint, analysis_class, method_name)
+        run(force)
+    """
+
+    def __init__(self, output_dir='eda_report', output_formats=('png',), n_workers=None, dataset=None):
+        self.output_dir = output_dir
+        self.dataset = dataset
+        self.output_formats = tuple(output_formats)
+        self.n_workers = n_workers or min(len(FIGURES), os.cpu_count() or 1)
+        self.manifest_path = os.path.join(output_dir, 'manifest.json')
+
+    @staticmethod
+    def data_fingerprint(df):
+        """ Returns a sha256 fingerprint of the dataframe's columns, dtypes and values. """
+        sha = hashlib.sha256()
+        sha.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+        sha.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return sha.hexdigest()
+
+    def figure_fingerprint(self, data_fingerprint, analysis_class, method_name):
+        """ Returns the fingerprint of a figure: its data, the code drawing it and the output formats. """
+        sha = hashlib.sha256()
+        sha.update(data_fingerprint.encode())
+        sha.update(f"{analysis_class.__name__}.{method_name}:{','.join(self.output_formats)}".encode())
+        # The class, the analysis classes it inherits from and the cube its aggregates come from
+        for cls in (*analysis_class.__mro__[:-1], AggregateCube):
+            sha.update(inspect.getsource(cls).encode())
+        return sha.hexdigest()
+
+    def _load_manifest(self):
+        """ Returns the manifest of the previous run, an empty one if there is none. """
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _is_up_to_date(self, entry, fingerprint):
+        """ Returns True if a manifest entry has the fingerprint and all of its files exist. """
+        return (entry is not None and entry["fingerprint"] == fingerprint
+                and all(os.path.exists(path) for path in entry["files"]))
+
+    def run(self, force=False):
+        """
+        Renders the figures whose fingerprint changed since the last run (every figure when force is True)
+        and writes the manifest. Returns the manifest.
+        """
+        dataset = DatasetRegistry().get('cleaned') if self.dataset is None else self.dataset
+        df = dataset.get_df()
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        data_fingerprint = self.data_fingerprint(df)
+        manifest, tasks = self._load_manifest(), {}
+        for analysis_class, method_name in FIGURES:
+            fingerprint = self.figure_fingerprint(data_fingerprint, analysis_class, method_name)
+            if not force and self._is_up_to_date(manifest.get(method_name), fingerprint):
+                continue
+            tasks[method_name] = (analysis_class, fingerprint)
+
+        if tasks:
+            print(f"EDA report: rendering {len(tasks)} of {len(FIGURES)} figures "
+                  f"with {min(self.n_workers, len(tasks))} workers")
+        start = time.perf_counter()
+
+        if tasks:
+            # Forked workers inherit the aggregates instead of each computing them again
+            AggregateCube.for_dataframe(df, dataset.get_numerical_attributes()).compute_all()
+
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            with ProcessPoolExecutor(max_workers=min(self.n_workers, len(tasks)), mp_context=context,
+                                     initializer=_init_worker,
+                                     initargs=(df, dataset.get_dataset_path())) as executor:
+                futures = {method_name: executor.submit(_render_figure, analysis_class, method_name,
+                                                        os.path.join(self.output_dir, method_name),
+                                                        self.output_formats)
+                           for method_name, (analysis_class, _) in tasks.items()}
+
+                for method_name, future in futures.items():
+                    try:
+                        seconds = future.result()
+                    except Exception as e:
+                        print(f"Error occurred while rendering '{method_name}': {e}")
+                        manifest.pop(method_name, None)
+                        continue
+                    files = [os.path.join(self.output_dir, f"{method_name}.{output_format}")
+                             for output_format in self.output_formats]
+                    manifest[method_name] = {"fingerprint": tasks[method_name][1], "files": files,
+                                             "render_seconds": round(seconds, 3)}
+                    print(f"Rendered {method_name} in {seconds:.2f} s")
+
+        with open(self.manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        print(f"EDA report written to {self.output_dir} in {time.perf_counter() - start:.2f} s "
+              f"({len(FIGURES) - len(tasks)} figures up to date)\n")
+        return manifest
@@ -1,6 +1,8 @@
 from src.data_processing.SmartphonesDataset import SmartphonesDataset
+from src.exploratory_data_analysis.AggregateCube import AggregateCube
 import matplotlib.pyplot as plt
 import seaborn as sns
+import pandas as pd
 
 
 class ExploratoryDataAnalysis:
@@ -9,9 +11,12 @@ class ExploratoryDataAnalysis:
 
         Attributes:
         ----------
-        smartphones_instance : Instance of SmartphonesDataset class
-        df: pandas.DataFrame
+        smartphones_instance : Instance of SmartphonesDataset class (the singleton unless a dataset is given)
+        df: pandas.DataFrame, a copy-on-write view of the dataset's dataframe
         numerical_attributes: list of numerical attributes of smartphones dataset
+        aggregates: AggregateCube shared by every analysis of the dataframe, the source of the plotted aggregates
+        output_path: str, when set, figures are saved to '<output_path>.<format>' instead of shown
+        output_formats: tuple of the file formats figures are saved in (e.g. 'png', 'svg')
 
         Methods:
         -------
@@ -23,14 +28,40 @@ class ExploratoryDataAnalysis:
         pie_chart_feature_by_brand()
     """
 
-    def __init__(self):
-        self.smartphones_instance = SmartphonesDataset()
-        self.df = self.smartphones_instance.get_df()
+    def __init__(self, dataset=None):
+        self.smartphones_instance = SmartphonesDataset() if dataset is None else dataset
+        self.df = self.smartphones_instance.get_view()
         self.numerical_attributes = self.smartphones_instance.get_numerical_attributes()
+        self.aggregates = AggregateCube.for_dataframe(self.df, self.numerical_attributes,
+                                                      source=self.smartphones_instance.get_df())
+        self.output_path = None
+        self.output_formats = ('png',)
+
+    def _show(self):
+        """ Shows the current figure, or saves it to files when output_path is set (headless report mode). """
+        if self.output_path is None:
+            plt.show()
+            return
+        for output_format in self.output_formats:
+            plt.savefig(f"{self.output_path}.{output_format}", format=output_format, bbox_inches='tight')
+        plt.close('all')
+
+    @staticmethod
+    def _plain_labels(data):
+        """
+        Returns data with its category columns (or category index) converted to plain values, so seaborn
+        orders the labels as they appear in the data and doesn't draw slots for categories absent from it.
+        """
+        if isinstance(data, pd.DataFrame):
+            category_cols = [col for col, dtype in data.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+            return data.astype({col: object for col in category_cols}) if category_cols else data
+        if isinstance(data.index, pd.CategoricalIndex):
+            return data.set_axis(data.index.astype(object))
+        return data
 
     def correlation_heatmap(self):
         """ Displays the correlation heatmap of numerical attributes. """
-        correlation_matrix = self.df[self.numerical_attributes].corr()
+        correlation_matrix = self.aggregates.correlation()
 
         # Plot the heatmap
         plt.figure(figsize=(10, 8))
@@ -44,28 +75,29 @@ class ExploratoryDataAnalysis:
         plt.subplots_adjust(left=0.2, bottom=0.2, right=0.95, top=0.95)
 
         plt.title('Correlation Heatmap')
-        plt.show()
+        self._show()
 
     def processor_speed_strip_plot(self):
         """ Displays a strip plot of processor speed by processor brand. """
         plt.figure(figsize=(10, 6))
-        sns.stripplot(x='processor_brand', y='processor_speed', data=self.df,
+        sns.stripplot(x='processor_brand', y='processor_speed',
+                      data=self._plain_labels(self.df[['processor_brand', 'processor_speed']]),
                       palette='Set2', hue='processor_brand', jitter=True, legend=False)
         plt.title('Processor Speed by Processor Brand', fontsize=14)
         plt.xlabel('Processor Brand', fontsize=12)
         plt.ylabel('Processor Speed (GHz)', fontsize=12)
         plt.xticks(rotation=45, fontsize=8)
-        plt.show()
+        self._show()
 
     def os_pie_chart(self):
         """ Displays a pie chart of operating system distribution. """
-        os_counts = self.df['os'].value_counts()
+        os_counts = self._plain_labels(self.aggregates.group_counts('os'))
 
         plt.figure(figsize=(8, 8))
         os_counts.plot.pie(autopct='%1.1f%%', startangle=90, cmap='Set3', explode=[0.05] + [0] * len(os_counts[1:]))
         plt.title('Operating System Distribution', fontsize=14)
         plt.ylabel('')
-        plt.show()
+        self._show()
 
     def feature_distribution_plot(self, col_name):
         """ Displays a histogram with KDE overlay of a given feature."""
@@ -78,65 +110,57 @@ class ExploratoryDataAnalysis:
         plt.xlabel(col_name, fontsize=12)
         plt.ylabel('Density', fontsize=12)
 
-        plt.show()
+        self._show()
 
     def avg_feature_by_brand(self, col_name):
         """
         Plots two bar plots on the same image: one for the top 10 brands with the highest average "col_name"
         and one for the least 10 brands with the lowest average "col_name", displaying values on top of each bar.
         """
-        # Sort the dataframe by the average feature for each brand
-        brand_ratings = self.df.groupby('brand_name')[col_name].mean().sort_values()
-
-        top_10_brands = brand_ratings.tail(10)  # Top 10 highest averages
-        least_10_brands = brand_ratings.head(10)  # Least 10 lowest averages
-
-        # Filter the dataframe for only these brands
-        top_brands_df = (self.df[self.df['brand_name'].isin(top_10_brands.index)]
-                         .sort_values(by=col_name, ascending=False))
+        # Sort the brands by their average feature
+        brand_averages = self._plain_labels(self.aggregates.group_means('brand_name')[col_name]
+                                            .sort_values(ascending=False))
 
-        least_brands_df = (self.df[self.df['brand_name'].isin(least_10_brands.index)]
-                           .sort_values(by=col_name, ascending=False))
+        top_10_brands = brand_averages.head(10)  # Top 10 highest averages
+        least_10_brands = brand_averages.tail(10)  # Least 10 lowest averages
 
         # Create a figure with two subplots
         fig, axes = plt.subplots(1, 2, figsize=(18, 6))
 
         # Plot for the top 10 brands with the highest averages
-        sns.barplot(x='brand_name', y=col_name, data=top_brands_df, palette='Blues',
-                    ax=axes[0], hue='brand_name', legend=False)
+        sns.barplot(x=top_10_brands.index, y=top_10_brands.values, palette='Blues',
+                    ax=axes[0], hue=top_10_brands.index, legend=False)
         axes[0].set_title(f'Top 10 Brands with Highest Average {col_name}', fontsize=14)
         axes[0].set_xlabel('Brand', fontsize=12)
         axes[0].set_ylabel(f'Average {col_name}', fontsize=12)
         axes[0].tick_params(axis='x', rotation=0)
 
         # Add numbers on top of each bar for the top 10 brands
-        for index, value in enumerate(
-                top_brands_df.groupby('brand_name')[col_name].mean().sort_values(ascending=False)):
+        for index, value in enumerate(top_10_brands.values):
             axes[0].text(index, value + 0.02, f'{value:.2f}', ha='center', va='bottom', fontsize=10)
 
         # Plot for the least 10 brands with the lowest averages
-        sns.barplot(x='brand_name', y=col_name, data=least_brands_df, palette='Reds',
-                    ax=axes[1], hue='brand_name', legend=False)
+        sns.barplot(x=least_10_brands.index, y=least_10_brands.values, palette='Reds',
+                    ax=axes[1], hue=least_10_brands.index, legend=False)
         axes[1].set_title(f'Top 10 Brands with Lowest Average {col_name}', fontsize=14)
         axes[1].set_xlabel('Brand', fontsize=12)
         axes[1].set_ylabel(f'Average {col_name}', fontsize=12)
         axes[1].tick_params(axis='x', rotation=0)
 
         # Add numbers on top of each bar for the least 10 brands
-        for index, value in enumerate(
-                least_brands_df.groupby('brand_name')[col_name].mean().sort_values(ascending=False)):
+        for index, value in enumerate(least_10_brands.values):
             axes[1].text(index, value + 0.02, f'{value:.2f}', ha='center', va='bottom', fontsize=10)
 
         # Display the plot
         plt.tight_layout()
-        plt.show()
+        self._show()
 
     def pie_chart_feature_by_brand(self, col_name):
         """ Plots a pie chart showing the percentage of features by brand. """
 
         # Calculate percentage based on all 5G smartphones, not just the top 10
-        brand_feature_counts = self.df[self.df[col_name] > 0]['brand_name'].value_counts()
-        top_10_counts = brand_feature_counts.head(10) # Select top 10 brands
+        brand_feature_counts = self.aggregates.positive_counts('brand_name', col_name)
+        top_10_counts = self._plain_labels(brand_feature_counts.head(10)) # Select top 10 brands
 
         # Plot the pie chart
         plt.figure(figsize=(10, 8))
@@ -151,4 +175,4 @@ class ExploratoryDataAnalysis:
 
         plt.title(f'Percentage of {col_name} Smartphones by Top 10 Brands', fontsize=14)
         plt.ylabel('')
-        plt.show()
+        self._show()
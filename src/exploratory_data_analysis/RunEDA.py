@@ -3,6 +3,8 @@ from src.exploratory_data_analysis.feature_analysis.PriceAnalysis import PriceAn
 from src.exploratory_data_analysis.feature_analysis.RatingAnalysis import RatingAnalysis
 from src.exploratory_data_analysis.feature_analysis.BrandAnalysis import BrandAnalysis
 from src.exploratory_data_analysis.feature_analysis.ModelAnalysis import ModelAnalysis
+from src.exploratory_data_analysis.EDAReport import EDAReport
+from src.benchmark.Instrumentation import Instrumentation
 
 
 class RunEDA:
@@ -16,46 +18,70 @@ class RunEDA:
         rating_analysis : instance of RatingAnalysis class
         brand_analysis : instance of BrandAnalysis class
         model_analysis : instance of ModelAnalysis class
+        instrumentation : instance of Instrumentation class, records the time and memory of every visualization
 
         Methods:
         -------
         run_visualizations()
+        run_report(output_dir, output_formats, n_workers, force, instrumentation, dataset)
     """
 
-    def __init__(self):
-        self.exploratory_data_analysis = ExploratoryDataAnalysis()
-        self.price_analysis = PriceAnalysis()
-        self.rating_analysis = RatingAnalysis()
-        self.brand_analysis = BrandAnalysis()
-        self.model_analysis = ModelAnalysis()
+    def __init__(self, dataset=None, instrumentation=None):
+        # Every analysis reads a copy-on-write view of the dataset (the singleton when None)
+        self.exploratory_data_analysis = ExploratoryDataAnalysis(dataset)
+        self.price_analysis = PriceAnalysis(dataset)
+        self.rating_analysis = RatingAnalysis(dataset)
+        self.brand_analysis = BrandAnalysis(dataset)
+        self.model_analysis = ModelAnalysis(dataset)
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
 
     def run_visualizations(self):
         """ Runs all the visualizations for exploratory data analysis"""
+        visualizations = (
+            self.exploratory_data_analysis.correlation_heatmap,
 
-        self.exploratory_data_analysis.correlation_heatmap()
+            # Analyzing price
+            self.price_analysis.correlation_bar_plots,
+            self.price_analysis.price_distribution_plot,
 
-        # Analyzing price
-        self.price_analysis.correlation_bar_plots()
-        self.price_analysis.price_distribution_plot()
+            # Analyzing avg_rating
+            self.rating_analysis.avg_rating_distribution_plot,
+            self.rating_analysis.avg_rating_vs_price,
 
-        # Analyzing avg_rating
-        self.rating_analysis.avg_rating_distribution_plot()
-        self.rating_analysis.avg_rating_vs_price()
+            # Analyzing brands
+            self.brand_analysis.brand_distribution,
+            self.brand_analysis.avg_rating_by_brand,
+            self.brand_analysis.avg_price_by_brand,
+            self.brand_analysis.pie_chart_5g_by_brand,
+            self.brand_analysis.pie_chart_fast_charging_by_brand,
+            self.brand_analysis.avg_rear_cameras_by_brand,
 
-        # Analyzing brands
-        self.brand_analysis.brand_distribution()
-        self.brand_analysis.avg_rating_by_brand()
-        self.brand_analysis.avg_price_by_brand()
-        self.brand_analysis.pie_chart_5g_by_brand()
-        self.brand_analysis.pie_chart_fast_charging_by_brand()
-        self.brand_analysis.avg_rear_cameras_by_brand()
+            # Analyzing models
+            self.model_analysis.most_expensive_and_highest_rated_models,
+            self.model_analysis.pie_chart_5g_and_memory_distribution,
+            self.model_analysis.price_comparison_by_5g,
 
-        # Analyzing models
-        self.model_analysis.most_expensive_and_highest_rated_models()
-        self.model_analysis.pie_chart_5g_and_memory_distribution()
-        self.model_analysis.price_comparison_by_5g()
+            # General analysis
+            self.exploratory_data_analysis.processor_speed_strip_plot,
+            self.exploratory_data_analysis.os_pie_chart,
+        )
 
-        # General analysis
-        self.exploratory_data_analysis.processor_speed_strip_plot()
-        self.exploratory_data_analysis.os_pie_chart()
+        rows = lambda: len(self.exploratory_data_analysis.df)
+        with self.instrumentation.step('run_visualizations', 'eda', rows):
+            for visualization in visualizations:
+                with self.instrumentation.step(visualization.__name__, 'eda', rows):
+                    visualization()
         print()
+
+    @staticmethod
+    def run_report(output_dir='eda_report', output_formats=('png',), n_workers=None, force=False,
+                   instrumentation=None, dataset=None):
+        """
+        Renders every visualization to files in output_dir without a display, in parallel worker processes.
+        Figures whose data and code haven't changed since the last report are skipped unless force is True.
+        The figures are rendered in worker processes, so the instrumentation records the report as one step.
+        The figures are drawn from dataset, the 'cleaned' dataset of the DatasetRegistry when None.
+        """
+        instrumentation = instrumentation or Instrumentation(enabled=False)
+        with instrumentation.step('run_report', 'eda'):
+            return EDAReport(output_dir, output_formats, n_workers, dataset).run(force)
@@ -19,8 +19,8 @@ class BrandAnalysis(ExploratoryDataAnalysis):
         avg_rear_cameras_by_brand()
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, dataset=None):
+        super().__init__(dataset)
 
     def avg_rating_by_brand(self):
         """ Calls avg_feature_by_brand() with 'avg_rating' as the feature argument. """
@@ -38,7 +38,8 @@ class BrandAnalysis(ExploratoryDataAnalysis):
         This bar plot visualizes the count of smartphones for each brand,
         helping to understand which brands have the most or least devices.
         """
-        brand_counts = self.df['brand_name'].value_counts() # Count the number of smartphones per brand
+        # Count the number of smartphones per brand
+        brand_counts = self._plain_labels(self.aggregates.group_counts('brand_name'))
 
         # Plot the distribution
         plt.figure(figsize=(12, 6))
@@ -54,7 +55,7 @@ class BrandAnalysis(ExploratoryDataAnalysis):
             plt.text(index, value + 1, str(value), ha='center', va='bottom', fontsize=10)
 
         plt.tight_layout()
-        plt.show()
+        self._show()
 
     def pie_chart_5g_by_brand(self):
         """
@@ -70,7 +71,8 @@ class BrandAnalysis(ExploratoryDataAnalysis):
 
     def avg_rear_cameras_by_brand(self):
         """ Plots a bar chart showing the average number of rear cameras by brand. """
-        camera_counts = self.df.groupby('brand_name')['num_rear_cameras'].mean().sort_values(ascending=False).head(10)
+        camera_counts = self._plain_labels(self.aggregates.group_means('brand_name')['num_rear_cameras']
+                                           .sort_values(ascending=False).head(10))
         plt.figure(figsize=(10, 6))
         sns.barplot(x=camera_counts.index, y=camera_counts.values,
                     palette='Blues', hue=camera_counts.index, legend=False)
@@ -78,5 +80,5 @@ class BrandAnalysis(ExploratoryDataAnalysis):
         plt.xlabel('Brand', fontsize=12)
         plt.ylabel('Average Number of Cameras', fontsize=12)
         plt.xticks(rotation=45)
-        plt.show()
+        self._show()
 
@@ -17,8 +17,8 @@ class ModelAnalysis(ExploratoryDataAnalysis):
         price_comparison_by_5g()
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, dataset=None):
+        super().__init__(dataset)
 
     def most_expensive_and_highest_rated_models(self):
         """
@@ -69,7 +69,7 @@ class ModelAnalysis(ExploratoryDataAnalysis):
             axes[1].bar_label(container, fmt='%.2f', fontsize=8, label_type='edge')
 
         plt.tight_layout()
-        plt.show()
+        self._show()
 
     def pie_chart_5g_and_memory_distribution(self):
         """
@@ -78,10 +78,10 @@ class ModelAnalysis(ExploratoryDataAnalysis):
         2. The percentage of smartphone models with and without extended memory.
         """
         # Count the number of smartphones with and without 5G
-        five_g_count = self.df['5G_or_not'].value_counts()
+        five_g_count = self.aggregates.value_counts('5G_or_not')
 
         # Count the number of smartphones with and without extended memory
-        extended_memory_count = self.df['extended_memory_available'].value_counts()
+        extended_memory_count = self.aggregates.value_counts('extended_memory_available')
 
         # Create a figure with two subplots
         fig, axes = plt.subplots(1, 2, figsize=(16, 8))
@@ -112,7 +112,7 @@ class ModelAnalysis(ExploratoryDataAnalysis):
 
         # Display the plot
         plt.tight_layout()
-        plt.show()
+        self._show()
 
     def price_comparison_by_5g(self):
         """ Plots a boxplot to compare the price of 5G and non-5G smartphones. """
@@ -124,8 +124,9 @@ class ModelAnalysis(ExploratoryDataAnalysis):
         plt.xticks([0, 1], ['Without 5G', 'With 5G'])
 
         # Calculate the average price for 5G and non-5G smartphones
-        avg_price_5g = round(self.df[self.df['5G_or_not'] == 1]['price'].mean())
-        avg_price_non_5g = round(self.df[self.df['5G_or_not'] == 0]['price'].mean())
+        avg_prices = self.aggregates.group_means('5G_or_not')['price']
+        avg_price_5g = round(avg_prices[1])
+        avg_price_non_5g = round(avg_prices[0])
 
         # Display the average prices on the plot
         plt.text(0, avg_price_non_5g - 500, f'${avg_price_non_5g:.2f}', horizontalalignment='center', fontsize=12,
@@ -133,4 +134,4 @@ class ModelAnalysis(ExploratoryDataAnalysis):
         plt.text(1, avg_price_5g - 800, f'${avg_price_5g:.2f}', horizontalalignment='center', fontsize=12, color='black')
 
         # Show the plot
-        plt.show()
+        self._show()
@@ -15,8 +15,8 @@ class PriceAnalysis(ExploratoryDataAnalysis):
         price_distribution_plot()
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, dataset=None):
+        super().__init__(dataset)
 
     def correlation_bar_plots(self):
         """
@@ -28,7 +28,7 @@ class PriceAnalysis(ExploratoryDataAnalysis):
         correlations with the price column, showing how each one influences the price.
         """
         # Compute the correlation matrix for numerical features
-        correlation_matrix = self.df[self.numerical_attributes].corr()
+        correlation_matrix = self.aggregates.correlation()
         price_correlation = correlation_matrix['price']
 
         # Separate positive and negative correlations
@@ -56,7 +56,7 @@ class PriceAnalysis(ExploratoryDataAnalysis):
 
         # Adjust layout for better readability
         plt.tight_layout()
-        plt.show()
+        self._show()
 
         """ 
         Observations:
@@ -15,8 +15,8 @@ class RatingAnalysis(ExploratoryDataAnalysis):
         avg_rating_vs_price()
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, dataset=None):
+        super().__init__(dataset)
 
     def avg_rating_distribution_plot(self):
         """
@@ -36,4 +36,4 @@ class RatingAnalysis(ExploratoryDataAnalysis):
         plt.title('Average Rating vs Price', fontsize=14)
         plt.xlabel('Price', fontsize=12)
         plt.ylabel('Average Rating', fontsize=12)
-        plt.show()
+        self._show()
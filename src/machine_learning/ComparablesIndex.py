@@ -0,0 +1,181 @@
+from sklearn.neighbors import KDTree
+import joblib
+import numpy as np
+import pandas as pd
+
+
+class ComparablesIndex:
+    """
+    A nearest-neighbour index of the cleaned catalog, to look up the existing phones most similar to a new one.
+
+    The numerical attributes (without the price, which is what the comparables are used to judge) are
+    standardized with the catalog's means and standard deviations, so every attribute weighs the same,
+    and indexed in a KD-tree. A sub-index is built for every brand and every OS, so filtered queries
+    search only the phones of that brand or OS. Queries are batched: all the phones of a request are
+    scaled as one matrix and looked up with a single tree query.
+
+    Attributes:
+        feature_columns (list): Numerical attributes the distance is computed on.
+        filter_columns (tuple): Columns queries can be filtered on ('brand_name', 'os').
+        catalog_columns (tuple): Columns of the catalog returned with every comparable.
+        leaf_size (int): Leaf size of the KD-trees.
+
+    Methods:
+        fit(df): Builds the index over a cleaned catalog.
+        query(phones, k, filters, match): Returns the k closest catalog phones of every phone, as a dataframe.
+        save(path): Saves the index.
+        load(path): Returns a saved index.
+    """
+
+    def __init__(self, feature_columns, filter_columns=('brand_name', 'os'),
+                 catalog_columns=('model', 'brand_name', 'os', 'price'), leaf_size=40):
+        self.feature_columns = list(feature_columns)
+        self.filter_columns = tuple(filter_columns)
+        self.catalog_columns = tuple(catalog_columns)
+        self.leaf_size = leaf_size
+        self._means = None
+        self._scales = None
+        self._X = None  # Standardized catalog features
+        self._tree = None
+        self._sub_indexes = {}  # (column, value) -> (catalog row numbers, KDTree of those rows)
+        self._catalog = None
+        self._filter_values = {}  # Filter column -> normalized values of the catalog
+
+    def _scale(self, df):
+        """ Returns the standardized feature matrix of df. Missing attributes are set to the catalog mean. """
+        matrix = np.empty((len(df), len(self.feature_columns)), dtype=np.float64)
+        for index, col in enumerate(self.feature_columns):
+            if col in df.columns:
+                values = pd.to_numeric(df[col], errors='coerce')
+                matrix[:, index] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            else:
+                matrix[:, index] = np.nan
+        matrix = (matrix - self._means) / self._scales
+        np.nan_to_num(matrix, copy=False, nan=0.0)  # 0 is the mean after scaling
+        return matrix
+
+    @staticmethod
+    def _normalize(values):
+        """ Returns the values of a filter column as stripped lowercase strings, so 'Samsung' matches 'samsung'. """
+        values = pd.Series(values, dtype=object)
+        return values.where(values.isnull(), values.astype(str).str.strip().str.lower())
+
+    @staticmethod
+    def _split(values):
+        """ Returns {value -> row numbers of the value} of a Series, with one sort instead of a scan per value. """
+        codes, uniques = pd.factorize(values)  # Nulls get the code -1 and are left out
+        order = np.argsort(codes, kind='stable')
+        boundaries = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        return {uniques[code]: order[boundaries[code]:boundaries[code + 1]] for code in range(len(uniques))}
+
+    def fit(self, df):
+        """ Builds the index and the per-brand and per-OS sub-indexes over the cleaned catalog df. """
+        self.feature_columns = [col for col in self.feature_columns if col in df.columns]
+        features = df[self.feature_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        self._means = np.nanmean(features, axis=0)
+        scales = np.nanstd(features, axis=0)
+        self._scales = np.where(scales > 0, scales, 1.0)
+        X = self._X = self._scale(df)
+
+        self._tree = KDTree(X, leaf_size=self.leaf_size)
+        self._catalog = {col: df[col].to_numpy(dtype=object) for col in self.catalog_columns if col in df.columns}
+
+        self._sub_indexes, self._filter_values = {}, {}
+        for col in self.filter_columns:
+            if col not in df.columns:
+                continue
+            self._filter_values[col] = self._normalize(df[col])
+            for value, rows in self._split(self._filter_values[col]).items():
+                self._sub_indexes[(col, value)] = (rows, KDTree(X[rows], leaf_size=self.leaf_size))
+        return self
+
+    def _search(self, X, k, filters):
+        """
+        Returns the (distances, catalog row numbers) of the k nearest rows of X among the catalog phones matching
+        filters ({column: value}). The smallest matching sub-index is searched, and the other filters are
+        applied to its candidates.
+        """
+        if not filters:
+            return self._tree.query(X, k=min(k, len(self._X)))
+
+        sub_indexes = []
+        for col, value in filters.items():
+            if (col, value) not in self._sub_indexes:
+                return np.empty((len(X), 0)), np.empty((len(X), 0), dtype=np.intp)
+            sub_indexes.append(self._sub_indexes[(col, value)])
+        rows, tree = min(sub_indexes, key=lambda sub_index: len(sub_index[0]))
+
+        if len(sub_indexes) == 1:
+            distances, positions = tree.query(X, k=min(k, len(rows)))
+            return distances, rows[positions]
+
+        # Several filters: the candidates of the smallest sub-index matching all of them are few, compare them all
+        matching = np.ones(len(rows), dtype=bool)
+        for col, value in filters.items():
+            matching &= self._filter_values[col].to_numpy()[rows] == value
+        rows = rows[matching]
+        k = min(k, len(rows))
+        if k == 0:
+            return np.empty((len(X), 0)), np.empty((len(X), 0), dtype=np.intp)
+        all_distances = np.sqrt(((X[:, None, :] - self._X[rows][None, :, :]) ** 2).sum(axis=2))
+        positions = np.argsort(all_distances, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(all_distances, positions, axis=1), rows[positions]
+
+    def query(self, phones, k=5, filters=None, match=()):
+        """
+        Returns the k closest catalog phones of every phone in phones (a DataFrame, a list of dicts or a dict),
+        as a dataframe with the columns query_index, rank, distance and the catalog columns.
+        filters ({'brand_name': 'samsung'}) restricts every query to the matching catalog phones, and match
+        (('brand_name',)) restricts each phone to the catalog phones with its own value of those columns.
+        A phone whose value of a match column is null (or which doesn't have the column) isn't restricted on
+        that column: it gets the closest phones of the whole catalog (within the other filters).
+        Raises a ValueError for a filter or match column that isn't one of filter_columns.
+        """
+        unknown = [col for col in (*(filters or {}), *match) if col not in self.filter_columns]
+        if unknown:
+            raise ValueError(f"Can't filter on {unknown}, the index can filter on: {list(self.filter_columns)}")
+
+        if isinstance(phones, dict):
+            phones = [phones]
+        df = phones if isinstance(phones, pd.DataFrame) else pd.DataFrame(list(phones))
+        df = df.reset_index(drop=True)
+        X = self._scale(df)
+        filters = {col: self._normalize([value])[0] for col, value in (filters or {}).items()}
+
+        # The phones are queried in one batch per combination of matched values (None for a null value)
+        if match:
+            match_values = [self._normalize(df[col]) if col in df.columns else pd.Series([None] * len(df))
+                            for col in match]
+            keys = pd.Series(list(zip(*(values.astype(object).where(values.notnull(), None)
+                                        for values in match_values))), dtype=object)
+            batches = self._split(keys)
+        else:
+            batches = {(): np.arange(len(df))}
+
+        frames = []
+        for key, query_rows in batches.items():
+            matched = {col: value for col, value in zip(match, key) if value is not None}
+            distances, rows = self._search(X[query_rows], k, {**filters, **matched})
+            n_found = rows.shape[1]
+            if n_found == 0:
+                continue
+            frame = {"query_index": np.repeat(query_rows, n_found),
+                     "rank": np.tile(np.arange(1, n_found + 1), len(query_rows)),
+                     "distance": distances.ravel()}
+            frame.update({col: values[rows.ravel()] for col, values in self._catalog.items()})
+            frames.append(pd.DataFrame(frame))
+
+        columns = ["query_index", "rank", "distance", *self._catalog]
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True).sort_values(["query_index", "rank"], kind='stable',
+                                                                ignore_index=True)[columns]
+
+    def save(self, path):
+        """ Saves the index (the scaled KD-trees, the scaling and the catalog columns) to path. """
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        """ Returns the index saved at path. """
+        return joblib.load(path)
@@ -0,0 +1,135 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import threading
+import weakref
+import numpy as np
+import pandas as pd
+
+
+class EncodingCache:
+    """
+    A process-wide cache of encoded feature matrices, shared by every ModelTraining subclass.
+
+    Entries are keyed by the content fingerprint of the dataset and the encoding type, so the encoding
+    (pd.get_dummies or frequency maps) runs once per dataset no matter how many models are trained on it.
+    When a cache directory is given, entries are also persisted as .npy files (plus a small json file with
+    the columns and encoding maps) and reused by later runs on the same data.
+
+    Hashing a dataframe costs about as much as encoding it, so the fingerprint is computed once per source
+    dataframe (the dataset's dataframe the models' views are taken from) and memoized while that dataframe
+    is alive. A source must therefore not be modified in place once it was fingerprinted (replacing it, as
+    SmartphonesDataset.set_df does, is fine). At most max_entries encodings are kept in memory, the least
+    recently used one being evicted first.
+
+    Attributes:
+        _entries (OrderedDict): Class-level cache, (fingerprint, encoding_type) -> (X, y, encoding_maps).
+        max_entries (int): Class-level maximum number of in-memory entries.
+        cache_dir (str): Optional directory for the persisted .npy files.
+
+    Methods:
+        fingerprint(df): Returns the content fingerprint of a dataframe.
+        source_fingerprint(source): Returns the fingerprint of a source dataframe, computed once per dataframe.
+        get(df, encoding_type, build_func, source): Returns the cached (X, y, encoding_maps), building them on a miss.
+        clear(): Removes every in-memory entry.
+    """
+
+    _entries = OrderedDict()  # Class-level attribute shared by every instance
+    max_entries = 8
+    # id(source) -> (weak reference to source, fingerprint); an entry is dropped when its source is collected
+    _fingerprints = {}
+    _lock = threading.RLock()  # Reentrant: the weak reference callback may run during a locked allocation
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+
+    @staticmethod
+    def fingerprint(df):
+        """ Returns a sha256 fingerprint of the dataframe's columns, dtypes and values. """
+        sha = hashlib.sha256()
+        sha.update(json.dumps([[str(col), str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+        sha.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+        return sha.hexdigest()
+
+    @classmethod
+    def source_fingerprint(cls, source):
+        """ Returns the fingerprint of source, computed on first use and memoized while source is alive. """
+        with cls._lock:
+            memo = cls._fingerprints.get(id(source))
+            if memo is not None and memo[0]() is source:
+                return memo[1]
+            key = id(source)
+            reference = weakref.ref(source, lambda ref: cls._forget(key, ref))
+            cls._fingerprints[key] = (reference, cls.fingerprint(source))
+            return cls._fingerprints[key][1]
+
+    @classmethod
+    def _forget(cls, key, reference):
+        """ Drops the fingerprint of a collected source, unless its id was already reused by a newer one. """
+        with cls._lock:
+            memo = cls._fingerprints.get(key)
+            if memo is not None and memo[0] is reference:
+                del cls._fingerprints[key]
+
+    def _paths(self, key):
+        """ Returns the paths of the persisted X, y and metadata files of a cache key. """
+        prefix = os.path.join(self.cache_dir, f"{key[0][:16]}_{key[1]}")
+        return f"{prefix}_X.npy", f"{prefix}_y.npy", f"{prefix}_meta.json"
+
+    def _load_from_disk(self, key):
+        """ Loads a persisted entry, returning None if it doesn't exist. """
+        X_path, y_path, meta_path = self._paths(key)
+        if not all(os.path.exists(path) for path in (X_path, y_path, meta_path)):
+            return None
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta["fingerprint"] != key[0]:
+            return None
+
+        X = pd.DataFrame(np.load(X_path), columns=meta["columns"])
+        y = pd.Series(np.load(y_path), name=meta["target"])
+        return X, y, meta["maps"]
+
+    def _save_to_disk(self, key, X, y, encoding_maps):
+        """ Persists an entry as X/y .npy files and a json file with the columns and maps. """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        X_path, y_path, meta_path = self._paths(key)
+        np.save(X_path, X.to_numpy(dtype=np.float64))
+        np.save(y_path, y.to_numpy(dtype=np.float64))
+        with open(meta_path, 'w') as f:
+            json.dump({"fingerprint": key[0], "columns": X.columns.tolist(), "target": y.name,
+                       "maps": encoding_maps}, f, default=float)
+
+    def get(self, df, encoding_type, build_func, source=None):
+        """
+        Returns the (X, y, encoding_maps) of df for the given encoding type.
+        build_func(encoding_type) is called only when neither memory nor disk has the entry.
+        When df is a view, source is the dataframe it was taken from, whose memoized fingerprint is used.
+        """
+        key = (self.source_fingerprint(df if source is None else source), encoding_type)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.cache_dir is not None:
+                entry = self._load_from_disk(key)
+                if entry is not None:
+                    print(f"Loaded {encoding_type} encoded features from {self.cache_dir}")
+
+            if entry is None:
+                entry = build_func(encoding_type)
+                if self.cache_dir is not None:
+                    self._save_to_disk(key, *entry)
+
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+    @classmethod
+    def clear(cls):
+        """ Removes every in-memory entry. """
+        with cls._lock:
+            cls._entries.clear()
@@ -0,0 +1,288 @@
+import json
+import os
+import shutil
+import time
+import numpy as np
+
+
+class FlatTreeEnsemble:
+    """
+    A tree ensemble compiled into flat NumPy arrays for fast inference.
+
+    Every tree of a fitted RandomForestRegressor, GradientBoostingRegressor or DecisionTreeRegressor is
+    concatenated into contiguous feature/threshold/child/value arrays. predict() walks all trees for a
+    whole batch level by level with vectorized steps, setting aside the (tree, row) pairs that reached a
+    leaf as it goes, instead of dispatching to sklearn once per estimator.
+
+    The prediction is base + scale * (sum of the leaf values of all trees), which gives the mean of the
+    trees for a random forest and init + learning_rate * sum of the stages for gradient boosting.
+
+    save() writes a folder with one uncompressed .npy file per array and a small header.json holding
+    the scalars and the metadata. load() memory-maps the arrays (mmap_mode='r'), so loading is almost
+    instant and every process scoring with the same model shares the pages of the OS page cache instead
+    of holding its own copy of the trees. The older single-file .npz format can still be loaded.
+
+    Attributes:
+        feature (np.ndarray): Feature index tested at each node.
+        threshold (np.ndarray): Split threshold at each node (x <= threshold goes left).
+        left (np.ndarray): Global index of the left child of each node (itself for leaves).
+        right (np.ndarray): Global index of the right child of each node (itself for leaves).
+        missing_left (np.ndarray): Whether missing (NaN) values go to the left child.
+        value (np.ndarray): Value of each node.
+        roots (np.ndarray): Global index of the root node of each tree.
+        children (np.ndarray): The right and left child of each node, interleaved (see __init__).
+        max_depth (int): Depth of the deepest tree.
+        base (float): Constant added to every prediction.
+        scale (float): Factor applied to the sum of the leaf values.
+        metadata (dict): Extra information saved with the arrays ('features', 'maps', 'type').
+
+    Methods:
+        from_sklearn(model, metadata): Compiles a fitted sklearn tree ensemble.
+        predict(X): Predicts a batch of rows.
+        save(path): Saves the arrays and metadata to a folder (or a .npz file).
+        load(path, mmap_mode): Loads an ensemble saved with save(), memory-mapping the arrays of a folder.
+    """
+
+    _array_names = ('feature', 'threshold', 'left', 'right', 'missing_left', 'value', 'roots')
+    _header_file = 'header.json'
+    _compact_every = 4  # Levels between two checks for (tree, row) pairs that reached a leaf
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots, max_depth, base, scale,
+                 metadata=None, children=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.base = float(base)
+        self.scale = float(scale)
+        self.metadata = metadata or {}
+
+        # children[2 * node] is the right child and children[2 * node + 1] the left one,
+        # so the next node is a single gather at 2 * node + go_left. It is saved too, so a memory-mapped
+        # ensemble doesn't build a private copy
+        self.children = np.stack([right, left], axis=1).ravel() if children is None else children
+        self._is_leaf = None  # Built with _threshold32 on the first prediction
+        self._threshold32 = None
+
+    @classmethod
+    def from_sklearn(cls, model, metadata=None):
+        """ Compiles a fitted RandomForestRegressor, GradientBoostingRegressor or DecisionTreeRegressor. """
+        if hasattr(model, 'tree_'):  # A single decision tree
+            trees, base, scale = [model], 0.0, 1.0
+        elif hasattr(model, 'learning_rate'):  # Gradient boosting: init + learning_rate * sum of the stages
+            trees = [stage[0] for stage in model.estimators_]
+            base = 0.0 if isinstance(model.init_, str) else float(np.ravel(model.init_.constant_)[0])
+            scale = model.learning_rate
+        else:  # Random forest: mean of the trees
+            trees = list(model.estimators_)
+            base, scale = 0.0, 1.0 / len(trees)
+
+        features, thresholds, lefts, rights, missing_lefts, values, roots = [], [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for tree in trees:
+            tree_ = tree.tree_
+            node_ids = np.arange(tree_.node_count)
+            is_leaf = tree_.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree_.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree_.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree_.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree_.children_right) + offset)
+            missing_lefts.append(np.asarray(getattr(tree_, 'missing_go_to_left', np.zeros(tree_.node_count)),
+                                            dtype=bool))
+            values.append(tree_.value.reshape(tree_.node_count, -1)[:, 0])
+            roots.append(offset)
+
+            offset += tree_.node_count
+            max_depth = max(max_depth, tree_.max_depth)
+
+        return cls(np.concatenate(features).astype(np.intp),
+                   np.concatenate(thresholds).astype(np.float64),
+                   np.concatenate(lefts).astype(np.intp),
+                   np.concatenate(rights).astype(np.intp),
+                   np.concatenate(missing_lefts),
+                   np.concatenate(values).astype(np.float64),
+                   np.array(roots, dtype=np.intp),
+                   max_depth, base, scale, metadata)
+
+    @property
+    def n_trees(self):
+        """ Number of trees in the ensemble. """
+        return len(self.roots)
+
+    def predict(self, X, chunk_size=None):
+        """
+        Predicts a batch of rows. X is cast to float32 like sklearn does before comparing to the thresholds,
+        so the same leaves are reached. Rows are processed in chunks of about 65k (tree, row) pairs, which keeps
+        the per-level arrays in the CPU caches.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        chunk_size = chunk_size or max(1, (1 << 16) // self.n_trees)
+
+        predictions = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), chunk_size):
+            predictions[start:start + chunk_size] = self._predict_chunk(X[start:start + chunk_size])
+        return predictions
+
+    def _predict_chunk(self, X):
+        """
+        Walks all trees for all rows at once, one tree level per step. Every few levels the (tree, row) pairs
+        that reached a leaf are set aside once they are a quarter of the pairs still walking, so the deep
+        trees of a random forest only keep stepping the pairs that haven't finished, and the walk stops early
+        when every pair is at a leaf. X is read column by column, so the pairs that test the same feature
+        read neighbouring values.
+        """
+        n_rows = len(X)
+        X_columns = np.ascontiguousarray(X.T).ravel()
+        if self._is_leaf is None:
+            self._build_walk_tables()
+        column_starts = self.feature * n_rows
+        nodes = np.repeat(self.roots, n_rows)  # Tree-major (tree, row) pairs
+        rows = np.tile(np.arange(n_rows), self.n_trees)
+        walking = None  # Positions in nodes of the pairs still walking, once some were set aside
+        has_missing = bool(np.isnan(X_columns).any())
+
+        for level in range(1, self.max_depth + 1):
+            x = np.take(X_columns, np.take(column_starts, nodes) + rows)
+            go_left = x <= np.take(self._threshold32, nodes)
+            if has_missing:
+                go_left |= np.isnan(x) & np.take(self.missing_left, nodes)
+            nodes = np.take(self.children, 2 * nodes + go_left)
+
+            if level % self._compact_every:
+                continue
+            at_leaf = np.take(self._is_leaf, nodes)
+            if np.count_nonzero(at_leaf) * 4 < len(nodes):
+                continue
+            if walking is None:
+                leaves, walking = nodes, np.flatnonzero(~at_leaf)
+                nodes, rows = nodes[walking], rows[walking]
+            else:
+                leaves[walking[at_leaf]] = nodes[at_leaf]
+                still_walking = ~at_leaf
+                nodes, rows, walking = nodes[still_walking], rows[still_walking], walking[still_walking]
+
+        if walking is not None:
+            leaves[walking] = nodes
+            nodes = leaves
+        return self.base + self.scale * np.take(self.value, nodes).reshape(self.n_trees, n_rows).sum(axis=0)
+
+    def _build_walk_tables(self):
+        """
+        Builds the leaf mask and the float32 thresholds used by _predict_chunk. A float32 x is <= a float64
+        threshold exactly when it is <= the largest float32 not above it, so the comparison stays in float32.
+        """
+        self._is_leaf = self.left == np.arange(len(self.left))
+        threshold32 = self.threshold.astype(np.float32)
+        rounded_up = threshold32.astype(np.float64) > self.threshold
+        threshold32[rounded_up] = np.nextafter(threshold32[rounded_up], np.float32(-np.inf))
+        self._threshold32 = threshold32
+
+    def _header(self):
+        """ Returns the scalars and metadata saved next to the arrays. """
+        return {"max_depth": self.max_depth, "base": self.base, "scale": self.scale, "metadata": self.metadata}
+
+    def save(self, path):
+        """
+        Saves the ensemble to the folder path: '<array>.npy' files and a header.json (with a path ending
+        in .npz, to a single .npz file as before).
+        The folder is written next to the old one and swapped in, so processes that memory-mapped the old
+        arrays keep reading them, and new loads never see half-written files.
+        """
+        if path.endswith('.npz'):
+            np.savez(path, **{name: getattr(self, name) for name in self._array_names},
+                     header=np.array(json.dumps(self._header())))
+            return
+
+        path = path.rstrip(os.sep)
+        tmp_path, old_path = f"{path}.tmp-{os.getpid()}", f"{path}.old-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        header = self._header()
+        header["arrays"] = {}
+        for name in (*self._array_names, 'children'):
+            array = np.ascontiguousarray(getattr(self, name))
+            np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+            header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape)}
+        with open(os.path.join(tmp_path, self._header_file), 'w') as f:
+            json.dump(header, f)
+
+        # The old files are only unlinked: memory maps of them stay valid until they are closed
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """
+        Loads an ensemble saved with save(). The arrays of a folder are memory-mapped with mmap_mode
+        ('r' shares them read-only between processes, None reads them into memory).
+        """
+        if os.path.isdir(path):
+            with open(os.path.join(path, cls._header_file)) as f:
+                header = json.load(f)
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+                      for name in header["arrays"]}
+        else:
+            with np.load(path) as data:
+                header = json.loads(str(data['header']))
+                arrays = {name: data[name] for name in cls._array_names}
+        return cls(**arrays, max_depth=header['max_depth'], base=header['base'], scale=header['scale'],
+                   metadata=header['metadata'])
+
+
+def benchmark_against_sklearn(model, X, batch_sizes=(1, 10, 100, 1000, 10000), repeats=20):
+    """
+    Compares the prediction latency of the sklearn model and its compiled FlatTreeEnsemble
+    for several batch sizes, and checks that both return the same predictions.
+    Returns a list of dicts with the timings (in milliseconds) and the max absolute difference.
+    """
+    flat = FlatTreeEnsemble.from_sklearn(model)
+    X = np.asarray(X, dtype=np.float64)
+    results = []
+
+    for batch_size in batch_sizes:
+        batch = X[np.arange(batch_size) % len(X)]
+        timings = {}
+        for name, predict_func in (("sklearn", model.predict), ("flat", flat.predict)):
+            predict_func(batch)  # Warm up
+            start = time.perf_counter()
+            for _ in range(repeats):
+                predictions = predict_func(batch)
+            timings[name] = (time.perf_counter() - start) / repeats * 1000
+            timings[f"{name}_predictions"] = predictions
+
+        max_abs_diff = float(np.max(np.abs(timings["sklearn_predictions"] - timings["flat_predictions"])))
+        results.append({"batch_size": batch_size, "sklearn_ms": timings["sklearn"], "flat_ms": timings["flat"],
+                        "speedup": timings["sklearn"] / timings["flat"], "max_abs_diff": max_abs_diff})
+        print(f"batch size {batch_size:>6}: sklearn {timings['sklearn']:9.3f} ms, flat {timings['flat']:9.3f} ms, "
+              f"speedup {timings['sklearn'] / timings['flat']:6.1f}x, max abs diff {max_abs_diff:.2e}")
+
+    return results
+
+
+if __name__ == '__main__':
+    # Benchmarks the saved models against their flat versions on the cleaned dataset (run from the main folder)
+    import warnings
+    import joblib
+    import pandas as pd
+    from src.price_prediction.FeatureEncoder import FeatureEncoder
+
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    cleaned_df = pd.read_csv('../../datasets/cleaned_smartphones.csv')
+
+    for model_name in ["gradient_boosting_model", "random_forest_model"]:
+        try:
+            saved = joblib.load(f"saved_models/{model_name}.pkl")
+        except FileNotFoundError:
+            print(f"Skipping {model_name}: saved_models/{model_name}.pkl not found")
+            continue
+        print(f"\nBenchmarking {model_name}:")
+        benchmark_against_sklearn(saved["model"], FeatureEncoder.from_artifact(saved).transform(cleaned_df))
@@ -0,0 +1,195 @@
+from src.machine_learning.ModelTraining import ModelTraining
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.model_selection import ParameterGrid, ParameterSampler, train_test_split
+from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import multiprocessing
+import json
+import math
+import os
+import time
+import numpy as np
+import pandas as pd
+
+
+# Model name -> (estimator class, fixed parameters, default search space). n_estimators is not part of the
+# search space, it is the resource successive halving hands out to the promising candidates.
+SEARCH_SPACES = {
+    "Random Forest": (RandomForestRegressor, {"random_state": 42}, {
+        "max_depth": [None, 10, 20],
+        "min_samples_leaf": [1, 2, 4],
+        "max_features": [1.0, 0.5, 'sqrt'],
+    }),
+    "Gradient Boosting": (GradientBoostingRegressor, {"random_state": 42}, {
+        "learning_rate": [0.05, 0.1, 0.2],
+        "max_depth": [2, 3, 4, 5],
+        "subsample": [1.0, 0.8],
+        "min_samples_leaf": [1, 3],
+    }),
+}
+
+_worker_data = {}  # Training, validation and test data of a worker process, set once by _init_worker
+
+
+def _init_worker(X_train, y_train, X_val, y_val, X_test, y_test):
+    """ Stores the search data in the worker process so it isn't sent again with every candidate. """
+    _worker_data.update(X_train=X_train, y_train=y_train, X_val=X_val, y_val=y_val, X_test=X_test, y_test=y_test)
+
+
+def _evaluate_candidate(estimator_class, params, n_estimators, n_samples):
+    """
+    Fits one candidate on the first n_samples training rows with up to n_estimators estimators and scores it
+    on the validation set at several ensemble sizes from the same fit: every stage of a boosting model is
+    scored with staged_predict, and a forest is grown in steps with warm_start.
+    Returns the validation MSE of the best ensemble size, that size, and the scores it gets on the test set,
+    which played no part in choosing it.
+    """
+    X_train, y_train = _worker_data["X_train"][:n_samples], _worker_data["y_train"][:n_samples]
+    X_val, y_val = _worker_data["X_val"], _worker_data["y_val"]
+    X_test, y_test = _worker_data["X_test"], _worker_data["y_test"]
+    start = time.perf_counter()
+
+    if hasattr(estimator_class, 'staged_predict'):
+        model = estimator_class(n_estimators=n_estimators, **params).fit(X_train, y_train)
+        val_mse = [mean_squared_error(y_val, y_pred) for y_pred in model.staged_predict(X_val)]
+        best_n_estimators = int(np.argmin(val_mse)) + 1
+        best_val_mse = val_mse[best_n_estimators - 1]
+        test_pred = next(itertools.islice(model.staged_predict(X_test), best_n_estimators - 1, None))
+    else:
+        model = estimator_class(n_estimators=1, warm_start=True, n_jobs=1, **params)
+        staged = []
+        for size in sorted({max(1, n_estimators * step // 4) for step in range(1, 5)}):
+            model.set_params(n_estimators=size).fit(X_train, y_train)
+            staged.append((size, mean_squared_error(y_val, model.predict(X_val)), model.predict(X_test)))
+        best_n_estimators, best_val_mse, test_pred = min(staged, key=lambda item: item[1])
+
+    return {"val_mse": best_val_mse,
+            "best_n_estimators": best_n_estimators,
+            "test_mse": mean_squared_error(y_test, test_pred),
+            "test_mae": mean_absolute_error(y_test, test_pred),
+            "test_r2": r2_score(y_test, test_pred),
+            "fit_seconds": time.perf_counter() - start}
+
+
+class HyperparameterSearch:
+    """
+    Tunes the hyperparameters of a tree model with successive halving.
+
+    Every candidate starts with few estimators and a fraction of the training data. After each rung only the
+    best 1/factor of the candidates survive, and they get factor times more estimators and data, until the
+    last rung trains the finalists on the full training set with max_estimators. The candidates of a rung are
+    evaluated in parallel worker processes, and each fit is scored at several ensemble sizes (staged_predict
+    for gradient boosting, warm_start for random forests), so the best n_estimators comes for free.
+
+    The data is split three ways: the candidates are fitted on the training set, and both the surviving
+    candidates and their n_estimators are chosen on the validation set. The reported scores come from the
+    test set, which the selection never sees, so they aren't biased upward by it. The features are encoded
+    like the trained models', with a ModelTraining of the same data.
+
+    Attributes:
+        model_name (str): Key of SEARCH_SPACES ("Random Forest" or "Gradient Boosting").
+        param_space (dict): Grid (lists) or distributions to search.
+        n_candidates (int): Number of random samples from param_space, or None for the full grid.
+        min_estimators (int): Estimators given to every candidate in the first rung.
+        max_estimators (int): Estimators given to the finalists.
+        factor (int): Halving factor between rungs.
+        n_workers (int): Number of worker processes (defaults to the number of cores).
+        validation_size (float): Fraction of the data used to choose the candidates and their n_estimators.
+        test_size (float): Fraction of the data held out to score the chosen candidates.
+        leaderboard (pd.DataFrame): Scores of every evaluated (candidate, rung) after run().
+
+    Methods:
+        run(output_dir): Runs the search, writes the best config and the leaderboard and returns the best config.
+    """
+
+    def __init__(self, model_name, param_space=None, n_candidates=None, min_estimators=10, max_estimators=270,
+                 factor=3, n_workers=None, random_state=42, validation_size=0.2, test_size=0.2, df=None,
+                 dataset=None):
+        self._model_training = ModelTraining(df, dataset)  # Encodes the features like the trained models
+        self.model_name = model_name
+        self._estimator_class, self._fixed_params, default_space = SEARCH_SPACES[model_name]
+        self.param_space = param_space or default_space
+        self.n_candidates = n_candidates
+        self.min_estimators = min_estimators
+        self.max_estimators = max_estimators
+        self.factor = factor
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.random_state = random_state
+        self.validation_size = validation_size
+        self.test_size = test_size
+        self.leaderboard = None
+
+    def _candidates(self):
+        """ Returns the full grid, or n_candidates random samples of the search space. """
+        if self.n_candidates is None:
+            return list(ParameterGrid(self.param_space))
+        return list(ParameterSampler(self.param_space, self.n_candidates, random_state=self.random_state))
+
+    def _rung_resources(self, n_train):
+        """ Returns the (n_estimators, n_samples) of every rung, the last rung using all the training data. """
+        n_rungs = 1 + int(math.log(self.max_estimators / self.min_estimators, self.factor) + 1e-9)
+        resources = []
+        for rung in range(n_rungs):
+            n_estimators = min(self.max_estimators, self.min_estimators * self.factor ** rung)
+            fraction = float(self.factor) ** (rung - n_rungs + 1)
+            resources.append((n_estimators, max(min(n_train, 50), int(n_train * fraction))))
+        return resources
+
+    def run(self, output_dir='search_results'):
+        """ Runs the search, writes best_config.json and leaderboard.csv to output_dir and returns the best config. """
+        X, y, _ = self._model_training._get_encoded_data('one-hot')
+        X_train, X_test, y_train, y_test = train_test_split(X.to_numpy(dtype=np.float64), y.to_numpy(),
+                                                            test_size=self.test_size, random_state=42)
+        X_train, X_val, y_train, y_val = train_test_split(X_train, y_train, random_state=42,
+                                                          test_size=self.validation_size / (1 - self.test_size))
+        candidates = self._candidates()
+        resources = self._rung_resources(len(X_train))
+        print(f"Searching {len(candidates)} {self.model_name} candidates over {len(resources)} rungs "
+              f"with {self.n_workers} workers")
+
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        rows, survivors, start = [], list(range(len(candidates))), time.perf_counter()
+
+        with ProcessPoolExecutor(max_workers=self.n_workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(X_train, y_train, X_val, y_val, X_test, y_test)) as executor:
+            for rung, (n_estimators, n_samples) in enumerate(resources):
+                futures = {index: executor.submit(_evaluate_candidate, self._estimator_class,
+                                                  {**self._fixed_params, **candidates[index]},
+                                                  n_estimators, n_samples)
+                           for index in survivors}
+                scores = {index: future.result() for index, future in futures.items()}
+
+                for index, score in scores.items():
+                    rows.append({"rung": rung, "candidate": index, "params": json.dumps(candidates[index]),
+                                 "n_samples": n_samples, "n_estimators": n_estimators, **score})
+
+                survivors = sorted(survivors, key=lambda index: scores[index]["val_mse"])
+                print(f"Rung {rung}: {len(futures)} candidates, {n_estimators} estimators, {n_samples} samples, "
+                      f"best validation MSE {scores[survivors[0]]['val_mse']:.2f}")
+                if rung < len(resources) - 1:
+                    survivors = survivors[:max(1, math.ceil(len(survivors) / self.factor))]
+
+        self.leaderboard = (pd.DataFrame(rows)
+                            .sort_values(["rung", "val_mse"], ascending=[False, True])
+                            .reset_index(drop=True))
+
+        best = self.leaderboard.iloc[0]
+        best_config = {
+            "model": self.model_name,
+            "params": {**candidates[int(best["candidate"])], "n_estimators": int(best["best_n_estimators"])},
+            "validation": {"MSE": float(best["val_mse"])},
+            "test": {"MSE": float(best["test_mse"]), "MAE": float(best["test_mae"]), "R2": float(best["test_r2"])},
+            "search_seconds": time.perf_counter() - start,
+        }
+
+        model_dir = os.path.join(output_dir, self.model_name.replace(' ', '_').lower())
+        os.makedirs(model_dir, exist_ok=True)
+        self.leaderboard.to_csv(os.path.join(model_dir, 'leaderboard.csv'), index=False)
+        with open(os.path.join(model_dir, 'best_config.json'), 'w') as f:
+            json.dump(best_config, f, indent=2, default=str)
+
+        print(f"Best {self.model_name} config: {best_config['params']} "
+              f"(test MSE {best_config['test']['MSE']:.2f}), written to {model_dir}")
+        return best_config
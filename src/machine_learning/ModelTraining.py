@@ -1,10 +1,42 @@
 from src.data_processing.SmartphonesDataset import SmartphonesDataset
-from sklearn.model_selection import train_test_split
+from src.machine_learning.FlatTreeEnsemble import FlatTreeEnsemble
+from src.machine_learning.EncodingCache import EncodingCache
+from sklearn.base import clone
+from sklearn.model_selection import KFold, train_test_split
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import multiprocessing
+import os
+import time
+import numpy as np
 import pandas as pd
 import joblib
 
 
+def _fit_fold(model, shm_name, shape, dtype, y, train_index, test_index):
+    """
+    Fits a clone of the model on one cross-validation fold in a worker process.
+    The feature matrix is read from shared memory, so it is never pickled or copied to the workers.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        X = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        start = time.perf_counter()
+        fold_model = clone(model).fit(X[train_index], y[train_index])
+        y_pred = fold_model.predict(X[test_index])
+        fit_seconds = time.perf_counter() - start
+    finally:
+        del X
+        shm.close()
+
+    y_test = y[test_index]
+    return (mean_squared_error(y_test, y_pred),
+            mean_absolute_error(y_test, y_pred),
+            r2_score(y_test, y_pred),
+            fit_seconds)
+
+
 class ModelTraining:
     """
     This class is responsible for training machine learning models on a smartphone dataset.
@@ -13,23 +45,39 @@ class ModelTraining:
 
     Attributes:
         _dataset (SmartphonesDataset): Dataset instance used for loading and managing data.
-        _df (pd.DataFrame): The raw dataframe containing the smartphone dataset.
+        _df (pd.DataFrame): The raw dataframe containing the smartphone dataset (a copy-on-write view of the
+            dataset's dataframe, so training never writes to data other consumers are reading).
         _cat_attributes (list): List of categorical features in the dataset.
         _target_var (str): The target variable for model training.
+        encoding_cache_dir (str): Class-level directory where encoded features are persisted (None keeps
+            them in memory only).
+        models_dir (str): Directory the trained models and their flat tree exports are saved to (the class-level
+            default unless another one is given).
 
     Methods:
-        __init__(self): Initializes the class and loads the dataset.
+        __init__(self, df, dataset, models_dir): Initializes the class and loads the dataset (or uses the given
+            dataframe or dataset, e.g. one of a DatasetRegistry).
         _get_feature_df(df): Prepares feature dataframe for model training.
         _add_derived_features(df): Adds derived features for machine learning.
         _one_hot_encoding(): Applies one-hot encoding to categorical features.
         _frequency_encoding(): Applies frequency encoding to categorical features.
-        _train_model(model, encoded_df): Trains the model and returns evaluation metrics.
-        _train_and_write_to_file(model, encoded_df, model_name): Trains the model and writes results to a file.
+        _get_encoded_data(encoding_type): Returns the shared, cached feature matrix, target and encoding maps.
+        _train_model(model, X, y): Trains the model and returns evaluation metrics.
+        _cross_validate(model, X, y, n_folds, n_workers): Runs k-fold cross-validation with the folds fitted
+            in parallel worker processes and returns the mean and std of every metric.
+        _train_and_write_to_file(model, X, y, model_name, encoding_maps, encoding_type, cv_folds): Trains the
+            model, writes results to a file and exports the trees as a FlatTreeEnsemble.
     """
 
-    def __init__(self):
-        self._dataset = SmartphonesDataset()
-        self._df = self._dataset.get_df()
+    encoding_cache_dir = None
+    models_dir = 'saved_models'
+
+    def __init__(self, df=None, dataset=None, models_dir=None):
+        if models_dir is not None:
+            self.models_dir = models_dir
+        self._dataset = SmartphonesDataset() if dataset is None else dataset
+        self._df = self._dataset.get_view() if df is None else df
+        self._source_df = self._dataset.get_df() if df is None else df  # Fingerprinted once for the EncodingCache
         self._cat_attributes = self._dataset.get_categorical_attributes()
         self._target_var = self._dataset.get_target_var()
 
@@ -38,16 +86,21 @@ class ModelTraining:
         Drops model and price columns from df and returns it.
         It's used for defining the features dataframe before train_test_split.
         """
-        df = df.copy()
-        if 'model' in df.columns:
-            df = df.drop(columns=['model'])
-        if self._target_var in df.columns:
-            df = df.drop(columns=[self._target_var])
-        return df
+        # The target converted to other currencies ('price_<currency>' columns) would leak it into the features
+        return df.drop(columns=[col for col in df.columns
+                                if col in ('model', self._target_var) or col.startswith(f"{self._target_var}_")])
 
     def _one_hot_encoding(self):
         """ Implements one-hot encoding for categorical features and returns mapping. """
-        encoded_df = pd.get_dummies(self._df, columns=self._cat_attributes, dtype='int')
+        df = self._df
+
+        # Category columns would get a dummy for every category, keep only the ones still present in the data
+        observed_categories = {col: df[col].cat.remove_unused_categories() for col in self._cat_attributes
+                               if isinstance(df[col].dtype, pd.CategoricalDtype)}
+        if observed_categories:
+            df = df.assign(**observed_categories)
+
+        encoded_df = pd.get_dummies(df, columns=self._cat_attributes, dtype='int')
 
         # Create a mapping: original column name -> list of new one-hot columns
         one_hot_maps = {}
@@ -61,16 +114,33 @@ class ModelTraining:
         encoded_df = self._df.copy()
         freq_maps = {}
         for category in self._cat_attributes:
-            freq_encoding = encoded_df[category].value_counts() / len(encoded_df)
+            values = encoded_df[category].astype(object)  # Plain values, so category columns map to floats
+            freq_encoding = values.value_counts() / len(encoded_df)
             freq_maps[category] = freq_encoding.to_dict()
-            encoded_df[category] = encoded_df[category].map(freq_maps[category])
+            encoded_df[category] = values.map(freq_maps[category])
         return encoded_df, freq_maps
 
-    def _train_model(self, model, encoded_df):
-        """ Trains the given model and returns the scores from testing the model. """
+    def _build_encoded_data(self, encoding_type):
+        """ Encodes the dataframe and splits it into the feature matrix and the target vector. """
+        if encoding_type == 'one-hot':
+            encoded_df, encoding_maps = self._one_hot_encoding()
+        elif encoding_type == 'frequency':
+            encoded_df, encoding_maps = self._frequency_encoding()
+        else:
+            raise ValueError(f"Unknown encoding type: {encoding_type}")
 
-        X = self._get_feature_df(encoded_df)
-        y = encoded_df[self._target_var]
+        return self._get_feature_df(encoded_df), encoded_df[self._target_var], encoding_maps
+
+    def _get_encoded_data(self, encoding_type='one-hot'):
+        """
+        Returns the feature matrix, target vector and encoding maps for the given encoding type.
+        They are built once per dataset content and shared by every model through the EncodingCache.
+        """
+        return EncodingCache(self.encoding_cache_dir).get(self._df, encoding_type, self._build_encoded_data,
+                                                          self._source_df)
+
+    def _train_model(self, model, X, y):
+        """ Trains the given model and returns the scores from testing the model. """
 
         # Split the dataset into training and testing sets (80% training, 20% testing)
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -83,34 +153,82 @@ class ModelTraining:
                 r2_score(y_test, y_pred),
                 model)
 
-    def _train_and_write_to_file(self, model, encoded_df, model_name, encoding_maps):
-        """ Trains the given model and writes the results to file. """
-        mse_before, mae_before, r2_before, trained_model = self._train_model(model, encoded_df)
+    def _cross_validate(self, model, X, y, n_folds=5, n_workers=None):
+        """
+        Scores the model with k-fold cross-validation, fitting the folds in parallel worker processes.
+        The feature matrix is placed in shared memory once and every worker reads its folds from there.
+        Returns a dataframe with the mean and standard deviation of MSE, MAE and R2.
+        """
+        start = time.perf_counter()
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        folds = list(KFold(n_splits=n_folds, shuffle=True, random_state=42).split(X))
+        n_workers = max(1, min(n_workers or os.cpu_count() or 1, n_folds))
+        if 'n_jobs' in model.get_params():  # Split the cores between the folds running at the same time
+            model = clone(model).set_params(n_jobs=max(1, (os.cpu_count() or 1) // n_workers))
+
+        shm = shared_memory.SharedMemory(create=True, size=max(1, X.nbytes))
+        try:
+            np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)[:] = X
+
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as executor:
+                futures = [executor.submit(_fit_fold, model, shm.name, X.shape, X.dtype, y, train_index, test_index)
+                           for train_index, test_index in folds]
+                fold_scores = np.array([future.result() for future in futures])
+        finally:
+            shm.close()
+            shm.unlink()
+
+        for fold, (mse, mae, r2, fit_seconds) in enumerate(fold_scores, start=1):
+            print(f"Fold {fold}/{n_folds}: MSE {mse:.2f}, MAE {mae:.2f}, R2 {r2:.3f}, fitted in {fit_seconds:.2f} s")
+        print(f"{n_folds}-fold cross-validation done in {time.perf_counter() - start:.2f} s "
+              f"with {n_workers} workers (sum of fold fits: {fold_scores[:, 3].sum():.2f} s)")
 
-        feature_columns = self._get_feature_df(encoded_df).columns.tolist()
+        return pd.DataFrame({
+            "Metric": ["MSE", "MAE", "R2"],
+            "CV Mean": fold_scores[:, :3].mean(axis=0),
+            "CV Std": fold_scores[:, :3].std(axis=0)
+        })
+
+    def _train_and_write_to_file(self, model, X, y, model_name, encoding_maps, encoding_type='one-hot',
+                                 cv_folds=None):
+        """
+        Trains the given model and writes the results to file.
+        If cv_folds is given, the table also holds the cross-validated mean and std of every metric.
+        """
+        cv_results = self._cross_validate(model, X, y, cv_folds) if cv_folds else None
+        mse_before, mae_before, r2_before, trained_model = self._train_model(model, X, y)
+
+        feature_columns = X.columns.tolist()
 
         # Save trained model & feature order
-        save_path = f"saved_models/{model_name.replace(' ', '_').lower()}_model.pkl"
-
-        if model_name == 'Gradient Boosting':
-            joblib.dump({
-                "model": trained_model,
-                "features": feature_columns,
-                "maps": encoding_maps,
-                "type": "one-hot"
-            }, save_path)
-        else:
-            joblib.dump({
-                "model": trained_model,
-                "features": feature_columns,
-                "maps": encoding_maps,
-                "type": "one-hot"
-            }, save_path)
+        save_path = os.path.join(self.models_dir, f"{model_name.replace(' ', '_').lower()}_model.pkl")
+
+        joblib.dump({
+            "model": trained_model,
+            "features": feature_columns,
+            "maps": encoding_maps,
+            "type": encoding_type
+        }, save_path)
 
         print(f"✅ Model saved to {save_path}")
 
+        # Export the trees as flat arrays for fast, sklearn-free inference, memory-mapped by the scoring processes
+        flat_path = save_path.replace('.pkl', '_flat')
+        FlatTreeEnsemble.from_sklearn(trained_model, {
+            "features": feature_columns,
+            "maps": encoding_maps,
+            "type": encoding_type
+        }).save(flat_path)
+        print(f"✅ Flat tree arrays saved to {flat_path}")
+
         # A comparison table
-        return pd.DataFrame({
+        results = pd.DataFrame({
             "Metric": ["MSE", "MAE", "R2"],
             "Scores": [mse_before, mae_before, r2_before]
         })
+        if cv_results is not None:
+            results = results.merge(cv_results, on="Metric")
+        return results
@@ -1,5 +1,33 @@
+from src.data_processing.SmartphonesDataset import SmartphonesDataset
 from src.machine_learning.models.GradientBoostingModel import GradientBoostingModel
 from src.machine_learning.models.RandomForrestModel import RandomForestModel
+from src.machine_learning.HyperparameterSearch import HyperparameterSearch
+from src.machine_learning.ComparablesIndex import ComparablesIndex
+from src.benchmark.Instrumentation import Instrumentation
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import time
+
+
+# Model name -> (model class, name of its training method). The order is the order of the results file.
+MODEL_TRAINERS = {
+    "Random Forest": (RandomForestModel, "train_random_forest"),
+    "Gradient Boosting": (GradientBoostingModel, "train_gradient_boosting"),
+}
+
+
+def _train_in_worker(model_name, df, dataset_path, n_jobs, cv_folds=None):
+    """
+    Trains one model in a worker process and returns its results table and wall-clock time.
+    The model gets its own dataset holding df, so the worker never falls back to the SmartphonesDataset
+    singleton (which may hold another dataset, or nothing at all in a spawned process).
+    """
+    model_class, train_method = MODEL_TRAINERS[model_name]
+    start = time.perf_counter()
+    dataset = SmartphonesDataset.from_dataframe(df, dataset_path)
+    result = getattr(model_class(dataset=dataset), train_method)(n_jobs=n_jobs, cv_folds=cv_folds)
+    return result, time.perf_counter() - start
 
 
 class RunML:
@@ -15,29 +43,125 @@ class RunML:
     boosting regression.
     decision_tree_model (DecisionTreeModel): An instance of the DecisionTreeModel class for
     decision tree regression.
+    parallel (bool): Whether the models are trained in parallel worker processes.
+    n_workers (int): Number of worker processes used in parallel mode (defaults to one per model).
+    cv_folds (int): If set, every model is also scored with k-fold cross-validation (folds fitted in parallel).
+    dataset (SmartphonesDataset): Dataset the models are trained on (the singleton when None), e.g. one of a
+    DatasetRegistry.
+    instrumentation (Instrumentation): Records the time, memory and rows of every step (disabled by default).
     """
 
-    def __init__(self):
+    def __init__(self, parallel=False, n_workers=None, cv_folds=None, dataset=None, instrumentation=None):
         """
         Initializes the RunML class with instances of different machine learning models.
         """
         self._results_file_path = 'model_results.txt'
-        self.random_forest_model = RandomForestModel()  # Random forest model
-        self.gradient_boosting_model = GradientBoostingModel()  # Gradient boosting model
+        self.dataset = dataset
+        self.random_forest_model = RandomForestModel(dataset=dataset)  # Random forest model
+        self.gradient_boosting_model = GradientBoostingModel(dataset=dataset)  # Gradient boosting model
+        self.parallel = parallel
+        self.n_workers = n_workers
+        self.cv_folds = cv_folds
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+        self._rows = lambda: len(self.random_forest_model._df)
+
+    def _train_sequential(self):
+        """ Trains the models one after the other, letting each model use every core. """
+        trainers = {"Random Forest": self.random_forest_model.train_random_forest,
+                    "Gradient Boosting": self.gradient_boosting_model.train_gradient_boosting}
+
+        results, timings = {}, {}
+        for model_name, train in trainers.items():
+            start = time.perf_counter()
+            with self.instrumentation.step(f"train_{model_name.replace(' ', '_').lower()}", 'ml', self._rows):
+                results[model_name] = train(n_jobs=-1, cv_folds=self.cv_folds)
+            timings[model_name] = time.perf_counter() - start
+        return results, timings
+
+    def _train_parallel(self):
+        """
+        Trains the models at the same time in a process pool. Every worker trains one model, and the cores
+        left over by the pool are given to the models that can build their estimators in parallel.
+        """
+        n_workers = max(1, min(self.n_workers or len(MODEL_TRAINERS), len(MODEL_TRAINERS)))
+        n_jobs = max(1, (os.cpu_count() or 1) - n_workers + 1)
+        df = self.random_forest_model._df
+        dataset_path = self.random_forest_model._dataset.get_dataset_path()
+        self.random_forest_model._get_encoded_data('one-hot')  # Encode once before forking, workers inherit it
+
+        # Fork where available so the workers inherit the loaded dataset instead of reloading it
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+
+        print(f"Training {len(MODEL_TRAINERS)} models with {n_workers} worker processes "
+              f"({n_jobs} cores per model)")
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=context) as executor:
+            futures = {model_name: executor.submit(_train_in_worker, model_name, df, dataset_path, n_jobs,
+                                                   self.cv_folds)
+                       for model_name in MODEL_TRAINERS}
+            outputs = {model_name: future.result() for model_name, future in futures.items()}
+
+        results = {model_name: output[0] for model_name, output in outputs.items()}
+        timings = {model_name: output[1] for model_name, output in outputs.items()}
+        return results, timings
 
     def run_prediction_models(self):
         """
         Runs all the initialized machine learning models by calling their respective training functions.
         """
-        results = {"Random Forest": self.random_forest_model.train_random_forest(),
-                   "Gradient Boosting": self.gradient_boosting_model.train_gradient_boosting()}
+        step = self.instrumentation.step
+        with step('run_prediction_models', 'ml', self._rows):
+            start = time.perf_counter()
+            if self.parallel:
+                # The workers are separate processes: the parallel training is recorded as one step
+                with step('train_parallel', 'ml', self._rows):
+                    results, timings = self._train_parallel()
+            else:
+                results, timings = self._train_sequential()
+            total_time = time.perf_counter() - start
+
+            # Write results in file
+            with step('write_results', 'ml'):
+                try:
+                    with open(self._results_file_path, 'w') as f:
+                        for model_name in MODEL_TRAINERS:
+                            f.write(f"\nTraining {model_name}: \n")
+                            f.write(results[model_name].to_string() + '\n')
+                            f.write(f"Training time: {timings[model_name]:.2f} s\n")
+                            print(f"Results written successfully! for {model_name} "
+                                  f"(trained in {timings[model_name]:.2f} s)\n")
+                        f.write(f"\nTotal training time ({'parallel' if self.parallel else 'sequential'}): "
+                                f"{total_time:.2f} s\n")
+                except Exception as e:
+                    print(f"Error: {e}")
+
+            with step('build_comparables_index', 'ml', self._rows):
+                self.build_comparables_index()
 
-        # Write results in file
+    def build_comparables_index(self, path=None):
+        """
+        Builds the ComparablesIndex of the catalog the models were trained on and saves it next to the models
+        (to path when given), so price predictions can come back with their closest real phones.
+        """
+        path = path or os.path.join(self.random_forest_model.models_dir, 'comparables_index.pkl')
         try:
-            with open(self._results_file_path, 'w') as f:
-                for model_name, result in results.items():
-                    f.write(f"\nTraining {model_name}: \n")
-                    f.write(result.to_string() + '\n')
-                    print(f"Results written successfully! for {model_name} \n")
+            dataset = self.random_forest_model._dataset
+            target_var = dataset.get_target_var()
+            index = ComparablesIndex([col for col in dataset.get_numerical_attributes() if col != target_var])
+            index.fit(self.random_forest_model._df).save(path)
+            print(f"✅ Comparables index of {len(self.random_forest_model._df)} phones saved to {path}")
         except Exception as e:
-            print(f"Error: {e}")
+            print(f"Error occurred while building the comparables index: {e}")
+
+    def run_hyperparameter_search(self, n_candidates=None, n_workers=None, output_dir='search_results'):
+        """
+        Tunes every model with successive halving and returns the best config of each one.
+        The leaderboards and best configs are written to output_dir.
+        """
+        best_configs = {}
+        for model_name in MODEL_TRAINERS:
+            with self.instrumentation.step(f"search_{model_name.replace(' ', '_').lower()}", 'ml', self._rows):
+                best_configs[model_name] = HyperparameterSearch(model_name, n_candidates=n_candidates,
+                                                                n_workers=n_workers or self.n_workers,
+                                                                dataset=self.dataset).run(output_dir)
+        return best_configs
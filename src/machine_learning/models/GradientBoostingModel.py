@@ -8,13 +8,18 @@ class GradientBoostingModel(ModelTraining):
     Inherits from ModelTraining to reuse encoding and result saving methods.
     """
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, df=None, dataset=None, models_dir=None):
+        super().__init__(df, dataset, models_dir)
 
-    def train_gradient_boosting(self):
-        """ Trains the Gradient Boosting Regression model and saves the results."""
+    def train_gradient_boosting(self, n_jobs=None, cv_folds=None):
+        """
+        Trains the Gradient Boosting Regression model and saves the results.
+        n_jobs is ignored: boosting stages are fitted one after the other, on a single core. It is only
+        accepted so RunML can call every model's training method the same way.
+        """
 
         gradient_boosting = GradientBoostingRegressor(random_state=42, n_estimators=35, learning_rate=0.1)
-        encoded_df, freq_maps = self._one_hot_encoding()
+        X, y, one_hot_maps = self._get_encoded_data('one-hot')
 
-        return self._train_and_write_to_file(gradient_boosting, encoded_df, 'Gradient Boosting', freq_maps)
+        return self._train_and_write_to_file(gradient_boosting, X, y, 'Gradient Boosting', one_hot_maps,
+                                             cv_folds=cv_folds)
@@ -10,15 +10,17 @@ class RandomForestModel(ModelTraining):
 
     """
 
-    def __init__(self):
-        super().__init__()  # Initialize the parent ModelTraining class
+    def __init__(self, df=None, dataset=None, models_dir=None):
+        super().__init__(df, dataset, models_dir)  # Initialize the parent ModelTraining class
 
-    def train_random_forest(self):
+    def train_random_forest(self, n_jobs=-1, cv_folds=None):
         """
         Trains the Random Forest regression model using the dataset.
         The model is trained on the encoded dataset, and the training results are written to a file.
+        The trees are built on n_jobs cores (-1 uses all of them), which doesn't change the results.
         """
-        random_forest = RandomForestRegressor(random_state=42, n_estimators=110)
-        encoded_df, one_hot_maps = self._one_hot_encoding()
+        random_forest = RandomForestRegressor(random_state=42, n_estimators=110, n_jobs=n_jobs)
+        X, y, one_hot_maps = self._get_encoded_data('one-hot')
 
-        return self._train_and_write_to_file(random_forest, encoded_df, 'Random Forest', one_hot_maps)
+        return self._train_and_write_to_file(random_forest, X, y, 'Random Forest', one_hot_maps,
+                                             cv_folds=cv_folds)
@@ -0,0 +1,106 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+class ImportTimeReport:
+    """
+        Measures the cold-start import cost of a Main.py subcommand with 'python -X importtime'.
+
+        The subcommand runs in a fresh interpreter, and the importtime lines it writes to stderr are
+        grouped by top-level package, so regressions in the start-up latency of short-lived jobs (e.g. a
+        heavy library pulled into the predict path) show up as soon as they are introduced.
+
+        Attributes:
+        ----------
+        command_args : list
+            Arguments passed to Main.py (e.g. ['predict']).
+        heavy_packages : tuple
+            Packages reported as heavy when they are imported.
+        entries : list
+            (self_us, cumulative_us, depth, module) of every import, after run().
+        wall_seconds : float
+            Wall time of the subcommand, after run().
+
+        Methods:
+        -------
+        run():
+            Runs the subcommand and parses its import times.
+        top_level(n):
+            Returns the n top-level packages with the largest import time.
+        summary(n):
+            Returns the report as a dict.
+        print_report(n, json_path):
+            Prints the report and optionally writes it to a json file.
+    """
+
+    heavy_packages = ('pandas', 'sklearn', 'scipy', 'matplotlib', 'seaborn', 'requests', 'joblib')
+
+    def __init__(self, command_args, main_path=None):
+        self.command_args = list(command_args)
+        self.main_path = main_path or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Main.py')
+        self.entries = []
+        self.wall_seconds = None
+        self.returncode = None
+
+    def run(self):
+        """ Runs 'python -X importtime Main.py <command_args>' and parses the import times it reports. """
+        project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(self.main_path))))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [project_root, env.get('PYTHONPATH')]))
+
+        start = time.perf_counter()
+        completed = subprocess.run([sys.executable, '-X', 'importtime', self.main_path, *self.command_args],
+                                   cwd=os.path.dirname(self.main_path), env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        self.wall_seconds = time.perf_counter() - start
+        self.returncode = completed.returncode
+
+        # Lines look like 'import time:       412 |       1523 |   pandas.core' (self and cumulative in us)
+        self.entries = []
+        for line in completed.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, module = line[len('import time:'):].split('|', 2)
+            depth = (len(module) - len(module.lstrip())) // 2
+            self.entries.append((int(self_us), int(cumulative_us), depth, module.strip()))
+        return self
+
+    def top_level(self, n=15):
+        """ Returns the n (top-level package, ms) with the largest import time, summed over all their modules. """
+        costs = {}
+        for self_us, _, _, module in self.entries:
+            package = module.split('.')[0]
+            costs[package] = costs.get(package, 0) + self_us / 1000
+        return sorted(costs.items(), key=lambda item: item[1], reverse=True)[:n]
+
+    def summary(self, n=15):
+        """ Returns the report as a dict. """
+        imported_packages = {module.split('.')[0] for _, _, _, module in self.entries}
+        return {
+            "command": self.command_args,
+            "returncode": self.returncode,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "import_seconds": round(sum(entry[0] for entry in self.entries) / 1e6, 3),
+            "modules_imported": len(self.entries),
+            "heavy_packages_imported": sorted(imported_packages.intersection(self.heavy_packages)),
+            "top_level_ms": {package: round(ms, 1) for package, ms in self.top_level(n)},
+        }
+
+    def print_report(self, n=15, json_path=None):
+        """ Prints the report, and writes it to json_path when given. """
+        summary = self.summary(n)
+        print(f"IMPORT TIME REPORT: Main.py {' '.join(self.command_args)}")
+        print(f"Wall time: {summary['wall_seconds']:.3f} s, imports: {summary['import_seconds']:.3f} s "
+              f"({summary['modules_imported']} modules)")
+        print(f"Heavy packages imported: {', '.join(summary['heavy_packages_imported']) or 'none'}")
+        for package, ms in summary["top_level_ms"].items():
+            print(f"  {package:<40} {ms:10.1f} ms")
+        if json_path:
+            with open(json_path, 'w') as f:
+                json.dump(summary, f, indent=2)
+            print(f"Report written to {json_path}")
+        print()
+        return summary
@@ -1,21 +1,357 @@
-from src.data_processing.RunDataProcessing import RunDataProcessing
-from src.machine_learning.RunML import RunML
-from src.price_prediction.predict import predict
-from src.exploratory_data_analysis.RunEDA import RunEDA
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
 
 
-if __name__ == '__main__':
+# With copy-on-write, shallow copies of a dataframe share its data until one of them is written to, so
+# read-only views can be handed to concurrent consumers without copying the data (the pandas 3 default).
+# It is set through the environment so pandas is still only imported by the commands that need it.
+os.environ.setdefault('PANDAS_COPY_ON_WRITE', '1')
+
+# Every subcommand imports its subsystem only when it runs, so e.g. 'predict' never loads pandas,
+# sklearn or matplotlib. Run from the main folder: python Main.py <command> (no command runs everything).
+
+cleaned_dataset_path = '../../datasets/cleaned_smartphones.csv'
+saved_models_dir = 'saved_models'
+model_names = ["gradient_boosting_model", "random_forest_model"]
+
+
+def _load_cleaned_dataset():
+    """ Returns the 'cleaned' dataset of the DatasetRegistry, for the commands that run after data processing. """
+    from src.data_processing.DatasetRegistry import DatasetRegistry
+
+    if not os.path.exists(cleaned_dataset_path):
+        print(f"{cleaned_dataset_path} not found, run 'python Main.py process' first.")
+        sys.exit(1)
+    return DatasetRegistry().get('cleaned')
+
+
+def run_process(args):
+    """ Part 1: Data Processing """
+    from src.data_processing.RunDataProcessing import RunDataProcessing
+
+    if args.streaming:
+        RunDataProcessing.run_streaming_process(chunk_size=args.chunk_size, extra_currencies=args.currencies,
+                                                instrumentation=args.instrumentation, impute_group_by=args.impute_by)
+    else:
+        from src.data_processing.DataQualityScanner import DataQualityError
+
+        try:
+            RunDataProcessing(quality_gate=args.fail_fast, quality_report_path=args.quality_report,
+                              instrumentation=args.instrumentation).run_process(
+                use_cache=not args.no_cache, extra_currencies=args.currencies, impute_group_by=args.impute_by)
+        except DataQualityError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+
+
+def run_eda(args):
+    """ Part 2: Exploratory Data Analysis """
+    from src.exploratory_data_analysis.RunEDA import RunEDA
+
+    if args.report:
+        RunEDA.run_report(args.output_dir, args.formats, args.workers, args.force, args.instrumentation,
+                          args.dataset)
+    else:
+        RunEDA(dataset=args.dataset, instrumentation=args.instrumentation).run_visualizations()
+
+
+def run_train(args):
+    """ Part 3: Machine Learning """
+    from src.machine_learning.RunML import RunML
+
+    machine_learning = RunML(parallel=args.parallel, n_workers=args.workers, cv_folds=args.cv_folds,
+                             dataset=args.dataset, instrumentation=args.instrumentation)
+    if args.search:
+        machine_learning.run_hyperparameter_search(n_candidates=args.candidates, n_workers=args.workers)
+    else:
+        machine_learning.run_prediction_models()
+
+
+def _read_phones(path):
+    """ Reads the phones to price from a json file (a dict or a list of dicts) or a csv file. """
+    if path.endswith('.json'):
+        with open(path) as f:
+            phones = json.load(f)
+        return [phones] if isinstance(phones, dict) else phones
+
+    def parse(value):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+
+    with open(path, newline='') as f:
+        return [{key: parse(value) for key, value in row.items()} for row in csv.DictReader(f)]
+
+
+def run_predict(args):
+    """ Part 4: Price Prediction, with the flat tree exports (NumPy only) """
+    from src.price_prediction.FlatPredictor import FlatPredictor
+    from src.price_prediction.example_phone import new_phone, actual_price
+
+    phones = _read_phones(args.input) if args.input else [new_phone]
+    try:
+        predictions = FlatPredictor(args.models_dir, args.models).predict_records(phones)
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow([f"predicted_price_{model_name}" for model_name in predictions])
+            writer.writerows(zip(*predictions.values()))
+        print(f"Predictions of {len(phones)} phones written to {args.output}")
+    elif not args.input:
+        for model_name, predicted_prices in predictions.items():
+            print(f"Model: {model_name}, Actual Price: {actual_price}, Predicted Price: {predicted_prices[0]}")
+    else:
+        for index in range(len(phones)):
+            print(", ".join(f"{model_name}: {predicted_prices[index]:.2f}"
+                            for model_name, predicted_prices in predictions.items()))
+
+
+def run_export(args):
+    """ Exports the saved sklearn models as memory-mappable flat tree arrays for the NumPy-only predict command. """
+    import joblib
+    from src.machine_learning.FlatTreeEnsemble import FlatTreeEnsemble
+
+    for model_name in args.models:
+        pkl_path = os.path.join(args.models_dir, f"{model_name}.pkl")
+        try:
+            saved = joblib.load(pkl_path)
+        except FileNotFoundError:
+            print(f"Skipping {model_name}: {pkl_path} not found")
+            continue
+        flat_path = os.path.join(args.models_dir, f"{model_name}_flat")
+        FlatTreeEnsemble.from_sklearn(saved["model"], {key: saved[key] for key in ("features", "maps", "type")
+                                                       if key in saved}).save(flat_path)
+        print(f"✅ Flat tree arrays saved to {flat_path}")
+
+
+def run_comparables(args):
+    """ Looks up the closest phones of the catalog, with the index saved by the train command. """
+    from src.machine_learning.ComparablesIndex import ComparablesIndex
+    from src.price_prediction.example_phone import new_phone
+
+    index_path = os.path.join(args.models_dir, 'comparables_index.pkl')
+    if not os.path.exists(index_path):
+        print(f"Error: {index_path} not found, train the models first ('python Main.py train')")
+        sys.exit(1)
+
+    phones = _read_phones(args.input) if args.input else [new_phone]
+    filters = {col: value for col, value in (('brand_name', args.brand), ('os', args.os)) if value}
+    match = tuple(col for col, same in (('brand_name', args.same_brand), ('os', args.same_os)) if same)
+    comparables = ComparablesIndex.load(index_path).query(phones, args.k, filters, match)
+
+    if args.output:
+        comparables.to_csv(args.output, index=False)
+        print(f"Comparables of {len(phones)} phones written to {args.output}")
+    else:
+        print(comparables.to_string(index=False))
+
+
+def run_importtime(args):
+    """ Reports the cold-start import cost of another subcommand. """
+    from src.main.ImportTimeReport import ImportTimeReport
+
+    ImportTimeReport(args.command_args or ['predict']).run().print_report(args.top, args.json)
+
+
+def run_benchmark(args):
+    """ Times every stage at several dataset sizes and compares the results with a baseline. """
+    from src.benchmark.BenchmarkSuite import BenchmarkSuite
+
+    suite = BenchmarkSuite(args.sizes, args.repeats, args.stages, single_rows=args.single_rows, seed=args.seed)
+    suite.run()
+    if args.output:
+        suite.save(args.output)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = BenchmarkSuite.compare(suite.to_dict(), baseline, args.threshold, args.min_delta)
+        if BenchmarkSuite.print_comparison(comparison) and args.fail_on_regression:
+            sys.exit(1)
+
+
+def run_synthesize(args):
+    """ Writes a synthetic catalog generated from the distributions of the raw dataset. """
+    import pandas as pd
+    from src.data_processing.SyntheticCatalogGenerator import SyntheticCatalogGenerator
+
+    output = args.output or f"../../datasets/synthetic_smartphones_{args.rows}" + (
+        '.csv' if args.format == 'csv' else '')
+    generator = SyntheticCatalogGenerator(min_brand_rows=args.min_brand_rows).fit(pd.read_csv(args.source))
+    generator.generate(args.rows, output, seed=args.seed, output_format=args.format)
+
+
+def run_all(args):
+    """ Runs the whole project in one process, like before the subcommands existed. """
+    from src.data_processing.RunDataProcessing import RunDataProcessing
+    from src.exploratory_data_analysis.RunEDA import RunEDA
+    from src.machine_learning.RunML import RunML
+    from src.price_prediction.predict import predict
+
+    from src.data_processing.DatasetRegistry import DatasetRegistry
+
     """ Part 1: Data Processing """
-    data_processing = RunDataProcessing()  # Call data processing class
+    data_processing = RunDataProcessing(instrumentation=args.instrumentation)  # Call data processing class
     data_processing.run_process()  # Perform data processing on the datasets
+    dataset = DatasetRegistry().get('cleaned')  # The cleaned dataframe published by run_process
 
     """ Part 2: Exploratory Data Analysis """
-    exploratory_data_analysis = RunEDA()  # Call exploratory data analysis class
+    exploratory_data_analysis = RunEDA(dataset=dataset, instrumentation=args.instrumentation)
     exploratory_data_analysis.run_visualizations()  # Run the visualizations of the dataset
 
     """ Part 3: Machine Learning """
-    machine_learning = RunML()  # Call Machine Learning class
+    machine_learning = RunML(dataset=dataset, instrumentation=args.instrumentation)  # Call Machine Learning class
     machine_learning.run_prediction_models()  # Run ML prediction models
 
     """ Part 4: Price Prediction Using Example Input"""
     predict()
+
+
+def _create_instrumentation(args):
+    """ Returns the Instrumentation of the run when one of its outputs is requested, None otherwise. """
+    if not (args.run_log or args.prometheus or args.profile):
+        return None
+    from src.benchmark.Instrumentation import Instrumentation
+
+    profile = set(args.profile_steps) if args.profile_steps else args.profile
+    return Instrumentation(trace_memory=not args.no_tracemalloc, profile=profile, profile_dir=args.profile_dir)
+
+
+def _export_instrumentation(args):
+    """ Prints the run log and writes it to the requested files. """
+    instrumentation = args.instrumentation
+    instrumentation.print_summary()
+    if args.run_log:
+        instrumentation.to_json(args.run_log)
+    if args.prometheus:
+        instrumentation.write_prometheus(args.prometheus)
+
+
+def build_parser():
+    """ Returns the argument parser of the command line interface. """
+    parser = argparse.ArgumentParser(description="Smartphone price prediction")
+    # Instrumentation of the run, given before the command: python Main.py --run-log run.json train
+    parser.add_argument('--run-log', help="json file the time, memory and rows of every step are written to")
+    parser.add_argument('--prometheus', help="File the step metrics are written to in the Prometheus text format")
+    parser.add_argument('--profile', action='store_true', help="Profile every step with cProfile")
+    parser.add_argument('--profile-steps', nargs='+', help="Only profile these steps (implies --profile)")
+    parser.add_argument('--profile-dir', help="Folder the .prof file of every profiled step is saved to")
+    parser.add_argument('--no-tracemalloc', action='store_true',
+                        help="Don't trace the peak memory of the steps (tracing slows Python code down)")
+    subparsers = parser.add_subparsers(dest='command')
+
+    process_parser = subparsers.add_parser('process', help="Clean the raw dataset")
+    process_parser.add_argument('--streaming', action='store_true', help="Process the csv out of core, in chunks")
+    process_parser.add_argument('--chunk-size', type=int, default=100_000)
+    process_parser.add_argument('--no-cache', action='store_true', help="Run every stage, ignoring cached outputs")
+    process_parser.add_argument('--currencies', nargs='*', default=(), help="Extra price_<currency> columns")
+    process_parser.add_argument('--impute-by', help="Fill the nulls with per-group values of this column "
+                                                    "(e.g. brand_name)")
+    process_parser.add_argument('--quality-report', help="json file the data quality report is written to")
+    process_parser.add_argument('--fail-fast', action='store_true',
+                                help="Stop when the data quality scan finds invalid values")
+    process_parser.set_defaults(func=run_process)
+
+    eda_parser = subparsers.add_parser('eda', help="Exploratory data analysis on the cleaned dataset")
+    eda_parser.add_argument('--report', action='store_true', help="Render the figures to files (headless)")
+    eda_parser.add_argument('--output-dir', default='eda_report')
+    eda_parser.add_argument('--formats', nargs='+', default=['png'])
+    eda_parser.add_argument('--workers', type=int, default=None)
+    eda_parser.add_argument('--force', action='store_true', help="Render unchanged figures too")
+    eda_parser.set_defaults(func=run_eda, needs_cleaned_dataset=True)
+
+    train_parser = subparsers.add_parser('train', help="Train and save the models on the cleaned dataset")
+    train_parser.add_argument('--parallel', action='store_true', help="Train the models in parallel processes")
+    train_parser.add_argument('--workers', type=int, default=None)
+    train_parser.add_argument('--cv-folds', type=int, default=None)
+    train_parser.add_argument('--search', action='store_true', help="Run the hyperparameter search instead")
+    train_parser.add_argument('--candidates', type=int, default=None)
+    train_parser.set_defaults(func=run_train, needs_cleaned_dataset=True)
+
+    predict_parser = subparsers.add_parser('predict', help="Predict prices with the flat tree exports")
+    predict_parser.add_argument('--input', help="json or csv file of phones (defaults to the example phone)")
+    predict_parser.add_argument('--output', help="csv file the predictions are written to")
+    predict_parser.add_argument('--models', nargs='+', default=model_names)
+    predict_parser.add_argument('--models-dir', default=saved_models_dir)
+    predict_parser.set_defaults(func=run_predict)
+
+    export_parser = subparsers.add_parser('export', help="Export the saved models as flat tree arrays")
+    export_parser.add_argument('--models', nargs='+', default=model_names)
+    export_parser.add_argument('--models-dir', default=saved_models_dir)
+    export_parser.set_defaults(func=run_export)
+
+    comparables_parser = subparsers.add_parser('comparables', help="Find the closest phones of the catalog")
+    comparables_parser.add_argument('--input', help="json or csv file of phones (defaults to the example phone)")
+    comparables_parser.add_argument('--output', help="csv file the comparables are written to")
+    comparables_parser.add_argument('-k', type=int, default=5, help="Number of comparables per phone")
+    comparables_parser.add_argument('--brand', help="Only phones of this brand")
+    comparables_parser.add_argument('--os', help="Only phones with this OS")
+    comparables_parser.add_argument('--same-brand', action='store_true', help="Only phones of each phone's brand")
+    comparables_parser.add_argument('--same-os', action='store_true', help="Only phones with each phone's OS")
+    comparables_parser.add_argument('--models-dir', default=saved_models_dir)
+    comparables_parser.set_defaults(func=run_comparables)
+
+    importtime_parser = subparsers.add_parser('importtime', help="Report the import time of a subcommand")
+    importtime_parser.add_argument('--top', type=int, default=15, help="Number of top-level packages shown")
+    importtime_parser.add_argument('--json', help="json file the report is written to")
+    importtime_parser.add_argument('command_args', nargs=argparse.REMAINDER,
+                                   help="The subcommand to measure (defaults to predict)")
+    importtime_parser.set_defaults(func=run_importtime)
+
+    synthesize_parser = subparsers.add_parser('synthesize', help="Generate a synthetic catalog of any size")
+    synthesize_parser.add_argument('--rows', type=int, default=100_000)
+    synthesize_parser.add_argument('--output', help="csv file (or folder, for npy) the catalog is written to")
+    synthesize_parser.add_argument('--format', choices=['csv', 'npy'], default='csv',
+                                   help="csv, or a folder of memory-mappable .npy columns")
+    synthesize_parser.add_argument('--seed', type=int, default=0)
+    synthesize_parser.add_argument('--source', default='../../datasets/smartphones.csv',
+                                   help="The real catalog the distributions are learned from")
+    synthesize_parser.add_argument('--min-brand-rows', type=int, default=20,
+                                   help="Brands with fewer phones share one distribution")
+    synthesize_parser.set_defaults(func=run_synthesize)
+
+    benchmark_parser = subparsers.add_parser('benchmark', help="Time every stage at several dataset sizes")
+    benchmark_parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+                                  help="Numbers of rows of the synthetic catalogs")
+    benchmark_parser.add_argument('--repeats', type=int, default=3)
+    benchmark_parser.add_argument('--stages', nargs='+', default=['load', 'process', 'encode', 'train', 'predict'],
+                                  choices=['load', 'process', 'encode', 'train', 'predict'])
+    benchmark_parser.add_argument('--single-rows', type=int, default=100,
+                                  help="Number of phones predicted one at a time")
+    benchmark_parser.add_argument('--seed', type=int, default=42)
+    benchmark_parser.add_argument('--output', help="json file the results are written to")
+    benchmark_parser.add_argument('--baseline', help="json results of an earlier run to compare with")
+    benchmark_parser.add_argument('--threshold', type=float, default=0.2,
+                                  help="Relative slowdown of a median flagged as a regression")
+    benchmark_parser.add_argument('--min-delta', type=float, default=0.001,
+                                  help="Smallest slowdown in seconds flagged as a regression")
+    benchmark_parser.add_argument('--fail-on-regression', action='store_true', help="Exit with 1 on a regression")
+    benchmark_parser.set_defaults(func=run_benchmark)
+
+    return parser
+
+
+if __name__ == '__main__':
+    arguments = build_parser().parse_args()
+    arguments.profile = arguments.profile or bool(arguments.profile_steps)
+    arguments.instrumentation = _create_instrumentation(arguments)
+    try:
+        with (arguments.instrumentation.step(arguments.command or 'all', 'main')
+              if arguments.instrumentation is not None else contextlib.nullcontext()):
+            if arguments.command is None:
+                run_all(arguments)
+            else:
+                if getattr(arguments, 'needs_cleaned_dataset', False):
+                    arguments.dataset = _load_cleaned_dataset()
+                arguments.func(arguments)
+    finally:
+        if arguments.instrumentation is not None:
+            _export_instrumentation(arguments)
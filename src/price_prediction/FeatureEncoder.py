@@ -0,0 +1,114 @@
+import numpy as np
+
+
+class FeatureEncoder:
+    """
+        A feature encoder compiled once from the 'maps', 'features' and 'type' of a saved model artifact.
+
+        All string parsing of the one-hot column names happens in the constructor. Encoding then only
+        looks up precomputed column indices and writes directly into a preallocated float matrix whose
+        columns are in the saved feature order.
+
+        Attributes:
+        ----------
+        features : list
+            The feature order the model was trained with.
+        encoding_type : str
+            'one-hot' or 'frequency'.
+        numerical_columns : list
+            Features copied as they are from the input.
+        input_columns : list
+            Columns an input phone has to provide (categorical and numerical).
+        _numerical_indices : numpy.ndarray (private)
+            Matrix column index of each numerical feature.
+        _one_hot_indices : dict (private)
+            categorical column -> {category value -> matrix column index}.
+        _frequency_maps : dict (private)
+            categorical column -> (matrix column index, {category value -> frequency}).
+
+        Methods:
+        -------
+        from_artifact(saved):
+            Builds the encoder from a saved model artifact dict.
+        transform(phones):
+            Encodes a DataFrame or list of dicts into a float matrix.
+    """
+
+    def __init__(self, encoding_maps, features, encoding_type='frequency'):
+        self.features = list(features)
+        self.encoding_type = encoding_type
+        feature_index = {col: index for index, col in enumerate(self.features)}
+
+        self._one_hot_indices = {}
+        self._frequency_maps = {}
+        encoded_columns = set()
+
+        if encoding_type == "frequency":
+            for cat, freq_map in encoding_maps.items():
+                self._frequency_maps[cat] = (feature_index[cat], dict(freq_map))
+                encoded_columns.add(cat)
+
+        elif encoding_type == "one-hot":
+            for cat, columns in encoding_maps.items():
+                self._one_hot_indices[cat] = {col.split(f"{cat}_", 1)[1]: feature_index[col] for col in columns}
+                encoded_columns.update(columns)
+
+        else:
+            raise ValueError(f"Unknown encoding type: {encoding_type}")
+
+        self.numerical_columns = [col for col in self.features if col not in encoded_columns]
+        self.input_columns = list(encoding_maps) + self.numerical_columns
+        self._numerical_indices = np.array([feature_index[col] for col in self.numerical_columns], dtype=np.intp)
+
+    @classmethod
+    def from_artifact(cls, saved):
+        """ Builds the encoder from a saved model artifact dict. """
+        return cls(saved["maps"], saved["features"], saved.get("type", "frequency"))
+
+    def transform(self, phones):
+        """
+        Encodes the phones into a float64 matrix of shape (len(phones), len(features)).
+        Accepts a pandas DataFrame or a list of dicts. Unknown category values are encoded
+        as all zeros for one-hot and as 0 for frequency encoding.
+        """
+        if hasattr(phones, "columns"):
+            return self._transform_frame(phones)
+        return self._transform_records(phones)
+
+    def _transform_frame(self, df):
+        """ Encodes a DataFrame column by column with vectorized lookups. """
+        n_rows = len(df)
+        matrix = np.zeros((n_rows, len(self.features)), dtype=np.float64)
+
+        if self.numerical_columns:
+            matrix[:, self._numerical_indices] = df[self.numerical_columns].to_numpy(dtype=np.float64)
+
+        rows = np.arange(n_rows)
+        for cat, value_indices in self._one_hot_indices.items():
+            col_indices = df[cat].map(value_indices).to_numpy(dtype=np.float64)
+            known = ~np.isnan(col_indices)
+            matrix[rows[known], col_indices[known].astype(np.intp)] = 1.0
+
+        for cat, (col_index, freq_map) in self._frequency_maps.items():
+            matrix[:, col_index] = df[cat].map(freq_map).to_numpy(dtype=np.float64)
+            np.nan_to_num(matrix[:, col_index], copy=False, nan=0.0)
+
+        return matrix
+
+    def _transform_records(self, records):
+        """ Encodes a list of dicts row by row, used for small requests without building a DataFrame. """
+        records = list(records)
+        matrix = np.zeros((len(records), len(self.features)), dtype=np.float64)
+
+        for row, record in enumerate(records):
+            matrix[row, self._numerical_indices] = [record.get(col, np.nan) for col in self.numerical_columns]
+
+            for cat, value_indices in self._one_hot_indices.items():
+                col_index = value_indices.get(record.get(cat))
+                if col_index is not None:
+                    matrix[row, col_index] = 1.0
+
+            for cat, (col_index, freq_map) in self._frequency_maps.items():
+                matrix[row, col_index] = freq_map.get(record.get(cat), 0.0)
+
+        return matrix
@@ -0,0 +1,103 @@
+from src.machine_learning.FlatTreeEnsemble import FlatTreeEnsemble
+from src.price_prediction.FeatureEncoder import FeatureEncoder
+import json
+import os
+import numpy as np
+
+
+class FlatPredictor:
+    """
+        Predicts prices from the flat tree exports of the saved models ('<model_name>_flat' folders, or
+        the older '<model_name>_flat.npz' files).
+
+        Only NumPy is needed: the trees are walked by FlatTreeEnsemble and the features are encoded by a
+        FeatureEncoder built from the metadata saved with the arrays, so neither pandas nor sklearn is
+        imported. This keeps the start-up time of short-lived scoring jobs low. The tree arrays are
+        memory-mapped, so any number of scoring processes share one copy of them in the OS page cache.
+        Missing specifications are filled with the values of the imputer saved by the data processing, like
+        predict_batch does, read from the json copy of the imputer so neither pandas nor joblib is loaded.
+
+        Attributes:
+        ----------
+        models_dir : str
+            Folder of the saved models.
+        model_names : list
+            Names of the models used for prediction.
+        mmap_mode : str
+            How the tree arrays are memory-mapped ('r', or None to read them into private memory).
+        imputer_path : str
+            Path of the json copy of the saved imputer ('imputer.json' in models_dir). Without it, missing
+            values aren't filled.
+
+        Methods:
+        -------
+        load(model_name):
+            Returns the (FlatTreeEnsemble, FeatureEncoder) of a model, loaded on first use.
+        load_imputer():
+            Returns the saved imputer's values, loaded on first use (None when there is none).
+        fill_records(records):
+            Returns the records with their missing values filled like the training data.
+        predict_records(records):
+            Returns the predicted prices of a list of phone dicts for every model.
+    """
+
+    def __init__(self, models_dir='saved_models', model_names=("gradient_boosting_model", "random_forest_model"),
+                 mmap_mode='r'):
+        self.models_dir = models_dir
+        self.model_names = list(model_names)
+        self.mmap_mode = mmap_mode
+        self.imputer_path = os.path.join(models_dir, 'imputer.json')
+        self._models = {}
+        self._imputer = None
+
+    def load(self, model_name):
+        """ Returns the (FlatTreeEnsemble, FeatureEncoder) of a model, loaded on first use. """
+        if model_name not in self._models:
+            path = os.path.join(self.models_dir, f"{model_name}_flat")
+            if not os.path.isdir(path):
+                path += '.npz'  # Exported before the arrays were saved as separate files
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"{path[:-len('.npz')]} not found, train the models or export them "
+                                        f"with 'Main.py export'")
+            ensemble = FlatTreeEnsemble.load(path, self.mmap_mode)
+            self._models[model_name] = (ensemble, FeatureEncoder.from_artifact(ensemble.metadata))
+        return self._models[model_name]
+
+    def load_imputer(self):
+        """
+        Returns the saved imputer as the dict of its strategies, group_by, fill_values and group_values
+        read from its json copy on first use. Returns None when no imputer was saved.
+        """
+        if self._imputer is None and os.path.exists(self.imputer_path):
+            with open(self.imputer_path) as f:
+                self._imputer = json.load(f)
+        return self._imputer
+
+    def fill_records(self, records):
+        """
+        Returns copies of the records with every null or left out value filled like Imputer.transform(df,
+        add_missing=True): with the value of the phone's group when the imputer has one, else the overall value.
+        """
+        imputer = self.load_imputer()
+        if imputer is None:
+            return list(records)
+
+        filled_records = []
+        for record in records:
+            record = dict(record)
+            group = record.get(imputer["group_by"]) if imputer["group_by"] else None
+            for col, fill_value in imputer["fill_values"].items():
+                value = record.get(col)
+                if value is None or (isinstance(value, float) and np.isnan(value)):
+                    record[col] = imputer["group_values"].get(col, {}).get(group, fill_value)
+            filled_records.append(record)
+        return filled_records
+
+    def predict_records(self, records):
+        """ Returns {model_name: array of predicted prices} for a list of phone dicts, missing values filled. """
+        records = self.fill_records(records)
+        predictions = {}
+        for model_name in self.model_names:
+            ensemble, encoder = self.load(model_name)
+            predictions[model_name] = np.asarray(ensemble.predict(encoder.transform(records)), dtype=np.float64)
+        return predictions
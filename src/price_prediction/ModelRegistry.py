@@ -0,0 +1,178 @@
+from src.price_prediction.FeatureEncoder import FeatureEncoder
+from src.machine_learning.ComparablesIndex import ComparablesIndex
+from src.data_processing.Imputer import Imputer
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import joblib
+
+
+class ModelRegistry:
+    """
+        An in-process cache of the saved model artifacts, with one instance per models directory.
+
+        Each artifact is loaded from disk once and kept in memory. On every access the file's mtime and
+        size are checked, and the content hash is computed only when they differ from the cached ones,
+        so the artifact is reloaded only when the file has really changed. When more than max_models
+        artifacts are loaded, the least recently used one is evicted. ModelRegistry(models_dir) always returns
+        the registry of that directory, so a different models_dir never silently reuses another one's artifacts.
+
+        Attributes:
+        ----------
+        _instances : dict (private)
+            Class-level attribute holding the instance of every models directory (by absolute path).
+        models_dir : str
+            Directory containing the saved '<model_name>.pkl' files.
+        max_models : int
+            Maximum number of artifacts kept in memory.
+
+        Methods:
+        -------
+        get(model_name):
+            Returns the saved artifact dict ('model', 'features', 'maps', 'type').
+        get_model(model_name):
+            Returns the fitted model.
+        get_features(model_name):
+            Returns the feature order the model was trained with.
+        get_maps(model_name):
+            Returns the encoding maps of the categorical features.
+        get_encoding_type(model_name):
+            Returns the encoding type of the artifact.
+        get_encoder(model_name):
+            Returns the FeatureEncoder compiled from the artifact's maps and features.
+        get_imputer(name):
+            Returns the fitted Imputer saved next to the models, None if there is none.
+        get_comparables(name):
+            Returns the ComparablesIndex saved next to the models, None if there is none.
+        clear():
+            Removes every cached artifact.
+    """
+
+    _instances = {}  # Class-level attribute, absolute models_dir -> its instance
+    _instance_lock = threading.Lock()
+
+    def __new__(cls, models_dir='../main/saved_models', *args, **kwargs):
+        """
+        Overrides the default behavior of instance creation to ensure only one instance per models directory is created.
+        """
+        key = os.path.abspath(models_dir)
+        with cls._instance_lock:
+            if key not in cls._instances:
+                cls._instances[key] = super(ModelRegistry, cls).__new__(cls)
+        return cls._instances[key]
+
+    def __init__(self, models_dir='../main/saved_models', max_models=4):
+        """
+        Initializes the registry of models_dir. Ensures initialization happens only once per directory.
+        """
+        if not hasattr(self, "initialized"):  # Avoid reinitialization
+            self.models_dir = models_dir
+            self.max_models = max_models
+            self._cache = OrderedDict()  # model_name -> (stat signature, content hash, artifact, encoder)
+            self._artifacts = {}  # name -> (stat signature, artifact) of the imputer and the comparables index
+            self._lock = threading.RLock()
+            self.initialized = True  # Mark as initialized
+
+    def _path(self, model_name):
+        """ Returns the path of the saved artifact for model_name. """
+        return os.path.join(self.models_dir, f"{model_name}.pkl")
+
+    @staticmethod
+    def _content_hash(path):
+        """ Returns the sha256 hash of the file contents. """
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        return sha.hexdigest()
+
+    def _get_entry(self, model_name):
+        """ Returns the cache entry of model_name, (re)loading the artifact only if the file has changed. """
+        path = self._path(model_name)
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._cache.get(model_name)
+            if cached is not None:
+                cached_signature, cached_hash, artifact, encoder = cached
+                if cached_signature != signature:
+                    content_hash = self._content_hash(path)
+                    if content_hash == cached_hash:
+                        # Only the mtime changed (e.g. the file was touched), keep the loaded artifact
+                        self._cache[model_name] = (signature, content_hash, artifact, encoder)
+                    else:
+                        cached = None
+
+            if cached is None:
+                content_hash = self._content_hash(path)
+                artifact = joblib.load(path)
+                encoder = FeatureEncoder.from_artifact(artifact)
+                self._cache[model_name] = (signature, content_hash, artifact, encoder)
+                print(f"Loaded model '{model_name}' from {path}")
+
+            self._cache.move_to_end(model_name)
+            while len(self._cache) > self.max_models:
+                evicted_name, _ = self._cache.popitem(last=False)
+                print(f"Evicted model '{evicted_name}' from the registry")
+
+            return self._cache[model_name]
+
+    def get(self, model_name):
+        """ Returns the artifact dict of model_name ('model', 'features', 'maps', 'type'). """
+        return self._get_entry(model_name)[2]
+
+    def get_model(self, model_name):
+        """ Returns the fitted model. """
+        return self.get(model_name)["model"]
+
+    def get_features(self, model_name):
+        """ Returns the feature order the model was trained with. """
+        return self.get(model_name)["features"]
+
+    def get_maps(self, model_name):
+        """ Returns the encoding maps of the categorical features. """
+        return self.get(model_name)["maps"]
+
+    def get_encoding_type(self, model_name):
+        """ Returns the encoding type of the artifact ('one-hot' or 'frequency'). """
+        return self.get(model_name).get("type", "frequency")
+
+    def get_encoder(self, model_name):
+        """ Returns the FeatureEncoder compiled from the artifact's maps and features. """
+        return self._get_entry(model_name)[3]
+
+    def _get_artifact(self, name, load):
+        """
+        Returns the artifact saved as '<name>.pkl', loaded with load(path) and reloaded when the file changes.
+        Returns None when the file doesn't exist.
+        """
+        path = self._path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._artifacts.get(name)
+            if cached is None or cached[0] != signature:
+                cached = (signature, load(path))
+                self._artifacts[name] = cached
+                print(f"Loaded '{name}' from {path}")
+            return cached[1]
+
+    def get_imputer(self, name='imputer'):
+        """ Returns the fitted Imputer saved by the data processing, None if there is none. """
+        return self._get_artifact(name, Imputer.load)
+
+    def get_comparables(self, name='comparables_index'):
+        """ Returns the ComparablesIndex of the cleaned catalog saved by the training, None if there is none. """
+        return self._get_artifact(name, ComparablesIndex.load)
+
+    def clear(self):
+        """ Removes every cached artifact. """
+        with self._lock:
+            self._cache.clear()
+            self._artifacts.clear()
@@ -0,0 +1,331 @@
+from src.price_prediction.predict import predict_batch, models, models_dir
+from src.price_prediction.ModelRegistry import ModelRegistry
+from collections import deque
+from http import HTTPStatus
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+
+
+class MicroBatcher:
+    """
+        Gathers concurrent prediction requests into micro-batches.
+
+        The first request that arrives opens a batch window of batch_window_ms. Every request submitted
+        before the window closes (or until max_batch_size phones are collected) is scored together with
+        a single predict_batch call, which runs in a worker thread so the event loop stays responsive.
+        If a batch fails, its requests are scored one by one, so a bad request doesn't fail the others.
+
+        Attributes:
+        ----------
+        model_names : list
+            Names of the saved models every phone is scored with.
+        batch_window_ms : float
+            How long a batch waits for more requests after the first one arrives.
+        max_batch_size : int
+            Maximum number of phones in one batch.
+        stats : dict
+            Counters of processed requests and batches.
+
+        Methods:
+        -------
+        start():
+            Starts the background batching task.
+        submit(phones):
+            Queues a list of phones and waits for their predictions.
+        get_stats():
+            Returns request latency and batch size statistics.
+    """
+
+    def __init__(self, model_names=None, batch_window_ms=5.0, max_batch_size=256):
+        self.model_names = list(model_names or models)
+        self.batch_window_ms = batch_window_ms
+        self.max_batch_size = max_batch_size
+        self.stats = {"requests": 0, "phones": 0, "batches": 0, "failed_batches": 0, "failed_requests": 0}
+        self._queue = None
+        self._task = None
+        self._latencies_ms = deque(maxlen=10000)  # Latencies of the most recent requests
+        self._batch_sizes = deque(maxlen=10000)  # Sizes of the most recent batches
+
+    def start(self):
+        """ Starts the background batching task on the running event loop. """
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, phones):
+        """
+        Queues the phones and waits until their batch is scored.
+        Returns the list of predictions ({model_name: price}) and the size of the batch they were scored in.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((phones, future))
+        return await future
+
+    async def _collect_batch(self):
+        """ Waits for the first request, then collects requests until the window closes or the batch is full. """
+        batch = [await self._queue.get()]
+        n_phones = len(batch[0][0])
+        deadline = time.perf_counter() + self.batch_window_ms / 1000
+
+        while n_phones < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            n_phones += len(item[0])
+        return batch, n_phones
+
+    def _score(self, phones):
+        """ Returns the predictions of the phones as a matrix with one column per model. """
+        priced_df = predict_batch(phones, self.model_names)
+        return priced_df[[f"predicted_price_{name}" for name in self.model_names]].to_numpy()
+
+    def _set_result(self, future, rows, n_phones):
+        """ Resolves the future of a request with the predictions of its phones. """
+        if not future.done():
+            future.set_result(([dict(zip(self.model_names, map(float, row))) for row in rows], n_phones))
+
+    async def _run(self):
+        """
+        Scores one micro-batch at a time with a single predict_batch call per batch. When the batch fails,
+        its requests are scored one by one, so only the request that caused the failure gets the error.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch, n_phones = await self._collect_batch()
+            phones = [phone for request_phones, _ in batch for phone in request_phones]
+
+            try:
+                predictions = await loop.run_in_executor(None, self._score, phones)
+            except Exception as e:
+                self.stats["failed_batches"] += 1
+                if len(batch) == 1:
+                    self.stats["failed_requests"] += 1
+                    if not batch[0][1].done():
+                        batch[0][1].set_exception(e)
+                    continue
+                for request_phones, future in batch:
+                    try:
+                        rows = await loop.run_in_executor(None, self._score, request_phones)
+                    except Exception as request_error:
+                        self.stats["failed_requests"] += 1
+                        if not future.done():
+                            future.set_exception(request_error)
+                        continue
+                    self._set_result(future, rows, len(request_phones))
+                continue
+
+            self.stats["batches"] += 1
+            self._batch_sizes.append(n_phones)
+
+            start = 0
+            for request_phones, future in batch:
+                rows = predictions[start:start + len(request_phones)]
+                start += len(request_phones)
+                self._set_result(future, rows, n_phones)
+
+    def record_request(self, n_phones, latency_ms):
+        """ Records the latency of a finished request. """
+        self.stats["requests"] += 1
+        self.stats["phones"] += n_phones
+        self._latencies_ms.append(latency_ms)
+
+    def get_stats(self):
+        """ Returns the counters together with latency percentiles and batch size statistics. """
+        stats = dict(self.stats)
+        if self._latencies_ms:
+            latencies = np.array(self._latencies_ms)
+            stats["latency_ms"] = {"mean": float(latencies.mean()),
+                                   "p50": float(np.percentile(latencies, 50)),
+                                   "p95": float(np.percentile(latencies, 95)),
+                                   "p99": float(np.percentile(latencies, 99)),
+                                   "max": float(latencies.max())}
+        if self._batch_sizes:
+            batch_sizes = np.array(self._batch_sizes)
+            stats["batch_size"] = {"mean": float(batch_sizes.mean()),
+                                   "max": int(batch_sizes.max())}
+        return stats
+
+
+class PredictionServer:
+    """
+        A small asyncio HTTP/1.1 server for price quotes, built on the standard library only.
+
+        Endpoints:
+        ---------
+        POST /predict : body is a JSON phone spec or a list of specs.
+                        Returns the predicted prices, the request latency and the size of the batch it was scored in.
+        GET /stats : Returns request latency and batch size statistics.
+        GET /health : Returns {"status": "ok"}.
+
+        Attributes:
+        ----------
+        host : str
+        port : int
+        batcher : instance of MicroBatcher class
+
+        Methods:
+        -------
+        serve()
+        run()
+    """
+
+    def __init__(self, host='127.0.0.1', port=8000, model_names=None, batch_window_ms=5.0, max_batch_size=256):
+        self.host = host
+        self.port = port
+        self.batcher = MicroBatcher(model_names, batch_window_ms, max_batch_size)
+        self._column_types = {}  # Field a phone has to provide -> 'numerical' or 'categorical'
+        self._imputed_columns = set()  # Fields the saved imputer fills when they are missing
+
+    def _load_models(self):
+        """
+        Loads every model and the imputer into the registry up front so the first requests don't pay for
+        unpickling, and collects the fields a phone has to provide and their types.
+        """
+        registry = ModelRegistry(models_dir)
+        column_types = {}
+        for model_name in self.batcher.model_names:
+            encoder = registry.get_encoder(model_name)
+            for col in encoder.input_columns:
+                column_types.setdefault(col, 'numerical' if col in encoder.numerical_columns else 'categorical')
+        self._column_types = column_types
+        imputer = registry.get_imputer()
+        self._imputed_columns = set(imputer.fill_values) if imputer is not None else set()
+
+    def _validate(self, payload):
+        """
+        Returns the list of phones in the payload, raising ValueError if it is malformed: a field that is
+        missing (or null) and can't be filled by the imputer, a categorical field that isn't a string or a
+        numerical field that isn't a number.
+        """
+        phones = [payload] if isinstance(payload, dict) else payload
+        if not isinstance(phones, list) or not phones or not all(isinstance(phone, dict) for phone in phones):
+            raise ValueError("Body must be a phone spec object or a non-empty list of them.")
+        for index, phone in enumerate(phones):
+            missing = [col for col in self._column_types
+                       if phone.get(col) is None and col not in self._imputed_columns]
+            if missing:
+                raise ValueError(f"Phone {index} is missing fields: {missing}")
+            invalid = {col: f"expected {'a string' if col_type == 'categorical' else 'a number'}"
+                       for col, col_type in self._column_types.items() if phone.get(col) is not None and
+                       not isinstance(phone[col], str if col_type == 'categorical' else (int, float))}
+            if invalid:
+                raise ValueError(f"Phone {index} has fields of the wrong type: {invalid}")
+        return phones
+
+    async def _handle_predict(self, body):
+        """ Scores the phones in the request body through the micro-batcher. """
+        start = time.perf_counter()
+        try:
+            phones = self._validate(json.loads(body or b'null'))
+        except ValueError as e:  # json.JSONDecodeError is a ValueError as well
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+
+        try:
+            predictions, batch_size = await self.batcher.submit(phones)
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"Prediction failed: {e}"}
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.batcher.record_request(len(phones), latency_ms)
+        return HTTPStatus.OK, {"predictions": predictions, "latency_ms": latency_ms, "batch_size": batch_size}
+
+    async def _dispatch(self, method, path, body):
+        """ Routes a request to its endpoint and returns the status and JSON response. """
+        if path == '/predict':
+            if method != 'POST':
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use POST"}
+            return await self._handle_predict(body)
+        if path == '/stats' and method == 'GET':
+            return HTTPStatus.OK, self.batcher.get_stats()
+        if path == '/health' and method == 'GET':
+            return HTTPStatus.OK, {"status": "ok"}
+        return HTTPStatus.NOT_FOUND, {"error": f"Unknown endpoint: {method} {path}"}
+
+    @staticmethod
+    async def _write_response(writer, status, response, keep_alive):
+        """ Writes a JSON response. """
+        payload = json.dumps(response).encode()
+        writer.write(f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(payload)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + payload)
+        await writer.drain()
+
+    async def _handle_connection(self, reader, writer):
+        """ Serves the requests of one (keep-alive) connection. """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    content_length = int(headers.get('content-length', 0))
+                    if content_length < 0:
+                        raise ValueError
+                except ValueError:
+                    # The body can't be skipped without its length, so the connection is closed after the error
+                    await self._write_response(writer, HTTPStatus.BAD_REQUEST,
+                                               {"error": "Invalid Content-Length header"}, keep_alive=False)
+                    break
+
+                body = await reader.readexactly(content_length)
+                status, response = await self._dispatch(method, path.split('?', 1)[0], body)
+
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and (version == 'HTTP/1.1' or headers.get('connection', '').lower() == 'keep-alive'))
+                await self._write_response(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """ Starts the batcher and serves requests until cancelled. """
+        self._load_models()
+        self.batcher.start()
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        print(f"Prediction server listening on http://{self.host}:{self.port} "
+              f"(batch window {self.batcher.batch_window_ms} ms, max batch size {self.batcher.max_batch_size})")
+        async with server:
+            await server.serve_forever()
+
+    def run(self):
+        """ Runs the server until interrupted. """
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            print("Prediction server stopped.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve smartphone price predictions over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--models', nargs='+', default=models, help="Saved model names to score with.")
+    parser.add_argument('--batch-window-ms', type=float, default=5.0)
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    args = parser.parse_args()
+
+    PredictionServer(args.host, args.port, args.models, args.batch_window_ms, args.max_batch_size).run()
@@ -0,0 +1,23 @@
+# Input: Galaxy S25 Ultra 512GB
+actual_price = 1419
+new_phone = {
+    'brand_name': 'Samsung',
+    'processor_brand': 'Qualcomm',
+    'os': 'Android',
+    'avg_rating': 8.0,
+    '5G_or_not': 1,
+    'num_cores': 8,
+    'processor_speed': 4.47,
+    'battery_capacity': 5000,
+    'fast_charging': 45,
+    'ram_capacity': 12,
+    'internal_memory': 512,
+    'screen_size': 6.9,
+    'refresh_rate': 120,
+    'num_rear_cameras': 4,
+    'primary_camera_rear': 200,
+    'primary_camera_front': 12,
+    'extended_memory_available': 0,
+    'resolution_height': 3120,
+    'resolution_width': 1440
+}
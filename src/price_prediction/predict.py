@@ -1,56 +1,83 @@
-import joblib
+from src.price_prediction.ModelRegistry import ModelRegistry
+from src.price_prediction.example_phone import new_phone, actual_price
+import os
+import numpy as np
 import pandas as pd
 
 
-# Input: Galaxy S25 Ultra 512GB
-actual_price = 1419
-new_phone = {
-    'brand_name': 'Samsung',
-    'processor_brand': 'Qualcomm',
-    'os': 'Android',
-    'avg_rating': 8.0,
-    '5G_or_not': 1,
-    'num_cores': 8,
-    'processor_speed': 4.47,
-    'battery_capacity': 5000,
-    'fast_charging': 45,
-    'ram_capacity': 12,
-    'internal_memory': 512,
-    'screen_size': 6.9,
-    'refresh_rate': 120,
-    'num_rear_cameras': 4,
-    'primary_camera_rear': 200,
-    'primary_camera_front': 12,
-    'extended_memory_available': 0,
-    'resolution_height': 3120,
-    'resolution_width': 1440
-}
+models = ["gradient_boosting_model", "random_forest_model"]
+models_dir = "../main/saved_models"
 
-def predict():
-    models = ["gradient_boosting_model", "random_forest_model"]
 
-    for model_name in models:
-        saved = joblib.load(f"../main/saved_models/{model_name}.pkl")
-        model = saved["model"]
-        encoding_maps = saved["maps"]
-        encoding_type = saved.get("type", "frequency")
+def _load_phones(phones):
+    """
+    Converts the batch input into a DataFrame.
+    Accepts a DataFrame, a path to a csv file, a list of dicts or a single dict.
+    """
+    if isinstance(phones, pd.DataFrame):
+        return phones
+    if isinstance(phones, (str, os.PathLike)):
+        return pd.read_csv(phones)
+    if isinstance(phones, dict):
+        return pd.DataFrame([phones])
+    return pd.DataFrame(list(phones))
+
+
+def predict_batch(phones, model_names=None, chunk_size=10000, n_comparables=0, comparables_match=(),
+                  models_dir=models_dir):
+    """
+    Predicts the prices of a batch of phones with every saved model.
+
+    Parameters:
+    ----------
+    phones : DataFrame, csv path or list of dicts with the phone specifications.
+    model_names : Names of the saved models to use. Defaults to all models.
+    chunk_size : Number of rows passed to model.predict at once.
+    n_comparables : If set, the models and prices of the n closest phones of the catalog are added as the
+                    'comparable_models' and 'comparable_prices' columns (lists).
+    comparables_match : Columns the comparables must share with the phone (e.g. ('brand_name',)).
+    models_dir : Directory of the saved models, imputer and comparables index.
+
+    Returns the input dataframe with a 'predicted_price_<model_name>' column for every model.
+    Missing specifications (null or left out) are filled by the imputer fitted during data processing,
+    in one vectorized step for the whole batch.
+    """
+    df = _load_phones(phones).reset_index(drop=True)
+    priced_df = df.copy()
+    registry = ModelRegistry(models_dir)
 
-        df_new = pd.DataFrame([new_phone])
+    imputer = registry.get_imputer()
+    if imputer is not None:
+        df = imputer.transform(df, add_missing=True)
 
-        if encoding_type == "frequency":
-            for cat in encoding_maps:
-                df_new[cat] = df_new[cat].map(encoding_maps[cat]).fillna(0)
+    for model_name in (model_names or models):
+        saved = registry.get(model_name)  # Loaded from disk only on first use or when the file changes
+        X = registry.get_encoder(model_name).transform(df)
 
-        elif encoding_type == "one-hot":
-            for cat, columns in encoding_maps.items():
-                for col in columns:
-                    category_value = col.split(f"{cat}_", 1)[1]
-                    df_new[col] = (df_new[cat] == category_value).astype(int)
-                df_new.drop(columns=[cat], inplace=True)
+        predictions = np.empty(len(X), dtype=float)
+        for start in range(0, len(X), chunk_size):
+            X_chunk = pd.DataFrame(X[start:start + chunk_size], columns=saved["features"], copy=False)
+            predictions[start:start + chunk_size] = saved["model"].predict(X_chunk)
 
-        df_new = df_new[saved["features"]]
+        priced_df[f"predicted_price_{model_name}"] = predictions
 
-        predicted_price = model.predict(df_new)[0]
+    if n_comparables:
+        index = registry.get_comparables()
+        if index is None:
+            raise FileNotFoundError("No comparables index in the models directory, train the models first")
+        comparables = index.query(df, n_comparables, match=comparables_match).groupby("query_index")[["model", "price"]].agg(list)
+        comparables = comparables.reindex(range(len(df)))
+        priced_df["comparable_models"] = comparables["model"].to_numpy()
+        priced_df["comparable_prices"] = comparables["price"].to_numpy()
+
+    return priced_df
+
+
+def predict():
+    priced_df = predict_batch([new_phone])
+
+    for model_name in models:
+        predicted_price = priced_df[f"predicted_price_{model_name}"].iloc[0]
         print(f"Model: {model_name}, Actual Price: {actual_price}, Predicted Price: {predicted_price}")
 
 